@@ -0,0 +1,505 @@
+"""
+RetailBeastFX - AEP Protocol Engine v1.0
+Offline port of the ORB and Supply & Demand logic in AEP_Protocol.pine and the
+AEP_Protocol_Strategy_* variants (Session, HTF, Optimized, GoldMaster).
+
+Everything is computed per session day with vectorized daily-range operations
+(group cummax/cummin, first-event-per-day, forward scans) so years of 5m data
+can be swept in seconds. Signals plug into generate_signals() in
+rbfx_backtest_enhanced via the "AEP ..." strategy names.
+
+DemandTouchBuy / SupplyTouchSell (the "AEP S/D Zones" strategy) are
+Python-only signals: the Pine scripts only draw the zones, they never
+trade a zone touch.
+"""
+
+import time
+import pandas as pd
+import numpy as np
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+from rbfx_core import InstitutionalRiskEngine, calculate_ema, calculate_rsi, crossover, crossunder
+from rbfx_first_touch import ForwardScanner, BarScanner
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONFIGURATION (matches Pine Script inputs)
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass
+class AEPConfig:
+    # Core
+    fast_len: int = 9
+    slow_len: int = 30
+    rsi_len: int = 14
+    rsi_overbought: int = 70
+    rsi_oversold: int = 25
+    enable_momentum_longs: bool = True
+    enable_momentum_shorts: bool = True
+    momentum_requires_rsi: bool = True  # Indicator gates momo on RSI, strategies don't
+    simple_colorway: bool = False
+
+    # Consolidation (% of price, Pine defaults; scaled by CHOP_PCT_SCALE[instrument])
+    consol_ema_pct: float = 0.4
+    consol_max_move_pct: float = 0.6
+    range_bar_count: int = 20
+
+    # ORB (NY time, index assumed EST like the other backtesters)
+    orb_session: str = "0930-0945"
+    orb_hold_bars: int = 15
+    block_counter_trend: bool = True
+    orb_retest_tol: float = 30.0  # % of ORB range
+    max_bars_retest: int = 25
+    max_bars_fakeout: int = 15
+    use_retest_entry: bool = True
+    use_fakeout_gate: bool = True
+    dedupe_signals: bool = True  # Indicator's "longSignal and not longSignal[1]"
+
+    # Supply & Demand
+    pivot_left: int = 10
+    pivot_right: int = 3
+    max_levels: int = 20
+    zone_height_ticks: int = 28
+    tick_size: Optional[float] = None  # None = syminfo.mintick of instrument (see tick)
+
+    # Advanced
+    volume_period: int = 8
+    momentum_body_mult: float = 1.2
+
+    # Risk (ATR multiples, informational - backtests use BacktestConfig)
+    profit_factor: float = 2.0
+    stop_factor: float = 1.0
+
+    # Variant filters
+    trade_session: Optional[str] = None  # e.g. "0300-1300"
+    htf_rule: Optional[str] = None       # e.g. "4h"
+    htf_len: int = 50
+
+    # Indicator formulas (rbfx_core.INDICATOR_BACKENDS): RSI is ta.rsi under "pine"
+    indicator_backend: str = "pine"
+
+    # INSTRUMENT_SPECS key: tick size and chop scaling
+    instrument: str = "EURUSD"
+
+    @property
+    def tick(self) -> float:
+        """tick_size, else a tenth of the instrument's pip (5-digit quotes: EURUSD 0.00001, XAUUSD 0.01)."""
+        if self.tick_size is not None:
+            return self.tick_size
+        pip_size, _ = InstitutionalRiskEngine.spec_arrays(self.instrument)
+        return float(pip_size) / 10
+
+
+# Strategy-file variants are the indicator minus RSI-gated momo, retests,
+# fakeout gate and duplicate block, plus their own filter.
+_STRATEGY_BASE = AEPConfig(
+    momentum_requires_rsi=False,
+    use_retest_entry=False,
+    use_fakeout_gate=False,
+    dedupe_signals=False,
+    volume_period=10,
+    momentum_body_mult=1.1,
+)
+
+AEP_VARIANTS: Dict[str, AEPConfig] = {
+    "Protocol": AEPConfig(),
+    "Session": replace(_STRATEGY_BASE, trade_session="0300-1300"),
+    "HTF": replace(_STRATEGY_BASE, htf_rule="4h", htf_len=50),
+    "Optimized": replace(_STRATEGY_BASE, block_counter_trend=False, stop_factor=0.8),
+    "GoldMaster": replace(_STRATEGY_BASE, trade_session="0300-1300"),
+}
+
+# Strategy names accepted by generate_signals -> column pair in compute_aep_signals
+AEP_STRATEGIES: Dict[str, Tuple[str, str]] = {
+    "AEP Protocol": ("AEPBuy", "AEPSell"),
+    "AEP ORB Breakout": ("ORB_BreakoutBuy", "ORB_BreakoutSell"),
+    "AEP ORB Retest": ("ORB_RetestBuy", "ORB_RetestSell"),
+    "AEP S/D Zones": ("DemandTouchBuy", "SupplyTouchSell"),  # Python-only, not in the Pine scripts
+}
+
+# The consolidation %s were tuned on XAUUSD; FX majors move about a fifth as
+# much per bar, so at the Pine defaults every bar of theirs counts as chop
+CHOP_PCT_SCALE: Dict[str, float] = {"EURUSD": 0.2, "USDJPY": 0.2}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# HELPERS
+# ═══════════════════════════════════════════════════════════════════════════════
+def _parse_session(session: str) -> Tuple[int, int]:
+    """Pine session string "HHMM-HHMM" -> (start, end) minutes of day."""
+    start, end = session.split("-")
+    return int(start[:2]) * 60 + int(start[2:]), int(end[:2]) * 60 + int(end[2:])
+
+
+def in_session(index: pd.DatetimeIndex, session: str) -> np.ndarray:
+    """Vectorized Pine time(timeframe, session) != na for bar open times."""
+    start, end = _parse_session(session)
+    minute = index.hour * 60 + index.minute
+    if start <= end:
+        return np.asarray((minute >= start) & (minute < end))
+    return np.asarray((minute >= start) | (minute < end))  # Overnight session
+
+
+def session_day_ids(index: pd.DatetimeIndex) -> np.ndarray:
+    """Consecutive integer id per calendar day (Pine's dayofweek change reset)."""
+    day = index.normalize().asi8
+    return np.concatenate([[0], np.cumsum(day[1:] != day[:-1])])
+
+
+def pine_dedupe(signal: np.ndarray) -> np.ndarray:
+    """Vectorized `s := s and not s[1]` where s[1] is the already-deduped value.
+
+    Inside each run of raw True values the result alternates True/False,
+    starting with True, exactly like the recursive Pine assignment.
+    """
+    signal = np.asarray(signal, dtype=bool)
+    idx = np.arange(len(signal))
+    run_start = np.where(signal & ~np.concatenate([[False], signal[:-1]]), idx, 0)
+    run_start = np.maximum.accumulate(run_start)
+    return signal & ((idx - run_start) % 2 == 0)
+
+
+def _htf_ema(close: pd.Series, rule: str, length: int) -> np.ndarray:
+    """HTF EMA from the last *completed* HTF bar (no request.security lookahead)."""
+    bins = close.index.floor(rule)
+    htf_close = close.groupby(bins).last()
+    htf_ema = calculate_ema(htf_close, length).shift(1)
+    return htf_ema.reindex(bins).to_numpy()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ORB MODULE
+# ═══════════════════════════════════════════════════════════════════════════════
+def compute_orb(df: pd.DataFrame, config: AEPConfig, day_id: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Per-day opening range, first breakout, retest, midline and fakeout state."""
+    n = len(df)
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    if day_id is None:
+        day_id = session_day_ids(df.index)
+
+    in_orb = in_session(df.index, config.orb_session)
+
+    # Running ORB high/low inside the window, carried for the rest of the day
+    orb_high = pd.Series(np.where(in_orb, high, np.nan)).groupby(day_id).cummax()
+    orb_low = pd.Series(np.where(in_orb, low, np.nan)).groupby(day_id).cummin()
+    orb_high = orb_high.groupby(day_id).ffill().to_numpy()
+    orb_low = orb_low.groupby(day_id).ffill().to_numpy()
+    orb_complete = ~np.isnan(orb_high)
+    orb_mid = (orb_high + orb_low) / 2
+
+    # ta.crossover / ta.crossunder against the (running) ORB levels
+    same_day = np.concatenate([[False], day_id[1:] == day_id[:-1]])
+    cross_up = crossover(close, orb_high) & same_day
+    cross_dn = crossunder(close, orb_low) & same_day
+    events = orb_complete & ~in_orb & (cross_up | cross_dn)
+
+    # First breakout event per day wins (orbBreakDir == 0 guard)
+    ev_idx = np.flatnonzero(events)
+    first_days, first_pos = np.unique(day_id[ev_idx], return_index=True)
+    break_bar_by_day = np.full(day_id[-1] + 1 if n else 0, -1, dtype=np.int64)
+    break_bar_by_day[first_days] = ev_idx[first_pos]
+    break_dir_by_day = np.zeros(len(break_bar_by_day), dtype=np.int8)
+    break_dir_by_day[first_days] = np.where(cross_up[ev_idx[first_pos]], 1, -1)
+
+    idx = np.arange(n)
+    break_bar = break_bar_by_day[day_id]
+    broken = (break_bar >= 0) & (idx >= break_bar)
+    break_dir = np.where(broken, break_dir_by_day[day_id], 0)
+    bars_since = np.where(broken, idx - break_bar, 999)
+
+    # Retest of the broken level
+    tol = (orb_high - orb_low) * (config.orb_retest_tol / 100)
+    in_retest = bars_since <= config.max_bars_retest
+    with np.errstate(invalid='ignore'):
+        retest_long = (break_dir == 1) & in_retest & (low <= orb_high + tol) & (low >= orb_high - tol)
+        retest_short = (break_dir == -1) & in_retest & (high >= orb_low - tol) & (high <= orb_low + tol)
+
+        # Fakeout: close back through the midline shortly after the break
+        in_fakeout = bars_since <= config.max_bars_fakeout
+        fakeout_long = (break_dir == 1) & in_fakeout & (close < orb_mid)
+        fakeout_short = (break_dir == -1) & in_fakeout & (close > orb_mid)
+
+    return {
+        'ORB_InWindow': in_orb,
+        'ORB_High': orb_high,
+        'ORB_Low': orb_low,
+        'ORB_Mid': orb_mid,
+        'ORB_Complete': orb_complete,
+        'ORB_BreakDir': break_dir,
+        'ORB_BarsSinceBreak': bars_since,
+        'ORB_BreakBar': events & (idx == break_bar),
+        'ORB_RetestLong': retest_long,
+        'ORB_RetestShort': retest_short,
+        'FakeoutLong': fakeout_long,
+        'FakeoutShort': fakeout_short,
+    }
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SUPPLY & DEMAND ZONES
+# ═══════════════════════════════════════════════════════════════════════════════
+def _pivots(values: np.ndarray, left: int, right: int, high: bool) -> np.ndarray:
+    """Bar indices of ta.pivothigh/ta.pivotlow centers (confirmed `right` bars later)."""
+    s = pd.Series(values if high else -values)
+    window_max = s.rolling(left + right + 1).max().shift(-right).to_numpy()
+    left_max = s.shift(1).rolling(left).max().to_numpy()
+    v = s.to_numpy()
+    with np.errstate(invalid='ignore'):
+        is_pivot = (v >= window_max) & (v > left_max)
+    return np.flatnonzero(is_pivot)
+
+
+def _zone_lifetimes(created: np.ndarray, broken: np.ndarray, max_levels: int) -> np.ndarray:
+    """Exclusive end bar per zone: broken, or evicted by the maxLevels FIFO.
+
+    Mirrors the Pine arrays: a zone broken on bar t is removed in that bar's
+    cleanup, so it still counts toward maxLevels for zones created on bar t.
+    """
+    end = broken.copy()
+    alive = deque()
+    for z in range(len(created)):
+        t = created[z]
+        if len(alive) >= max_levels:
+            alive = deque(a for a in alive if broken[a] >= t)
+        alive.append(z)
+        if len(alive) > max_levels:
+            oldest = alive.popleft()
+            end[oldest] = min(end[oldest], t)
+    return end
+
+
+def compute_sd_zones(df: pd.DataFrame, config: AEPConfig,
+                     scanner: Optional[BarScanner] = None) -> Dict[str, np.ndarray]:
+    """Create, invalidate and FIFO-trim S/D zones; flag first touches of fresh zones.
+
+    The zones follow the Pine drawing logic; the touch signals are Python-only.
+    """
+    n = len(df)
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    open_ = df['Open'].to_numpy(dtype=np.float64)
+    height = config.zone_height_ticks * config.tick
+    scanner = scanner or BarScanner(high, low)
+    close_up = ForwardScanner(close)
+    close_dn = ForwardScanner(-close)
+
+    out = {}
+    for side in ('supply', 'demand'):
+        is_supply = side == 'supply'
+        centers = _pivots(high if is_supply else low, config.pivot_left, config.pivot_right, is_supply)
+        created = centers + config.pivot_right
+        keep = created > config.pivot_right
+        centers, created = centers[keep], created[keep]
+
+        if is_supply:
+            top = high[centers]
+            bottom = top - height
+            # Broken when close > top
+            broken = close_up.first_at_or_above(created, top, strict=True)
+        else:
+            bottom = low[centers]
+            top = bottom + height
+            broken = close_dn.first_at_or_above(created, -bottom, strict=True)
+
+        end = _zone_lifetimes(created, broken, config.max_levels)
+
+        # First tap of a still-active zone after creation
+        if is_supply:
+            touch = scanner.first_high_at_or_above(created + 1, bottom, stop=end)
+        else:
+            touch = scanner.first_low_at_or_below(created + 1, top, stop=end)
+        tapped = touch < n
+        t = touch[tapped]
+        signal = np.zeros(n, dtype=bool)
+        if is_supply:
+            signal[t[(close[t] <= top[tapped]) & (close[t] < open_[t])]] = True
+        else:
+            signal[t[(close[t] >= bottom[tapped]) & (close[t] > open_[t])]] = True
+
+        # Active zone count per bar via +1/-1 events
+        count = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(count, np.minimum(created, n), 1)
+        np.add.at(count, np.minimum(end, n), -1)
+
+        name = 'Supply' if is_supply else 'Demand'
+        out[f'Active{name}Zones'] = np.cumsum(count[:n])
+        out['SupplyTouchSell' if is_supply else 'DemandTouchBuy'] = signal
+        out[f'{name}Zones'] = pd.DataFrame({
+            'created_bar': created, 'top': top, 'bottom': bottom, 'end_bar': end, 'touch_bar': touch,
+        })
+    return out
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# AEP SIGNALS
+# ═══════════════════════════════════════════════════════════════════════════════
+def compute_aep_signals(df: pd.DataFrame, config: Optional[AEPConfig] = None) -> pd.DataFrame:
+    """All AEP Protocol features and signal columns for an OHLCV frame.
+
+    Returns a new frame on df.index; df is not modified.
+    """
+    config = config or AEP_VARIANTS["Protocol"]
+    close_s = df['Close']
+    close = close_s.to_numpy(dtype=np.float64)
+    open_ = df['Open'].to_numpy(dtype=np.float64)
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    volume = df['Volume'].to_numpy(dtype=np.float64)
+
+    fast = calculate_ema(close_s, config.fast_len).to_numpy()
+    slow = calculate_ema(close_s, config.slow_len).to_numpy()
+    rsi = calculate_rsi(close_s, config.rsi_len, config.indicator_backend).to_numpy()
+
+    def lag(a, k):
+        return np.concatenate([np.full(k, np.nan), a[:-k]]) if k < len(a) else np.full(len(a), np.nan)
+
+    with np.errstate(invalid='ignore'):
+        bull_align = (fast > slow) & (fast > lag(fast, 3)) & (slow > lag(slow, 3))
+        bear_align = (fast < slow) & (fast < lag(fast, 3)) & (slow < lag(slow, 3))
+
+        ma_dist_pct = np.abs(fast - slow) / close * 100
+        range_hi = df['High'].rolling(config.range_bar_count).max().to_numpy()
+        range_lo = df['Low'].rolling(config.range_bar_count).min().to_numpy()
+        range_move_pct = (range_hi - range_lo) / range_lo * 100
+        scale = CHOP_PCT_SCALE.get(config.instrument, 1.0)
+        is_chop = ((ma_dist_pct < config.consol_ema_pct * scale)
+                   | (range_move_pct < config.consol_max_move_pct * scale))
+
+        pullback_long = bull_align & (close < fast) & (close > slow)
+        pullback_short = bear_align & (close > fast) & (close < slow)
+
+        vol_confirm = volume > pd.Series(volume).rolling(config.volume_period).mean().to_numpy()
+        body = np.abs(close - open_)
+        strong_body = body > pd.Series(body).rolling(3).mean().to_numpy() * config.momentum_body_mult
+        break_prev_high = close > lag(high, 1)
+        break_prev_low = close < lag(low, 1)
+
+    rsi_long = rsi < config.rsi_oversold if config.momentum_requires_rsi else np.ones(len(df), dtype=bool)
+    rsi_short = rsi > config.rsi_overbought if config.momentum_requires_rsi else np.ones(len(df), dtype=bool)
+
+    day_id = session_day_ids(df.index)
+    orb = compute_orb(df, config, day_id)
+    zones = compute_sd_zones(df, config)
+
+    retest_long = orb['ORB_RetestLong'] & bull_align & ~is_chop
+    retest_short = orb['ORB_RetestShort'] & bear_align & ~is_chop
+
+    prev_pb_long = np.concatenate([[False], pullback_long[:-1]])
+    prev_pb_short = np.concatenate([[False], pullback_short[:-1]])
+
+    long_base = bull_align & ~is_chop & (close > fast) & vol_confirm & strong_body
+    long_momo = (bull_align & (close > fast) & strong_body & break_prev_high & ~is_chop
+                 & config.enable_momentum_longs & rsi_long)
+    long_pb = prev_pb_long & (close > fast) & ~is_chop
+    short_base = bear_align & ~is_chop & (close < fast) & vol_confirm & strong_body
+    short_momo = (bear_align & (close < fast) & strong_body & break_prev_low & ~is_chop
+                  & config.enable_momentum_shorts & rsi_short)
+    short_pb = prev_pb_short & (close < fast) & ~is_chop
+
+    long_sig = long_base | long_momo | long_pb
+    short_sig = short_base | short_momo | short_pb
+    if config.use_retest_entry:
+        long_sig = long_sig | retest_long
+        short_sig = short_sig | retest_short
+
+    # Variant filters
+    if config.trade_session:
+        window = in_session(df.index, config.trade_session)
+        long_sig &= window
+        short_sig &= window
+    if config.htf_rule:
+        htf = _htf_ema(close_s, config.htf_rule, config.htf_len)
+        with np.errstate(invalid='ignore'):
+            long_sig &= close > htf
+            short_sig &= close < htf
+
+    bars_since = orb['ORB_BarsSinceBreak']
+    break_dir = orb['ORB_BreakDir']
+    if config.simple_colorway:
+        long_sig = pine_dedupe(bull_align & (close > fast))
+        short_sig = pine_dedupe(bear_align & (close < fast))
+    else:
+        if config.use_fakeout_gate:
+            long_sig &= ~orb['FakeoutLong']
+            short_sig &= ~orb['FakeoutShort']
+        if config.block_counter_trend:
+            hold = orb['ORB_Complete'] & (bars_since <= config.orb_hold_bars)
+            short_sig &= ~(hold & (break_dir == 1))
+            long_sig &= ~(hold & (break_dir == -1))
+        long_sig &= ~is_chop
+        short_sig &= ~is_chop
+
+    if config.dedupe_signals:
+        long_sig = pine_dedupe(long_sig)
+        short_sig = pine_dedupe(short_sig)
+
+    result = pd.DataFrame({
+        'FastMA': fast,
+        'SlowMA': slow,
+        'RSI': rsi,
+        'BullAlign': bull_align,
+        'BearAlign': bear_align,
+        'IsChop': is_chop,
+        **{k: v for k, v in orb.items()},
+        'ORB_BreakoutBuy': orb['ORB_BreakBar'] & (break_dir == 1),
+        'ORB_BreakoutSell': orb['ORB_BreakBar'] & (break_dir == -1),
+        'ORB_RetestBuy': retest_long,
+        'ORB_RetestSell': retest_short,
+        'ActiveSupplyZones': zones['ActiveSupplyZones'],
+        'ActiveDemandZones': zones['ActiveDemandZones'],
+        'DemandTouchBuy': zones['DemandTouchBuy'],
+        'SupplyTouchSell': zones['SupplyTouchSell'],
+        'AEPBuy': long_sig,
+        'AEPSell': short_sig,
+    }, index=df.index)
+    result.attrs['supply_zones'] = zones['SupplyZones']
+    result.attrs['demand_zones'] = zones['DemandZones']
+    return result
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def main():
+    from rbfx_backtest_enhanced import BacktestConfig, signal_bundle, run_backtest, calculate_metrics
+    from rbfx_v9_backtest import generate_market_data
+
+    print("=" * 70)
+    print("RetailBeastFX - AEP Protocol Engine v1.0")
+    print("=" * 70)
+
+    # Gold-like data: the AEP consolidation thresholds are % based and were tuned on XAUUSD
+    print("\n📊 GENERATING SYNTHETIC DATA...")
+    raw = generate_market_data(bars=5000, base_price=2000.0, volatility=0.002)
+    df = raw.rename(columns=str.capitalize).set_index('Datetime')
+    print(f"   Generated {len(df)} candles")
+
+    # ~10 years of 5m bars for the throughput check
+    big = pd.concat([df] * 150)
+    big.index = pd.date_range(start='2016-01-04', periods=len(big), freq='5min')
+    t0 = time.perf_counter()
+    compute_aep_signals(big, replace(AEP_VARIANTS["Protocol"], instrument="XAUUSD"))
+    print(f"   AEP features on {len(big):,} bars: {time.perf_counter() - t0:.2f}s")
+
+    print(f"\n   {'Variant':10} | {'Strategy':16} | {'Trades':>6} | {'WR':>6} | {'PF':>5} | {'Total R':>8}")
+    print("   " + "-" * 66)
+    for variant, aep in AEP_VARIANTS.items():
+        for strategy in AEP_STRATEGIES:
+            config = BacktestConfig(
+                strategy=strategy,
+                aep_variant=variant,
+                sl_atr_mult=aep.stop_factor,
+                tp_atr_mult=aep.profit_factor,
+                instrument="XAUUSD",
+            )
+            trades, final_balance, equity_curve = run_backtest(signal_bundle(df, config), config)
+            if not trades:
+                print(f"   {variant:10} | {strategy[4:]:16} | {0:>6} |      - |     - |        -")
+                continue
+            m = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
+            print(f"   {variant:10} | {strategy[4:]:16} | {m['total_trades']:>6} | {m['win_rate']:5.1f}% | "
+                  f"{m['profit_factor']:5.2f} | {m['total_r']:+7.1f}R")
+
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,16 @@ import numpy as np
 from datetime import datetime, timedelta
 import yfinance as yf
 
+from rbfx_core import (
+    STYLES,
+    calculate_ema,
+    calculate_atr,
+    calculate_bollinger_bands,
+    sequential_trades,
+    compound_risk,
+    trade_log,
+)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONFIGURATION
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -23,65 +33,21 @@ ADX_THRESHOLD = 25
 # ═══════════════════════════════════════════════════════════════════════════════
 # INDICATOR CALCULATIONS
 # ═══════════════════════════════════════════════════════════════════════════════
-def calculate_ema(series, period):
-    return series.ewm(span=period, adjust=False).mean()
-
-def calculate_sma(series, period):
-    return series.rolling(window=period).mean()
-
-def calculate_atr(df, period=14):
-    high = df['High']
-    low = df['Low']
-    close = df['Close']
-    
-    tr1 = high - low
-    tr2 = abs(high - close.shift())
-    tr3 = abs(low - close.shift())
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    return tr.rolling(window=period).mean()
+# Shared with the other backtesters via rbfx_core; this script's ADX is the
+# |DM| directional-movement variant
+STYLE = STYLES['classic']
 
 def calculate_adx(df, period=14):
     """Calculate ADX indicator"""
-    high = df['High']
-    low = df['Low']
-    close = df['Close']
-    
-    plus_dm = high.diff()
-    minus_dm = low.diff().abs() * -1
-    
-    plus_dm = np.where((plus_dm > minus_dm.abs()) & (plus_dm > 0), plus_dm, 0)
-    minus_dm = np.where((minus_dm.abs() > plus_dm) & (minus_dm < 0), minus_dm.abs(), 0)
-    
-    tr1 = high - low
-    tr2 = abs(high - close.shift())
-    tr3 = abs(low - close.shift())
-    tr = pd.concat([pd.Series(tr1), pd.Series(tr2), pd.Series(tr3)], axis=1).max(axis=1)
-    
-    atr = tr.rolling(window=period).mean()
-    
-    plus_di = 100 * pd.Series(plus_dm).rolling(window=period).mean() / atr
-    minus_di = 100 * pd.Series(minus_dm).rolling(window=period).mean() / atr
-    
-    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di + 0.0001)
-    adx = dx.rolling(window=period).mean()
-    
-    return adx
-
-def calculate_bollinger_bands(series, period=20, mult=1.0):
-    sma = series.rolling(window=period).mean()
-    std = series.rolling(window=period).std()
-    upper = sma + mult * std
-    lower = sma - mult * std
-    return sma, upper, lower
+    return STYLE.adx(df, period)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # SESSION FILTER (Killzones)
 # ═══════════════════════════════════════════════════════════════════════════════
 def is_in_killzone(timestamp):
     """Check if timestamp is in London or NY killzone (EST)"""
-    hour = timestamp.hour
     # London: 3-6 AM EST, NY: 8-11 AM EST
-    return (3 <= hour <= 6) or (8 <= hour <= 11)
+    return STYLE.session_info(timestamp)['killzone']
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # SIGNAL LOGIC
@@ -144,123 +110,14 @@ def run_backtest(df):
     """
     Run backtest with realistic trade management
     """
-    balance = INITIAL_BALANCE
-    trades = []
-    position = None
-    cooldown = 0
-    
-    for i in range(50, len(df)):
-        row = df.iloc[i]
-        
-        # Cooldown between trades
-        if cooldown > 0:
-            cooldown -= 1
-            continue
-        
-        # Skip if already in position
-        if position is not None:
-            # Check SL/TP
-            if position['type'] == 'BUY':
-                if row['Low'] <= position['sl']:
-                    # Stop Loss Hit
-                    pnl = -position['risk_amount']
-                    balance += pnl
-                    trades.append({
-                        'entry_time': position['entry_time'],
-                        'exit_time': row.name,
-                        'type': 'BUY',
-                        'entry': position['entry'],
-                        'exit': position['sl'],
-                        'pnl': pnl,
-                        'result': 'LOSS',
-                        'r_multiple': -1.0
-                    })
-                    position = None
-                    cooldown = 5
-                elif row['High'] >= position['tp']:
-                    # Take Profit Hit
-                    pnl = position['risk_amount'] * (TP_ATR_MULT / SL_ATR_MULT)
-                    balance += pnl
-                    trades.append({
-                        'entry_time': position['entry_time'],
-                        'exit_time': row.name,
-                        'type': 'BUY',
-                        'entry': position['entry'],
-                        'exit': position['tp'],
-                        'pnl': pnl,
-                        'result': 'WIN',
-                        'r_multiple': TP_ATR_MULT / SL_ATR_MULT
-                    })
-                    position = None
-                    cooldown = 5
-            else:  # SELL
-                if row['High'] >= position['sl']:
-                    # Stop Loss Hit
-                    pnl = -position['risk_amount']
-                    balance += pnl
-                    trades.append({
-                        'entry_time': position['entry_time'],
-                        'exit_time': row.name,
-                        'type': 'SELL',
-                        'entry': position['entry'],
-                        'exit': position['sl'],
-                        'pnl': pnl,
-                        'result': 'LOSS',
-                        'r_multiple': -1.0
-                    })
-                    position = None
-                    cooldown = 5
-                elif row['Low'] <= position['tp']:
-                    # Take Profit Hit
-                    pnl = position['risk_amount'] * (TP_ATR_MULT / SL_ATR_MULT)
-                    balance += pnl
-                    trades.append({
-                        'entry_time': position['entry_time'],
-                        'exit_time': row.name,
-                        'type': 'SELL',
-                        'entry': position['entry'],
-                        'exit': position['tp'],
-                        'pnl': pnl,
-                        'result': 'WIN',
-                        'r_multiple': TP_ATR_MULT / SL_ATR_MULT
-                    })
-                    position = None
-                    cooldown = 5
-            continue
-        
-        # Check for new signals
-        atr = row['ATR']
-        if pd.isna(atr) or atr == 0:
-            continue
-            
-        risk_amount = balance * RISK_PER_TRADE
-        
-        if row['BuySignal']:
-            entry = row['Close']
-            sl = entry - (atr * SL_ATR_MULT)
-            tp = entry + (atr * TP_ATR_MULT)
-            position = {
-                'type': 'BUY',
-                'entry': entry,
-                'sl': sl,
-                'tp': tp,
-                'entry_time': row.name,
-                'risk_amount': risk_amount
-            }
-        elif row['SellSignal']:
-            entry = row['Close']
-            sl = entry + (atr * SL_ATR_MULT)
-            tp = entry - (atr * TP_ATR_MULT)
-            position = {
-                'type': 'SELL',
-                'entry': entry,
-                'sl': sl,
-                'tp': tp,
-                'entry_time': row.name,
-                'risk_amount': risk_amount
-            }
-    
-    return trades, balance
+    trades = sequential_trades(
+        df['High'].to_numpy(), df['Low'].to_numpy(), df['Close'].to_numpy(), df['ATR'].to_numpy(),
+        df['BuySignal'].to_numpy(dtype=bool), df['SellSignal'].to_numpy(dtype=bool),
+        SL_ATR_MULT, TP_ATR_MULT, warmup=50, cooldown=5,
+    )
+    r_multiples = np.where(trades['won'], TP_ATR_MULT / SL_ATR_MULT, -1.0)
+    pnls, balance, _ = compound_risk(r_multiples, INITIAL_BALANCE, RISK_PER_TRADE)
+    return trade_log(df.index, trades, pnls, r_multiples), balance
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # MAIN
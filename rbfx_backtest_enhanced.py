@@ -6,10 +6,32 @@ Fully replicates the Pine Script Alpha Edge strategies with proper killzone filt
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, replace
 from enum import Enum
 
+from rbfx_aep_orb import AEP_STRATEGIES, AEP_VARIANTS, compute_aep_signals
+from rbfx_core import (
+    STYLES,
+    WARMUP_BARS,
+    calculate_ema,
+    calculate_sma,
+    calculate_atr,
+    calculate_rsi,
+    calculate_adx,
+    calculate_bollinger_bands,
+    sequential_trades,
+    ladder_sweep,
+    compound_risk,
+    leg_ledger,
+    CostModel,
+    Ladder,
+    InstitutionalRiskEngine,
+    instrument_specs,
+)
+from rbfx_first_touch import IntrabarIndex
+from rbfx_profiler import stage, count, profiled
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONFIGURATION
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -39,10 +61,33 @@ class BacktestConfig:
     adx_period: int = 14
     adx_threshold: int = 25
     
+    # Indicator formulas: "pandas" (historical) or "pine" (ta.atr/ta.rsi/ta.stdev/ta.dmi parity)
+    indicator_backend: str = "pandas"
+    
     # Strategy
-    strategy: str = "All Signals"  # Trend Following, Mean Reversion, Swing Pullbacks, Breakout, All Signals, Original
+    strategy: str = "All Signals"  # Trend Following, Mean Reversion, Swing Pullbacks, Breakout, All Signals, Original, AEP *
     killzone_only: bool = True
     silver_bullet_boost: bool = True  # Prioritize 10-11 AM EST
+    aep_variant: str = "Protocol"  # Protocol, Session, HTF, Optimized, GoldMaster (AEP strategies only)
+    
+    # Execution
+    execution: str = "risk"  # risk = risk_amount * R, lots = InstitutionalRiskEngine sizing
+    instrument: str = "EURUSD"  # INSTRUMENT_SPECS key for lots execution
+    lot_step: float = 0.01
+    min_lot: float = 0.01
+    cooldown: int = 5  # Bars skipped after each exit
+    exit_mode: str = "fixed"  # fixed, atr (chandelier), ema (EMA_Trail), breakeven, ladder
+    trail_atr_mult: float = 3.0  # Chandelier distance from the best price since entry
+    trail_start_r: float = 1.0  # Trail / move to breakeven once price is this many R in profit
+    ladder_fractions: Tuple[float, float, float] = (0.5, 0.3, 0.2)  # Closed at 1R / 2R / 3.5R
+    ladder_move_stop: bool = True  # Move the rest's stop after the 1R fill...
+    ladder_stop_r: float = 0.0  # ...to entry + this many R (0 = breakeven)
+    
+    # Trading costs (all zero = frictionless; rbfx_core.COST_PROFILES has typical values)
+    spread_pips: float = 0.0  # Paid at entry
+    session_spreads: bool = False  # Scale the spread by entry session (Asian widest)
+    slippage_atr: float = 0.0  # Entry and stop fills slip this fraction of ATR
+    commission_per_lot: float = 0.0  # Round turn, per standard lot
 
 class Strategy(Enum):
     TREND_FOLLOWING = "Trend Following"
@@ -51,6 +96,10 @@ class Strategy(Enum):
     BREAKOUT = "Breakout"
     ALL_SIGNALS = "All Signals"
     ORIGINAL = "Original"
+    AEP_PROTOCOL = "AEP Protocol"
+    AEP_ORB_BREAKOUT = "AEP ORB Breakout"
+    AEP_ORB_RETEST = "AEP ORB Retest"
+    AEP_SD_ZONES = "AEP S/D Zones"
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # SYNTHETIC DATA GENERATOR
@@ -123,76 +172,19 @@ def generate_realistic_data(n_candles: int = 5000, start_price: float = 1.0850,
     
     return df
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# INDICATOR CALCULATIONS
-# ═══════════════════════════════════════════════════════════════════════════════
-def calculate_ema(series: pd.Series, period: int) -> pd.Series:
-    return series.ewm(span=period, adjust=False).mean()
-
-def calculate_sma(series: pd.Series, period: int) -> pd.Series:
-    return series.rolling(window=period).mean()
-
-def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    tr1 = df['High'] - df['Low']
-    tr2 = abs(df['High'] - df['Close'].shift())
-    tr3 = abs(df['Low'] - df['Close'].shift())
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    return tr.rolling(window=period).mean()
-
-def calculate_rsi(series: pd.Series, period: int = 14) -> pd.Series:
-    delta = series.diff()
-    gain = delta.where(delta > 0, 0).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / (loss + 1e-10)
-    return 100 - (100 / (1 + rs))
-
-def calculate_adx(df: pd.DataFrame, period: int = 14) -> pd.Series:
-    """Simplified ADX calculation."""
-    high = df['High'].values
-    low = df['Low'].values
-    close = df['Close'].values
-    
-    n = len(close)
-    adx = np.zeros(n)
-    
-    for i in range(period * 2, n):
-        # Directional movement
-        ups = sum(1 for j in range(i-period, i) if close[j] > close[j-1])
-        dm = abs(ups - (period - ups)) / period
-        
-        # Range-based volatility
-        avg_range = np.mean(high[i-period:i] - low[i-period:i])
-        avg_close_range = np.mean(np.abs(np.diff(close[i-period:i])))
-        
-        if avg_range > 0:
-            adx[i] = (dm * 50) + (avg_close_range / avg_range) * 25
-    
-    return pd.Series(adx, index=df.index)
-
-def calculate_bollinger_bands(series: pd.Series, period: int = 20, mult: float = 1.0) -> Tuple[pd.Series, pd.Series, pd.Series]:
-    sma = series.rolling(window=period).mean()
-    std = series.rolling(window=period).std()
-    upper = sma + mult * std
-    lower = sma - mult * std
-    return sma, upper, lower
-
 # ═══════════════════════════════════════════════════════════════════════════════
 # KILLZONE DETECTION
 # ═══════════════════════════════════════════════════════════════════════════════
+# Indicators (calculate_ema, calculate_atr, calculate_adx, ...) come from rbfx_core
+STYLE = STYLES['enhanced']
+
 def get_session_info(timestamp: pd.Timestamp) -> Dict[str, bool]:
     """Get session information for a given timestamp (assumes EST)."""
-    hour = timestamp.hour
-    minute = timestamp.minute
-    
-    return {
-        'london': 3 <= hour <= 6,
-        'ny_am': 8 <= hour <= 11,
-        'ny_pm': 13 <= hour <= 16,
-        'silver_bullet': 10 <= hour <= 11,
-        'power_hour': 9 <= hour <= 10,
-        'asian': 19 <= hour <= 23 or 0 <= hour <= 2,
-        'valid_session': 3 <= hour <= 16,  # Any major session
-    }
+    return STYLE.session_info(timestamp)
+
+def get_session_flags(index: pd.DatetimeIndex) -> Dict[str, np.ndarray]:
+    """Vectorized get_session_info for a whole DatetimeIndex."""
+    return STYLE.sessions(index)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # ORDER BLOCK DETECTION (Simplified)
@@ -266,188 +258,355 @@ def detect_fvgs(df: pd.DataFrame, atr: pd.Series) -> Tuple[List[Dict], List[Dict
 # ═══════════════════════════════════════════════════════════════════════════════
 # ALPHA EDGE SIGNAL GENERATION
 # ═══════════════════════════════════════════════════════════════════════════════
+# Setup types, as stored in SignalBundle.setup (priority: silver bullet > best > normal)
+SETUP_TYPES = ('normal', 'best', 'silver_bullet')
+SETUP_NORMAL, SETUP_BEST, SETUP_SILVER_BULLET = 0, 1, 2
+
+class SignalColumns(dict):
+    """Computed columns keyed by name; missing keys read through to the input bars.
+    
+    Lets the signal code index columns as before without writing into (or
+    copying) the caller's frame.
+    """
+    
+    def __init__(self, bars: pd.DataFrame):
+        super().__init__()
+        self.bars = bars
+    
+    def __missing__(self, key):
+        return self.bars[key]
+    
+    def add_sessions(self, index: pd.DatetimeIndex):
+        sessions = get_session_flags(index)
+        self['InLondon'] = pd.Series(sessions['london'], index=index)
+        self['InNY'] = pd.Series(sessions['ny_am'], index=index)
+        self['InSilverBullet'] = pd.Series(sessions['silver_bullet'], index=index)
+        self['ValidSession'] = pd.Series(sessions['valid_session'], index=index)
+
+@dataclass
+class SignalBundle:
+    """What the fast engines need from generate_signals, as flat arrays.
+    
+    Price arrays are zero-copy views of the input bars where their dtype
+    allows; `source` keeps a reference to those bars (never modified).
+    """
+    index: pd.Index
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    atr: np.ndarray
+    buy: np.ndarray  # bool
+    sell: np.ndarray  # bool
+    setup: np.ndarray  # int8 index into SETUP_TYPES
+    diagnostics: Dict[str, np.ndarray]
+    source: Optional[pd.DataFrame] = None
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    @classmethod
+    def from_columns(cls, bars: pd.DataFrame, cols, diagnostics: Tuple[str, ...] = ()) -> 'SignalBundle':
+        """Bundle from a signal frame or SignalColumns (missing setup columns = normal)."""
+        n = len(bars)
+        present = cols.keys() if isinstance(cols, SignalColumns) else cols.columns
+        
+        def flag(*names):
+            out = np.zeros(n, dtype=bool)
+            for c in names:
+                if c in present:
+                    out |= np.asarray(cols[c], dtype=bool)
+            return out
+        
+        setup = np.where(flag('SilverBulletBuy', 'SilverBulletSell'), SETUP_SILVER_BULLET,
+                         np.where(flag('BestBuySetup', 'BestSellSetup'), SETUP_BEST, SETUP_NORMAL))
+        return cls(
+            index=bars.index,
+            high=bars['High'].to_numpy(dtype=np.float64),
+            low=bars['Low'].to_numpy(dtype=np.float64),
+            close=bars['Close'].to_numpy(dtype=np.float64),
+            atr=np.asarray(cols['ATR'], dtype=np.float64),
+            buy=np.asarray(cols['BuySignal'], dtype=bool),
+            sell=np.asarray(cols['SellSignal'], dtype=bool),
+            setup=setup.astype(np.int8),
+            diagnostics={name: np.asarray(cols[name]) for name in diagnostics},
+            source=bars,
+        )
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'SignalBundle':
+        """Bundle view of a generate_signals frame."""
+        return cls.from_columns(df, df)
+    
+    def slice(self, start: int, end: int) -> 'SignalBundle':
+        """Bars [start, end) as views (source is kept whole, for fingerprinting)."""
+        rows = slice(start, end)
+        return SignalBundle(
+            index=self.index[rows],
+            high=self.high[rows],
+            low=self.low[rows],
+            close=self.close[rows],
+            atr=self.atr[rows],
+            buy=self.buy[rows],
+            sell=self.sell[rows],
+            setup=self.setup[rows],
+            diagnostics={k: v[rows] for k, v in self.diagnostics.items()},
+            source=self.source,
+        )
+
+def signal_columns(df: pd.DataFrame, config: BacktestConfig) -> SignalColumns:
+    """All generate_signals columns for config, without touching df."""
+    if config.strategy in AEP_STRATEGIES:
+        return _aep_signal_columns(df, config)
+    return _alpha_signal_columns(df, config)
+
+@profiled()
 def generate_signals(df: pd.DataFrame, config: BacktestConfig) -> pd.DataFrame:
-    """Generate trading signals based on Alpha Edge strategies."""
+    """Generate trading signals based on Alpha Edge strategies.
+    
+    Adds every indicator/condition/signal column to df and returns it. Sweeps
+    that only need entries should use signal_bundle, which leaves df alone.
+    """
+    for name, values in signal_columns(df, config).items():
+        df[name] = values
+    return df
+
+@profiled()
+def signal_bundle(df: pd.DataFrame, config: BacktestConfig,
+                  diagnostics: Tuple[str, ...] = ()) -> SignalBundle:
+    """Copy-free generate_signals: df is read-only, only entry arrays are kept.
+    
+    Intermediate columns are dropped as soon as the bundle is built; name any
+    you still want (e.g. ('ADX', 'RSI')) in `diagnostics`.
+    """
+    return SignalBundle.from_columns(df, signal_columns(df, config), diagnostics)
+
+def _alpha_signal_columns(df: pd.DataFrame, config: BacktestConfig) -> SignalColumns:
+    """Alpha Edge indicator, condition and signal columns (df is only read)."""
+    d = SignalColumns(df)
     
     # Calculate indicators
-    df['EMA_Fast'] = calculate_ema(df['Close'], config.ema_fast)
-    df['EMA_Slow'] = calculate_ema(df['Close'], config.ema_slow)
-    df['EMA_Trend'] = calculate_ema(df['Close'], config.ema_trend)
-    df['EMA_Trail'] = calculate_ema(df['Close'], config.ema_trail)
-    
-    df['BB_Mid'], df['BB_Upper'], df['BB_Lower'] = calculate_bollinger_bands(
-        df['Close'], config.bb_period, config.bb_mult
-    )
-    
-    df['ATR'] = calculate_atr(df, 14)
-    df['RSI'] = calculate_rsi(df['Close'], config.rsi_period)
-    df['ADX'] = calculate_adx(df, config.adx_period)
-    
-    # Trend conditions
-    df['BullTrend'] = df['EMA_Fast'] > df['EMA_Slow']
-    df['BearTrend'] = df['EMA_Fast'] < df['EMA_Slow']
-    df['AboveTrend'] = df['Close'] > df['EMA_Trend']
-    df['BelowTrend'] = df['Close'] < df['EMA_Trend']
-    
-    # BB conditions
-    df['TouchedLowerBB'] = df['Low'] <= df['BB_Lower']
-    df['TouchedUpperBB'] = df['High'] >= df['BB_Upper']
-    
-    # BB Squeeze (for breakout)
-    df['BB_Width'] = (df['BB_Upper'] - df['BB_Lower']) / df['BB_Mid']
-    df['BB_Squeeze'] = df['BB_Width'] < df['BB_Width'].rolling(20).mean()
-    
-    # Candle type
-    df['BullCandle'] = df['Close'] > df['Open']
-    df['BearCandle'] = df['Close'] < df['Open']
-    
-    # RSI conditions
-    df['RSI_Oversold'] = df['RSI'] < config.rsi_oversold
-    df['RSI_Overbought'] = df['RSI'] > config.rsi_overbought
-    
-    # Pullback zone (between EMAs)
-    df['PullbackZone'] = (df['Close'] < df['EMA_Fast']) & (df['Close'] > df['EMA_Slow'])
-    
-    # Volume analysis
-    df['VolMA'] = df['Volume'].rolling(20).mean()
-    df['HighVol'] = df['Volume'] > df['VolMA'] * 1.5
-    
-    # Session info
-    df['InLondon'] = df.index.to_series().apply(lambda x: get_session_info(x)['london'])
-    df['InNY'] = df.index.to_series().apply(lambda x: get_session_info(x)['ny_am'])
-    df['InSilverBullet'] = df.index.to_series().apply(lambda x: get_session_info(x)['silver_bullet'])
-    df['ValidSession'] = df.index.to_series().apply(lambda x: get_session_info(x)['valid_session'])
-    
-    # ═══════════════════════════════════════════════════════════════════════════
-    # ALPHA EDGE STRATEGIES
-    # ═══════════════════════════════════════════════════════════════════════════
-    
-    # 1. TREND FOLLOWING: Strong directional with momentum
-    df['AlphaTrendBuy'] = (
-        df['BullTrend'] & 
-        df['AboveTrend'] & 
-        df['BullCandle'] & 
-        (df['RSI'] > 50) & 
-        (df['RSI'] < 70)
-    )
-    df['AlphaTrendSell'] = (
-        df['BearTrend'] & 
-        df['BelowTrend'] & 
-        df['BearCandle'] & 
-        (df['RSI'] < 50) & 
-        (df['RSI'] > 30)
-    )
-    
-    # 2. MEAN REVERSION: RSI extreme + BB touch + recovery
-    df['AlphaMeanRevBuy'] = (
-        df['RSI_Oversold'] & 
-        df['TouchedLowerBB'] & 
-        df['BullCandle']
-    )
-    df['AlphaMeanRevSell'] = (
-        df['RSI_Overbought'] & 
-        df['TouchedUpperBB'] & 
-        df['BearCandle']
-    )
-    
-    # 3. SWING PULLBACKS: Trend + pullback + recovery
-    df['AlphaPullbackBuy'] = (
-        df['AboveTrend'] & 
-        df['BullTrend'] & 
-        df['PullbackZone'].shift(1) &  # Was in pullback
-        (df['Close'] > df['EMA_Fast'])  # Now recovered
-    )
-    df['AlphaPullbackSell'] = (
-        df['BelowTrend'] & 
-        df['BearTrend'] & 
-        (df['Close'].shift(1) > df['EMA_Fast'].shift(1)) &  # Was above fast EMA
-        (df['Close'] < df['EMA_Fast'])  # Now below
-    )
-    
-    # 4. BREAKOUT: BB Squeeze → Expansion
-    df['AlphaBreakoutBuy'] = (
-        df['BB_Squeeze'].shift(1) & 
-        (df['Close'] > df['BB_Upper']) & 
-        df['BullCandle']
-    )
-    df['AlphaBreakoutSell'] = (
-        df['BB_Squeeze'].shift(1) & 
-        (df['Close'] < df['BB_Lower']) & 
-        df['BearCandle']
-    )
-    
-    # ORIGINAL: BB-based signals
-    df['OriginalBuy'] = (
-        df['BullCandle'] & 
-        df['TouchedLowerBB'] & 
-        df['BullTrend']
-    )
-    df['OriginalSell'] = (
-        df['BearCandle'] & 
-        df['TouchedUpperBB'] & 
-        df['BearTrend']
-    )
-    
-    # ═══════════════════════════════════════════════════════════════════════════
-    # STRATEGY SELECTION
-    # ═══════════════════════════════════════════════════════════════════════════
-    strategy = config.strategy
-    
-    if strategy == "Trend Following":
-        df['RawBuySignal'] = df['AlphaTrendBuy']
-        df['RawSellSignal'] = df['AlphaTrendSell']
-    elif strategy == "Mean Reversion":
-        df['RawBuySignal'] = df['AlphaMeanRevBuy']
-        df['RawSellSignal'] = df['AlphaMeanRevSell']
-    elif strategy == "Swing Pullbacks":
-        df['RawBuySignal'] = df['AlphaPullbackBuy']
-        df['RawSellSignal'] = df['AlphaPullbackSell']
-    elif strategy == "Breakout":
-        df['RawBuySignal'] = df['AlphaBreakoutBuy']
-        df['RawSellSignal'] = df['AlphaBreakoutSell']
-    elif strategy == "All Signals":
-        df['RawBuySignal'] = (
-            df['AlphaTrendBuy'] | 
-            df['AlphaMeanRevBuy'] | 
-            df['AlphaPullbackBuy'] | 
-            df['AlphaBreakoutBuy']
+    with stage("indicator.ema"):
+        d['EMA_Fast'] = calculate_ema(d['Close'], config.ema_fast)
+        d['EMA_Slow'] = calculate_ema(d['Close'], config.ema_slow)
+        d['EMA_Trend'] = calculate_ema(d['Close'], config.ema_trend)
+        d['EMA_Trail'] = calculate_ema(d['Close'], config.ema_trail)
+    
+    with stage("indicator.bollinger"):
+        d['BB_Mid'], d['BB_Upper'], d['BB_Lower'] = calculate_bollinger_bands(
+            d['Close'], config.bb_period, config.bb_mult, config.indicator_backend
+        )
+    
+    with stage("indicator.atr"):
+        d['ATR'] = calculate_atr(df, 14, config.indicator_backend)
+    with stage("indicator.rsi"):
+        d['RSI'] = calculate_rsi(d['Close'], config.rsi_period, config.indicator_backend)
+    with stage("indicator.adx"):
+        d['ADX'] = calculate_adx(df, config.adx_period, backend=config.indicator_backend)
+    
+    with stage("signals.conditions"):
+        # Trend conditions
+        d['BullTrend'] = d['EMA_Fast'] > d['EMA_Slow']
+        d['BearTrend'] = d['EMA_Fast'] < d['EMA_Slow']
+        d['AboveTrend'] = d['Close'] > d['EMA_Trend']
+        d['BelowTrend'] = d['Close'] < d['EMA_Trend']
+    
+        # BB conditions
+        d['TouchedLowerBB'] = d['Low'] <= d['BB_Lower']
+        d['TouchedUpperBB'] = d['High'] >= d['BB_Upper']
+    
+        # BB Squeeze (for breakout)
+        d['BB_Width'] = (d['BB_Upper'] - d['BB_Lower']) / d['BB_Mid']
+        d['BB_Squeeze'] = d['BB_Width'] < d['BB_Width'].rolling(20).mean()
+    
+        # Candle type
+        d['BullCandle'] = d['Close'] > d['Open']
+        d['BearCandle'] = d['Close'] < d['Open']
+    
+        # RSI conditions
+        d['RSI_Oversold'] = d['RSI'] < config.rsi_oversold
+        d['RSI_Overbought'] = d['RSI'] > config.rsi_overbought
+    
+        # Pullback zone (between EMAs)
+        d['PullbackZone'] = (d['Close'] < d['EMA_Fast']) & (d['Close'] > d['EMA_Slow'])
+    
+        # Volume analysis
+        d['VolMA'] = d['Volume'].rolling(20).mean()
+        d['HighVol'] = d['Volume'] > d['VolMA'] * 1.5
+    
+    with stage("signals.sessions"):
+        # Session info
+        d.add_sessions(df.index)
+    
+    with stage("signals.strategies"):
+        # ═══════════════════════════════════════════════════════════════════════════
+        # ALPHA EDGE STRATEGIES
+        # ═══════════════════════════════════════════════════════════════════════════
+    
+        # 1. TREND FOLLOWING: Strong directional with momentum
+        d['AlphaTrendBuy'] = (
+            d['BullTrend'] & 
+            d['AboveTrend'] & 
+            d['BullCandle'] & 
+            (d['RSI'] > 50) & 
+            (d['RSI'] < 70)
+        )
+        d['AlphaTrendSell'] = (
+            d['BearTrend'] & 
+            d['BelowTrend'] & 
+            d['BearCandle'] & 
+            (d['RSI'] < 50) & 
+            (d['RSI'] > 30)
+        )
+    
+        # 2. MEAN REVERSION: RSI extreme + BB touch + recovery
+        d['AlphaMeanRevBuy'] = (
+            d['RSI_Oversold'] & 
+            d['TouchedLowerBB'] & 
+            d['BullCandle']
+        )
+        d['AlphaMeanRevSell'] = (
+            d['RSI_Overbought'] & 
+            d['TouchedUpperBB'] & 
+            d['BearCandle']
+        )
+    
+        # 3. SWING PULLBACKS: Trend + pullback + recovery
+        d['AlphaPullbackBuy'] = (
+            d['AboveTrend'] & 
+            d['BullTrend'] & 
+            d['PullbackZone'].shift(1) &  # Was in pullback
+            (d['Close'] > d['EMA_Fast'])  # Now recovered
         )
-        df['RawSellSignal'] = (
-            df['AlphaTrendSell'] | 
-            df['AlphaMeanRevSell'] | 
-            df['AlphaPullbackSell'] | 
-            df['AlphaBreakoutSell']
+        d['AlphaPullbackSell'] = (
+            d['BelowTrend'] & 
+            d['BearTrend'] & 
+            (d['Close'].shift(1) > d['EMA_Fast'].shift(1)) &  # Was above fast EMA
+            (d['Close'] < d['EMA_Fast'])  # Now below
         )
-    else:  # Original
-        df['RawBuySignal'] = df['OriginalBuy']
-        df['RawSellSignal'] = df['OriginalSell']
     
-    # Apply killzone filter
+        # 4. BREAKOUT: BB Squeeze → Expansion
+        d['AlphaBreakoutBuy'] = (
+            d['BB_Squeeze'].shift(1) & 
+            (d['Close'] > d['BB_Upper']) & 
+            d['BullCandle']
+        )
+        d['AlphaBreakoutSell'] = (
+            d['BB_Squeeze'].shift(1) & 
+            (d['Close'] < d['BB_Lower']) & 
+            d['BearCandle']
+        )
+    
+        # ORIGINAL: BB-based signals
+        d['OriginalBuy'] = (
+            d['BullCandle'] & 
+            d['TouchedLowerBB'] & 
+            d['BullTrend']
+        )
+        d['OriginalSell'] = (
+            d['BearCandle'] & 
+            d['TouchedUpperBB'] & 
+            d['BearTrend']
+        )
+    
+    with stage("signals.selection"):
+        # ═══════════════════════════════════════════════════════════════════════════
+        # STRATEGY SELECTION
+        # ═══════════════════════════════════════════════════════════════════════════
+        strategy = config.strategy
+    
+        if strategy == "Trend Following":
+            d['RawBuySignal'] = d['AlphaTrendBuy']
+            d['RawSellSignal'] = d['AlphaTrendSell']
+        elif strategy == "Mean Reversion":
+            d['RawBuySignal'] = d['AlphaMeanRevBuy']
+            d['RawSellSignal'] = d['AlphaMeanRevSell']
+        elif strategy == "Swing Pullbacks":
+            d['RawBuySignal'] = d['AlphaPullbackBuy']
+            d['RawSellSignal'] = d['AlphaPullbackSell']
+        elif strategy == "Breakout":
+            d['RawBuySignal'] = d['AlphaBreakoutBuy']
+            d['RawSellSignal'] = d['AlphaBreakoutSell']
+        elif strategy == "All Signals":
+            d['RawBuySignal'] = (
+                d['AlphaTrendBuy'] | 
+                d['AlphaMeanRevBuy'] | 
+                d['AlphaPullbackBuy'] | 
+                d['AlphaBreakoutBuy']
+            )
+            d['RawSellSignal'] = (
+                d['AlphaTrendSell'] | 
+                d['AlphaMeanRevSell'] | 
+                d['AlphaPullbackSell'] | 
+                d['AlphaBreakoutSell']
+            )
+        else:  # Original
+            d['RawBuySignal'] = d['OriginalBuy']
+            d['RawSellSignal'] = d['OriginalSell']
+    
+        # Apply killzone filter
+        if config.killzone_only:
+            d['BuySignal'] = d['RawBuySignal'] & d['ValidSession']
+            d['SellSignal'] = d['RawSellSignal'] & d['ValidSession']
+        else:
+            d['BuySignal'] = d['RawBuySignal']
+            d['SellSignal'] = d['RawSellSignal']
+    
+        # Best setup detection (multi-confluence)
+        d['BestBuySetup'] = (
+            d['BuySignal'] & 
+            d['TouchedLowerBB'] & 
+            (d['InLondon'] | d['InNY']) & 
+            d['HighVol']
+        )
+        d['BestSellSetup'] = (
+            d['SellSignal'] & 
+            d['TouchedUpperBB'] & 
+            (d['InLondon'] | d['InNY']) & 
+            d['HighVol']
+        )
+    
+        # Silver Bullet bonus (higher confidence in 10-11 AM)
+        d['SilverBulletBuy'] = d['BuySignal'] & d['InSilverBullet']
+        d['SilverBulletSell'] = d['SellSignal'] & d['InSilverBullet']
+    
+    return d
+
+def _aep_signal_columns(df: pd.DataFrame, config: BacktestConfig) -> SignalColumns:
+    """Signal columns for the AEP Protocol strategies (ORB, S/D zones).
+    
+    Only ATR, session flags and the AEP engine are computed, so long 5m
+    histories are not slowed down by the Alpha Edge indicator set.
+    """
+    d = SignalColumns(df)
+    aep = compute_aep_signals(df, replace(AEP_VARIANTS[config.aep_variant], instrument=config.instrument))
+    buy_col, sell_col = AEP_STRATEGIES[config.strategy]
+    
+    d['ATR'] = calculate_atr(df, 14, config.indicator_backend)
+    for col in aep.columns:
+        d[col] = aep[col]
+    
+    d.add_sessions(df.index)
+    
+    d['RawBuySignal'] = d[buy_col]
+    d['RawSellSignal'] = d[sell_col]
+    
     if config.killzone_only:
-        df['BuySignal'] = df['RawBuySignal'] & df['ValidSession']
-        df['SellSignal'] = df['RawSellSignal'] & df['ValidSession']
+        d['BuySignal'] = d['RawBuySignal'] & d['ValidSession']
+        d['SellSignal'] = d['RawSellSignal'] & d['ValidSession']
     else:
-        df['BuySignal'] = df['RawBuySignal']
-        df['SellSignal'] = df['RawSellSignal']
-    
-    # Best setup detection (multi-confluence)
-    df['BestBuySetup'] = (
-        df['BuySignal'] & 
-        df['TouchedLowerBB'] & 
-        (df['InLondon'] | df['InNY']) & 
-        df['HighVol']
-    )
-    df['BestSellSetup'] = (
-        df['SellSignal'] & 
-        df['TouchedUpperBB'] & 
-        (df['InLondon'] | df['InNY']) & 
-        df['HighVol']
-    )
-    
-    # Silver Bullet bonus (higher confidence in 10-11 AM)
-    df['SilverBulletBuy'] = df['BuySignal'] & df['InSilverBullet']
-    df['SilverBulletSell'] = df['SellSignal'] & df['InSilverBullet']
+        d['BuySignal'] = d['RawBuySignal']
+        d['SellSignal'] = d['RawSellSignal']
+    
+    d['SilverBulletBuy'] = d['BuySignal'] & d['InSilverBullet']
+    d['SilverBulletSell'] = d['SellSignal'] & d['InSilverBullet']
     
+    return d
+
+@profiled()
+def generate_aep_signals(df: pd.DataFrame, config: BacktestConfig) -> pd.DataFrame:
+    """Generate signals for the AEP Protocol strategies (adds columns to df)."""
+    for name, values in _aep_signal_columns(df, config).items():
+        df[name] = values
     return df
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -465,11 +624,17 @@ class Trade:
     pnl: float
     r_multiple: float
     result: str  # 'WIN', 'LOSS', 'OPEN'
-    setup_type: str  # 'normal', 'best', 'silver_bullet'
+    setup_type: str  # 'normal', 'best', 'silver_bullet' ('ob' / 'fvg' for rbfx_limit_orders)
 
 
+@profiled()
 def run_backtest(df: pd.DataFrame, config: BacktestConfig) -> Tuple[List[Trade], float, List[float]]:
     """Run backtest with trade management."""
+    if (config.execution != "risk" or isinstance(df, SignalBundle) or config.exit_mode != "fixed"
+            or not CostModel.from_config(config).free):
+        return run_backtest_fast(df, config)
+    count("run_backtest.bars", max(0, len(df) - 250))
+    
     balance = config.initial_balance
     trades: List[Trade] = []
     equity_curve = [balance]
@@ -508,7 +673,7 @@ def run_backtest(df: pd.DataFrame, config: BacktestConfig) -> Tuple[List[Trade],
                         setup_type=position['setup_type']
                     ))
                     position = None
-                    cooldown = 5
+                    cooldown = config.cooldown
                     equity_curve.append(balance)
                 elif row['High'] >= position['tp']:
                     # Take Profit Hit
@@ -529,7 +694,7 @@ def run_backtest(df: pd.DataFrame, config: BacktestConfig) -> Tuple[List[Trade],
                         setup_type=position['setup_type']
                     ))
                     position = None
-                    cooldown = 5
+                    cooldown = config.cooldown
                     equity_curve.append(balance)
             else:  # SELL
                 if row['High'] >= position['sl']:
@@ -549,7 +714,7 @@ def run_backtest(df: pd.DataFrame, config: BacktestConfig) -> Tuple[List[Trade],
                         setup_type=position['setup_type']
                     ))
                     position = None
-                    cooldown = 5
+                    cooldown = config.cooldown
                     equity_curve.append(balance)
                 elif row['Low'] <= position['tp']:
                     r_mult = config.tp_atr_mult / config.sl_atr_mult
@@ -569,7 +734,7 @@ def run_backtest(df: pd.DataFrame, config: BacktestConfig) -> Tuple[List[Trade],
                         setup_type=position['setup_type']
                     ))
                     position = None
-                    cooldown = 5
+                    cooldown = config.cooldown
                     equity_curve.append(balance)
             continue
         
@@ -611,8 +776,179 @@ def run_backtest(df: pd.DataFrame, config: BacktestConfig) -> Tuple[List[Trade],
                 'setup_type': setup_type
             }
     
+    count("run_backtest.trades", len(trades))
+    return trades, balance, equity_curve
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FAST (ARRAY-BASED) BACKTESTER
+# ═══════════════════════════════════════════════════════════════════════════════
+def _engine_trades(bundle: SignalBundle, config: BacktestConfig,
+                   intrabar: Optional[IntrabarIndex] = None) -> Dict[str, np.ndarray]:
+    """sequential_trades with the config's exit settings."""
+    ema = calculate_ema(pd.Series(bundle.close), config.ema_trail).to_numpy() if config.exit_mode == "ema" else None
+    ladder = Ladder.from_config(config) if config.exit_mode == "ladder" else None
+    return sequential_trades(bundle.high, bundle.low, bundle.close, bundle.atr, bundle.buy, bundle.sell,
+                             config.sl_atr_mult, config.tp_atr_mult,
+                             warmup=WARMUP_BARS, cooldown=config.cooldown, intrabar=intrabar,
+                             exit_mode=config.exit_mode, trail_mult=config.trail_atr_mult,
+                             trail_start_r=config.trail_start_r, ema=ema, ladder=ladder)
+
+@profiled()
+def run_backtest_fast(df: Union[pd.DataFrame, SignalBundle], config: BacktestConfig,
+                      intrabar: Optional[IntrabarIndex] = None) -> Tuple[List[Trade], float, List[float]]:
+    """Array-based equivalent of run_backtest (on a signal frame or SignalBundle).
+    
+    SL/TP for every signal bar is resolved at once with the forward scanner,
+    then only the signal bars are walked to apply one-position-at-a-time and
+    the exit cooldown. execution="risk" reproduces run_backtest exactly;
+    execution="lots" sizes each entry with InstitutionalRiskEngine (rounded
+    down to lot_step, at least min_lot) and books pips moved x lots x the
+    USD pip value per lot (InstitutionalRiskEngine.pip_values).
+    
+    Bars that touch both SL and TP are booked as stops, like run_backtest;
+    pass an IntrabarIndex of 1m/tick data to settle them by which level the
+    lower timeframe reached first. Spread, slippage and commission from the
+    config's cost fields (rbfx_core.CostModel) are charged per trade;
+    entry_price / exit_price are then the fill prices. exit_mode trails the
+    stop (ATR chandelier, the ema_trail EMA, or breakeven) once the trade
+    is trail_start_r in profit, and "ladder" scales out at 1R / 2R / 3.5R
+    (ladder_* fields; ladder_ledger has the legs). Trailed and laddered
+    trades book their actual R; a laddered trade's exit_price is the
+    fraction-weighted fill.
+    """
+    with stage("fast.columns"):
+        bundle = df if isinstance(df, SignalBundle) else SignalBundle.from_frame(df)
+    engine = _engine_trades(bundle, config, intrabar)
+    return book_trades(bundle.index, bundle.atr, config, engine, bundle.setup[engine['entry_idx']], SETUP_TYPES)
+
+def run_ladder_sweep(df: Union[pd.DataFrame, SignalBundle], config: BacktestConfig,
+                     fractions: List[Tuple[float, ...]],
+                     intrabar: Optional[IntrabarIndex] = None) -> List[Tuple[List[Trade], float, List[float]]]:
+    """run_backtest_fast under exit_mode="ladder" for each fraction split.
+    
+    The ladder legs are resolved once (rbfx_core.ladder_sweep) and every
+    split is priced on them, so a table of N splits costs one exit
+    resolution plus N trade walks. Results match N run_backtest_fast calls
+    with ladder_fractions set to each split.
+    """
+    bundle = df if isinstance(df, SignalBundle) else SignalBundle.from_frame(df)
+    configs = [replace(config, exit_mode="ladder", ladder_fractions=tuple(f)) for f in fractions]
+    engines = ladder_sweep(bundle.high, bundle.low, bundle.close, bundle.atr, bundle.buy, bundle.sell,
+                           config.sl_atr_mult, [Ladder.from_config(c) for c in configs],
+                           warmup=WARMUP_BARS, cooldown=config.cooldown, intrabar=intrabar)
+    return [book_trades(bundle.index, bundle.atr, c, engine, bundle.setup[engine['entry_idx']], SETUP_TYPES)
+            for c, engine in zip(configs, engines)]
+
+def book_trades(index: pd.DatetimeIndex, atr: np.ndarray, config: BacktestConfig,
+                engine: Dict[str, np.ndarray], setup: np.ndarray,
+                setup_types: Tuple[str, ...]) -> Tuple[List[Trade], float, List[float]]:
+    """Costs, sizing and Trade records for sequential_trades-style arrays.
+    
+    Shared by run_backtest_fast and the limit-order engine. setup holds a
+    code per trade, named by setup_types. Lots are sized for a stop of
+    sl_atr_mult x ATR at entry, or for engine['risk'] when the entry
+    engine sets its own stop distance. Entries flagged by
+    engine['limit_entry'] are charged the spread without entry slippage.
+    """
+    entry_idx, exit_idx = engine['entry_idx'], engine['exit_idx']
+    is_buy, sign, won = engine['is_buy'], engine['sign'], engine['won']
+    entry, sl, tp, exit_price = engine['entry'], engine['sl'], engine['tp'], engine['exit_price']
+    count("fast.trades", len(entry_idx))
+    
+    if config.exit_mode != "fixed":
+        trail_r = sign * (exit_price - entry) / np.abs(entry - sl)
+    
+    costs = CostModel.from_config(config)
+    if not costs.free:
+        with stage("fast.costs"):
+            pip_size, pip_value = instrument_specs(config.instrument, entry)
+            entry_times = index[entry_idx]
+            stopped, limit_entry = engine['stopped'], engine.get('limit_entry', False)
+            cost_r = costs.cost_r(entry_times, atr[entry_idx], stopped, np.abs(entry - sl), pip_size, pip_value,
+                                  limit_entry)
+            entry_cost, exit_cost = costs.price_costs(entry_times, atr[entry_idx], stopped, pip_size, limit_entry)
+            entry = entry + sign * entry_cost
+            exit_price = exit_price - sign * exit_cost
+    
+    with stage("fast.pnl"):
+        if config.execution == "lots":
+            balance = config.initial_balance
+            equity_curve = [balance]
+            pnls = np.empty(len(entry_idx))
+            r_mults = np.empty(len(entry_idx))
+            
+            # Balance-independent parts sized in one vectorized call
+            if 'risk' in engine:
+                stop_atr, stop_mult = engine['risk'], 1.0
+            else:
+                stop_atr, stop_mult = atr[entry_idx], config.sl_atr_mult
+            sizes = InstitutionalRiskEngine.calculate_lot_sizes(
+                balance=1.0,
+                risk_pct=config.risk_per_trade * 100,
+                atr=stop_atr,
+                sl_atr_mult=stop_mult,
+                entry_price=entry,
+                instrument=config.instrument,
+                direction=sign,
+            )
+            # An SL hit costs sl_pips * pip_value per standard lot
+            pip_size, pip_value = instrument_specs(config.instrument, entry)
+            lots_per_dollar = sizes['risk_amount'] / (sizes['sl_pips'] * pip_value)
+            pnl_per_lot = (exit_price - entry) * sign / pip_size * pip_value
+        
+            # Compounding needs the running balance, so only this walk is sequential
+            for k in range(len(entry_idx)):
+                risk_amount = balance * config.risk_per_trade
+                lots = np.floor(balance * lots_per_dollar[k] / config.lot_step + 1e-9) * config.lot_step
+                lots = max(lots, config.min_lot)
+                pnls[k] = pnl_per_lot[k] * lots
+                if not costs.free:
+                    pnls[k] -= config.commission_per_lot * lots
+                r_mults[k] = pnls[k] / risk_amount
+                balance += pnls[k]
+                equity_curve.append(balance)
+        else:
+            if config.exit_mode == "fixed":
+                r_mults = np.where(won, config.tp_atr_mult / config.sl_atr_mult, -1.0)
+            else:
+                r_mults = trail_r
+            if not costs.free:
+                r_mults = r_mults - cost_r
+            pnls, balance, equity_curve = compound_risk(r_mults, config.initial_balance, config.risk_per_trade)
+    
+    with stage("fast.trades"):
+        times = index
+        trades = [
+            Trade(
+                entry_time=times[entry_idx[k]],
+                exit_time=times[exit_idx[k]],
+                trade_type='BUY' if is_buy[k] else 'SELL',
+                entry_price=float(entry[k]),
+                sl_price=float(sl[k]),
+                tp_price=float(tp[k]),
+                exit_price=float(exit_price[k]),
+                pnl=float(pnls[k]),
+                r_multiple=float(r_mults[k]),
+                result='WIN' if won[k] else 'LOSS',
+                setup_type=setup_types[setup[k]],
+            )
+            for k in range(len(entry_idx))
+        ]
     return trades, balance, equity_curve
 
+def ladder_ledger(df: Union[pd.DataFrame, SignalBundle], config: BacktestConfig,
+                  intrabar: Optional[IntrabarIndex] = None) -> pd.DataFrame:
+    """Per-leg ledger of run_backtest_fast's trades under exit_mode="ladder".
+    
+    One row per (trade, leg) with the leg's level, fraction, exit time,
+    whether its target filled, and its realized R before costs; trade
+    numbers index run_backtest_fast's trade list.
+    """
+    if config.exit_mode != "ladder":
+        raise ValueError(f'ladder_ledger needs exit_mode="ladder", got {config.exit_mode!r}')
+    bundle = df if isinstance(df, SignalBundle) else SignalBundle.from_frame(df)
+    return leg_ledger(bundle.index, _engine_trades(bundle, config, intrabar), Ladder.from_config(config))
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # PERFORMANCE METRICS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -718,8 +1054,7 @@ def main():
             tp_atr_mult=4.5  # 3:1 R:R
         )
         
-        df_signals = generate_signals(df.copy(), config)
-        trades, final_balance, equity_curve = run_backtest(df_signals, config)
+        trades, final_balance, equity_curve = run_backtest(signal_bundle(df, config), config)
         
         if len(trades) == 0:
             print(f"\n❌ {strategy}: No trades generated")
@@ -776,8 +1111,7 @@ def main():
                 tp_atr_mult=tp_mult
             )
             
-            df_signals = generate_signals(df.copy(), config)
-            trades, final_balance, equity_curve = run_backtest(df_signals, config)
+            trades, final_balance, equity_curve = run_backtest(signal_bundle(df, config), config)
             
             if trades:
                 m = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
@@ -8,6 +8,16 @@ import numpy as np
 from datetime import datetime, timedelta
 import random
 
+from rbfx_core import (
+    calculate_ema,
+    calculate_atr,
+    calculate_adx,
+    calculate_bollinger_bands,
+    sequential_trades,
+    compound_risk,
+    trade_log,
+)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONFIGURATION
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -62,54 +72,6 @@ def generate_realistic_data(n_candles=2000, start_price=1.0850):
     
     return df
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# INDICATOR CALCULATIONS
-# ═══════════════════════════════════════════════════════════════════════════════
-def calculate_ema(series, period):
-    return series.ewm(span=period, adjust=False).mean()
-
-def calculate_atr(df, period=14):
-    high = df['High']
-    low = df['Low']
-    close = df['Close']
-    
-    tr1 = high - low
-    tr2 = abs(high - close.shift())
-    tr3 = abs(low - close.shift())
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    return tr.rolling(window=period).mean()
-
-def calculate_adx(df, period=14):
-    """Simplified ADX calculation"""
-    high = df['High'].values
-    low = df['Low'].values
-    close = df['Close'].values
-    
-    n = len(close)
-    adx = np.zeros(n)
-    
-    for i in range(period * 2, n):
-        # Simple trending measure based on directional movement
-        ups = sum(1 for j in range(i-period, i) if close[j] > close[j-1])
-        downs = period - ups
-        dm = abs(ups - downs) / period
-        
-        # Range-based volatility
-        avg_range = np.mean(high[i-period:i] - low[i-period:i])
-        avg_close_range = np.mean(np.abs(np.diff(close[i-period:i])))
-        
-        if avg_range > 0:
-            adx[i] = (dm * 50) + (avg_close_range / avg_range) * 25
-        
-    return pd.Series(adx, index=df.index)
-
-def calculate_bollinger_bands(series, period=20, mult=1.0):
-    sma = series.rolling(window=period).mean()
-    std = series.rolling(window=period).std()
-    upper = sma + mult * std
-    lower = sma - mult * std
-    return sma, upper, lower
-
 # ═══════════════════════════════════════════════════════════════════════════════
 # SIGNAL LOGIC
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -165,117 +127,14 @@ def generate_signals(df):
 # BACKTESTER
 # ═══════════════════════════════════════════════════════════════════════════════
 def run_backtest(df):
-    balance = INITIAL_BALANCE
-    trades = []
-    position = None
-    cooldown = 0
-    
-    for i in range(250, len(df)):
-        row = df.iloc[i]
-        
-        if cooldown > 0:
-            cooldown -= 1
-            continue
-        
-        if position is not None:
-            # Check SL/TP
-            if position['type'] == 'BUY':
-                if row['Low'] <= position['sl']:
-                    pnl = -position['risk_amount']
-                    balance += pnl
-                    trades.append({
-                        'entry_time': position['entry_time'],
-                        'exit_time': row.name,
-                        'type': 'BUY',
-                        'entry': position['entry'],
-                        'exit': position['sl'],
-                        'pnl': pnl,
-                        'result': 'LOSS',
-                        'r_multiple': -1.0
-                    })
-                    position = None
-                    cooldown = 5
-                elif row['High'] >= position['tp']:
-                    pnl = position['risk_amount'] * (TP_ATR_MULT / SL_ATR_MULT)
-                    balance += pnl
-                    trades.append({
-                        'entry_time': position['entry_time'],
-                        'exit_time': row.name,
-                        'type': 'BUY',
-                        'entry': position['entry'],
-                        'exit': position['tp'],
-                        'pnl': pnl,
-                        'result': 'WIN',
-                        'r_multiple': TP_ATR_MULT / SL_ATR_MULT
-                    })
-                    position = None
-                    cooldown = 5
-            else:  # SELL
-                if row['High'] >= position['sl']:
-                    pnl = -position['risk_amount']
-                    balance += pnl
-                    trades.append({
-                        'entry_time': position['entry_time'],
-                        'exit_time': row.name,
-                        'type': 'SELL',
-                        'entry': position['entry'],
-                        'exit': position['sl'],
-                        'pnl': pnl,
-                        'result': 'LOSS',
-                        'r_multiple': -1.0
-                    })
-                    position = None
-                    cooldown = 5
-                elif row['Low'] <= position['tp']:
-                    pnl = position['risk_amount'] * (TP_ATR_MULT / SL_ATR_MULT)
-                    balance += pnl
-                    trades.append({
-                        'entry_time': position['entry_time'],
-                        'exit_time': row.name,
-                        'type': 'SELL',
-                        'entry': position['entry'],
-                        'exit': position['tp'],
-                        'pnl': pnl,
-                        'result': 'WIN',
-                        'r_multiple': TP_ATR_MULT / SL_ATR_MULT
-                    })
-                    position = None
-                    cooldown = 5
-            continue
-        
-        # Check for new signals
-        atr = row['ATR']
-        if pd.isna(atr) or atr == 0:
-            continue
-            
-        risk_amount = balance * RISK_PER_TRADE
-        
-        if row['BuySignal']:
-            entry = row['Close']
-            sl = entry - (atr * SL_ATR_MULT)
-            tp = entry + (atr * TP_ATR_MULT)
-            position = {
-                'type': 'BUY',
-                'entry': entry,
-                'sl': sl,
-                'tp': tp,
-                'entry_time': row.name,
-                'risk_amount': risk_amount
-            }
-        elif row['SellSignal']:
-            entry = row['Close']
-            sl = entry + (atr * SL_ATR_MULT)
-            tp = entry - (atr * TP_ATR_MULT)
-            position = {
-                'type': 'SELL',
-                'entry': entry,
-                'sl': sl,
-                'tp': tp,
-                'entry_time': row.name,
-                'risk_amount': risk_amount
-            }
-    
-    return trades, balance
+    trades = sequential_trades(
+        df['High'].to_numpy(), df['Low'].to_numpy(), df['Close'].to_numpy(), df['ATR'].to_numpy(),
+        df['BuySignal'].to_numpy(dtype=bool), df['SellSignal'].to_numpy(dtype=bool),
+        SL_ATR_MULT, TP_ATR_MULT, warmup=250, cooldown=5,
+    )
+    r_multiples = np.where(trades['won'], TP_ATR_MULT / SL_ATR_MULT, -1.0)
+    pnls, balance, _ = compound_risk(r_multiples, INITIAL_BALANCE, RISK_PER_TRADE)
+    return trade_log(df.index, trades, pnls, r_multiples), balance
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # MAIN
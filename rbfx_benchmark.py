@@ -0,0 +1,387 @@
+"""
+RetailBeastFX - Benchmark Suite v1.0
+Times every backtester and optimizer hot path on fixed-seed datasets.
+
+Each (benchmark, size) case runs in its own process so the reported peak RSS
+belongs to that case alone. Results are written as JSON (seconds, bars/sec,
+peak RSS) and can be compared against a stored baseline:
+
+    python rbfx_benchmark.py                          # 5k + 100k bars
+    python rbfx_benchmark.py --sizes all              # 5k / 100k / 1M / 10M
+    python rbfx_benchmark.py --only indicator         # name filter
+    python rbfx_benchmark.py --output baseline.json
+    python rbfx_benchmark.py --compare baseline.json  # flag regressions (exit 1)
+
+Legacy per-bar loops (iloc backtests, OB/FVG detection, v9 confluence loop)
+are capped at 100k bars; --no-limits runs them at every size.
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import multiprocessing as mp
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+import rbfx_backtest_enhanced as enhanced
+import rbfx_core as core
+import rbfx_limit_orders as limit_orders
+import rbfx_v9_backtest as v9
+from rbfx_first_touch import IntrabarIndex
+from rbfx_grid_optimizer import FAST_GRID, run_grid_optimization
+
+SIZES = {'5k': 5_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+DEFAULT_SIZES = ('5k', '100k')
+LEGACY_MAX_BARS = 100_000
+DATA_SEED = 20260105
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DATASETS
+# ═══════════════════════════════════════════════════════════════════════════════
+def make_dataset(n_bars: int, seed: int = DATA_SEED, minutes: int = 15) -> pd.DataFrame:
+    """Fixed-seed 15m OHLCV bars shaped like generate_realistic_data.
+
+    Same session volatility and regime-switching drift, but generated without
+    a per-bar Python loop so 10M bars take seconds. Other bar sizes scale
+    drift and regime odds with time and volatility with its square root.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start='2026-01-05', periods=n_bars, freq=f'{minutes}min')
+    hour = np.asarray(dates.hour)
+    scale = minutes / 15
+
+    vol = np.select(
+        [(hour >= 3) & (hour <= 6), (hour >= 8) & (hour <= 11), (hour >= 13) & (hour <= 16)],
+        [0.0005, 0.0006, 0.0004], 0.0002,
+    ) * np.sqrt(scale)
+    # Regime changes with 0.5% probability per 15m bar, each picking -1 / 0 / +1
+    switches = rng.random(n_bars) < 0.005 * scale
+    regimes = np.concatenate([[1], rng.integers(-1, 2, switches.sum())])
+    regime = regimes[np.cumsum(switches)]
+
+    returns = regime * 0.00005 * scale + rng.normal(0, 1, n_bars) * vol
+    returns[0] = 0.0
+    close = 1.0850 * np.exp(np.cumsum(returns))
+
+    session_mult = np.where((hour >= 8) & (hour <= 16), 1.5, 0.8)
+    spread = np.abs(rng.normal(0.0004, 0.0002, n_bars)) * session_mult * np.sqrt(scale)
+    open_price = np.roll(close, 1)
+    open_price[0] = 1.0850
+    high = np.maximum(close + spread, np.maximum(open_price, close))
+    low = np.minimum(close - spread, np.minimum(open_price, close))
+    volume = rng.exponential(10000, n_bars) * session_mult
+
+    return pd.DataFrame({
+        'Open': open_price,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume,
+    }, index=dates)
+
+
+def make_intrabar_dataset(n_bars: int, seed: int = DATA_SEED):
+    """n_bars 15m bars aggregated from 1m bars, plus the IntrabarIndex over those 1m bars."""
+    minutes = make_dataset(n_bars * 15, seed, minutes=1)
+    bars = minutes.resample('15min').agg({
+        'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum',
+    })
+    return bars, IntrabarIndex(bars.index, minutes.index, minutes['High'].to_numpy(), minutes['Low'].to_numpy())
+
+
+def to_v9_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """rbfx_v9_backtest layout: lowercase columns plus a datetime column."""
+    out = df.rename(columns=str.lower).reset_index(drop=True)
+    out.insert(0, 'datetime', df.index)
+    return out
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BENCHMARK DEFINITIONS
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[pd.DataFrame], object]  # Untimed; returns state for run
+    run: Callable[[object], Optional[int]]  # Timed; returns op count (None = bars)
+    max_bars: Optional[int] = None  # Skip larger sizes unless --no-limits
+    unit: str = 'bars'
+
+
+def _signals(df: pd.DataFrame) -> pd.DataFrame:
+    return enhanced.generate_signals(df.copy(), enhanced.BacktestConfig())
+
+
+def _simulate_trades_setup(df: pd.DataFrame):
+    frame = to_v9_frame(df)
+    rng = np.random.default_rng(DATA_SEED)
+    entries = np.sort(rng.integers(0, max(1, len(frame) - 101), 1000))
+    close = frame['close'].to_numpy()
+    sides = rng.random(len(entries)) < 0.5
+    return frame, entries, close, sides
+
+
+def _simulate_trades_run(state) -> int:
+    frame, entries, close, sides = state
+    for i, is_buy in zip(entries, sides):
+        entry = close[i]
+        risk = entry * 0.002
+        sl = entry - risk if is_buy else entry + risk
+        tp = entry + 3 * risk if is_buy else entry - 3 * risk
+        v9.simulate_trade(frame, int(i), bool(is_buy), entry, sl, tp)
+    return len(entries)
+
+
+def _dmi_stream_setup(df: pd.DataFrame):
+    return df['High'].tolist(), df['Low'].tolist(), df['Close'].tolist()
+
+
+def _dmi_stream_run(state) -> None:
+    dmi = core.WilderDMI(14)
+    for bar in zip(*state):
+        dmi.update(*bar)
+
+
+def _intrabar_setup(df: pd.DataFrame):
+    bars, intrabar = make_intrabar_dataset(len(df))
+    return _signals(bars), intrabar
+
+
+def _trail_sweep_setup(df: pd.DataFrame):
+    frame = to_v9_frame(df)
+    configs = [replace(v9.CONFIG, exit_mode='atr', atr_trail_mult=m) for m in np.linspace(1.0, 6.0, 100)]
+    return v9.score_bars(frame, v9.CONFIG), configs
+
+
+def _metrics_setup(df: pd.DataFrame):
+    config = enhanced.BacktestConfig()
+    trades, final_balance, equity_curve = enhanced.run_backtest_fast(_signals(df), config)
+    return trades, config.initial_balance, final_balance, equity_curve
+
+
+BENCHMARKS: List[Benchmark] = [
+    # Indicators
+    Benchmark('indicator.ema', lambda df: df, lambda df: enhanced.calculate_ema(df['Close'], 21)),
+    Benchmark('indicator.sma', lambda df: df, lambda df: enhanced.calculate_sma(df['Close'], 20)),
+    Benchmark('indicator.atr', lambda df: df, lambda df: enhanced.calculate_atr(df, 14)),
+    Benchmark('indicator.rsi', lambda df: df, lambda df: enhanced.calculate_rsi(df['Close'], 14)),
+    Benchmark('indicator.adx', lambda df: df, lambda df: enhanced.calculate_adx(df, 14)),
+    Benchmark('indicator.bollinger', lambda df: df,
+              lambda df: enhanced.calculate_bollinger_bands(df['Close'], 20, 1.0)),
+    Benchmark('indicator.atr_pine', lambda df: df, lambda df: core.calculate_atr(df, 14, 'pine')),
+    Benchmark('indicator.rsi_pine', lambda df: df, lambda df: core.calculate_rsi(df['Close'], 14, 'pine')),
+    Benchmark('indicator.bollinger_pine', lambda df: df,
+              lambda df: core.calculate_bollinger_bands(df['Close'], 20, 1.0, 'pine')),
+    Benchmark('indicator.session_flags', lambda df: df, lambda df: enhanced.get_session_flags(df.index)),
+    Benchmark('indicator.v9_adx', to_v9_frame, lambda f: v9.calculate_adx(f, 14)),
+    Benchmark('indicator.wilder_dmi', lambda df: df, lambda df: core.wilder_dmi(df, 14)),
+    Benchmark('indicator.wilder_dmi_stream', _dmi_stream_setup, _dmi_stream_run, max_bars=LEGACY_MAX_BARS),
+
+    # Signals and zones
+    Benchmark('generate_signals', lambda df: df, lambda df: _signals(df)),
+    Benchmark('signal_bundle', lambda df: df,
+              lambda df: enhanced.signal_bundle(df, enhanced.BacktestConfig())),
+    Benchmark('detect_order_blocks', lambda df: (df, enhanced.calculate_atr(df, 14)),
+              lambda s: enhanced.detect_order_blocks(*s), max_bars=LEGACY_MAX_BARS),
+    Benchmark('detect_fvgs', lambda df: (df, enhanced.calculate_atr(df, 14)),
+              lambda s: enhanced.detect_fvgs(*s), max_bars=LEGACY_MAX_BARS),
+
+    # Backtest engines
+    Benchmark('run_backtest', _signals,
+              lambda s: enhanced.run_backtest(s, enhanced.BacktestConfig()), max_bars=LEGACY_MAX_BARS),
+    Benchmark('run_backtest_fast', _signals,
+              lambda s: enhanced.run_backtest_fast(s, enhanced.BacktestConfig())),
+    Benchmark('run_backtest_fast.intrabar', _intrabar_setup,
+              lambda s: enhanced.run_backtest_fast(s[0], enhanced.BacktestConfig(), intrabar=s[1]),
+              max_bars=1_000_000),
+    Benchmark('run_backtest_fast.atr_trail', _signals,
+              lambda s: enhanced.run_backtest_fast(s, enhanced.BacktestConfig(exit_mode='atr'))),
+    Benchmark('limit_orders.zone_fills', lambda df: df,
+              lambda df: limit_orders.limit_order_trades(df, enhanced.BacktestConfig(),
+                                                         limit_orders.LimitOrderConfig())),
+    Benchmark('simulate_trade', _simulate_trades_setup, _simulate_trades_run, unit='trades'),
+    Benchmark('calculate_metrics', _metrics_setup,
+              lambda s: (enhanced.calculate_metrics(*s), len(s[0]))[1], unit='trades'),
+    Benchmark('v9.backtest_trades', to_v9_frame, lambda f: v9.backtest_trades(f)),
+    Benchmark('v9.batch_trades.trail_sweep', _trail_sweep_setup, lambda s: v9.batch_trades(*s)),
+
+    # Optimizer
+    Benchmark('grid.fast_grid', lambda df: df,
+              lambda df: run_grid_optimization(df, FAST_GRID, verbose=False), max_bars=1_000_000),
+]
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RUNNER
+# ═══════════════════════════════════════════════════════════════════════════════
+def _rss_mb() -> Optional[float]:
+    """Peak RSS of this process so far (MB)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(name: str, n_bars: int, repeat: int) -> Dict:
+    """Child-process entry point: build data, set up, time `repeat` runs, keep the best."""
+    bench = next(b for b in BENCHMARKS if b.name == name)
+    df = make_dataset(n_bars)
+    state = bench.setup(df)
+    setup_rss = _rss_mb()
+
+    best = float('inf')
+    ops = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = bench.run(state)
+        best = min(best, time.perf_counter() - t0)
+        ops = out if isinstance(out, (int, np.integer)) and not isinstance(out, bool) else n_bars
+
+    return {
+        'name': name,
+        'bars': n_bars,
+        'status': 'ok',
+        'seconds': best,
+        'bars_per_sec': n_bars / best if best > 0 else None,
+        'ops': int(ops),
+        'unit': bench.unit,
+        'ops_per_sec': ops / best if best > 0 else None,
+        'setup_rss_mb': setup_rss,
+        'peak_rss_mb': _rss_mb(),
+    }
+
+
+def _case_worker(name: str, n_bars: int, repeat: int, queue):
+    try:
+        queue.put(_run_case(name, n_bars, repeat))
+    except Exception as e:
+        queue.put({'name': name, 'bars': n_bars, 'status': f'error: {e!r}'})
+
+
+def run_case_isolated(name: str, n_bars: int, repeat: int) -> Dict:
+    """Run one case in a fresh process so peak RSS is attributable to it."""
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_case_worker, args=(name, n_bars, repeat, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def run_benchmarks(sizes: List[str], only: Optional[List[str]] = None, repeat: int = 3,
+                   no_limits: bool = False, isolate: bool = True) -> Dict:
+    results = []
+    for label in sizes:
+        n_bars = SIZES[label]
+        for bench in BENCHMARKS:
+            if only and not any(pattern in bench.name for pattern in only):
+                continue
+            if bench.max_bars and n_bars > bench.max_bars and not no_limits:
+                results.append({'name': bench.name, 'bars': n_bars, 'status': 'skipped'})
+                print(format_result(results[-1]))
+                continue
+            # Slow legacy loops only get one timed run beyond 5k bars
+            reps = 1 if (bench.max_bars and n_bars > 5_000) or n_bars >= 1_000_000 else repeat
+            r = run_case_isolated(bench.name, n_bars, reps) if isolate else _run_case(bench.name, n_bars, reps)
+            results.append(r)
+            print(format_result(r))
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def format_result(r: Dict) -> str:
+    head = f"   {r['name']:26} | {r['bars']:>10,} bars"
+    if r.get('status') != 'ok':
+        return f"{head} | {r.get('status')}"
+    rss = f"{r['peak_rss_mb']:7.0f} MB" if r.get('peak_rss_mb') is not None else "      n/a"
+    return (f"{head} | {r['seconds']:9.4f}s | {r['bars_per_sec']:>13,.0f} bars/s | "
+            f"{r['ops_per_sec']:>13,.0f} {r['unit']}/s | {rss}")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# COMPARE
+# ═══════════════════════════════════════════════════════════════════════════════
+def compare_results(current: Dict, baseline: Dict, threshold: float = 0.10) -> List[Dict]:
+    """Match cases by (name, bars) and flag slowdowns beyond threshold."""
+    base = {(r['name'], r['bars']): r for r in baseline['results'] if r.get('status') == 'ok'}
+    rows = []
+    for r in current['results']:
+        b = base.get((r['name'], r['bars']))
+        if r.get('status') != 'ok' or b is None:
+            continue
+        ratio = r['seconds'] / b['seconds'] if b['seconds'] > 0 else float('inf')
+        verdict = 'REGRESSION' if ratio > 1 + threshold else 'IMPROVED' if ratio < 1 - threshold else 'ok'
+        rows.append({'name': r['name'], 'bars': r['bars'], 'baseline': b['seconds'],
+                     'current': r['seconds'], 'ratio': ratio, 'verdict': verdict})
+    return rows
+
+
+def print_comparison(rows: List[Dict], threshold: float):
+    print(f"\n   {'Benchmark':26} | {'Bars':>10} | {'Baseline':>9} | {'Current':>9} | {'Ratio':>6} | Verdict")
+    print("   " + "-" * 84)
+    for c in rows:
+        marker = "❌" if c['verdict'] == 'REGRESSION' else "✅" if c['verdict'] == 'IMPROVED' else "  "
+        print(f"   {c['name']:26} | {c['bars']:>10,} | {c['baseline']:8.4f}s | {c['current']:8.4f}s | "
+              f"{c['ratio']:5.2f}x | {marker} {c['verdict']}")
+    n_reg = sum(c['verdict'] == 'REGRESSION' for c in rows)
+    print(f"\n   {n_reg} regression(s) beyond +{threshold * 100:.0f}%")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def main():
+    parser = argparse.ArgumentParser(description="RetailBeastFX benchmark suite")
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                        help="comma list of 5k,100k,1M,10M or 'all'")
+    parser.add_argument('--only', default=None, help="comma list of name substrings")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help="baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="regression threshold (0.10 = +10%%)")
+    parser.add_argument('--no-limits', action='store_true', help="run legacy loops at every size")
+    parser.add_argument('--in-process', action='store_true', help="skip per-case processes (RSS is cumulative)")
+    args = parser.parse_args()
+
+    sizes = list(SIZES) if args.sizes == 'all' else args.sizes.split(',')
+    only = args.only.split(',') if args.only else None
+
+    print("=" * 70)
+    print("RetailBeastFX - Benchmark Suite v1.0")
+    print("=" * 70)
+    print(f"\n   Sizes: {', '.join(sizes)} | Repeat: {args.repeat} | Seed: {DATA_SEED}\n")
+
+    report = run_benchmarks(sizes, only, args.repeat, args.no_limits, not args.in_process)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n   📁 Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare_results(report, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(c['verdict'] == 'REGRESSION' for c in rows):
+            sys.exit(1)
+
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,841 @@
+"""
+RetailBeastFX - Strategy Core v1.0
+The indicators, session windows and trade engines shared by every backtester.
+
+rbfx_backtest.py, rbfx_backtest_offline.py, rbfx_backtest_enhanced.py,
+rbfx_v9_backtest.py and v9_volume_test.py all import from here. Where
+their historical formulas differ (EMA adjust, the ADX variant, z-score
+epsilon, inclusive vs half-open session hours) the difference is a
+CoreStyle field, so each script keeps its numbers while sharing one
+implementation:
+
+    style = STYLES['v9']
+    adx = style.adx(df, 14)
+    flags = style.sessions(df['datetime'])
+
+Indicator functions accept OHLCV columns in either case ('High' or 'high').
+"""
+
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from rbfx_first_touch import BarScanner, IntrabarIndex, resolve_exits, resolve_trailing_exits, EXIT_SL, EXIT_TP, EXIT_TRAIL
+from rbfx_profiler import stage
+
+# Instrument specs (pip size, lot value) live with the website scripts
+# (retailbeastfx/scripts is a namespace package: no sys.path changes needed)
+from retailbeastfx.scripts.position_sizer import InstitutionalRiskEngine
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INDICATORS
+# ═══════════════════════════════════════════════════════════════════════════════
+ADX_METHODS = ('simplified', 'dm', 'dm_abs', 'dm_clip', 'wilder')
+
+# pandas: the historical rolling-mean / sample-std formulas
+# pine:   TradingView built-ins (ta.atr, ta.rsi, ta.stdev, ta.dmi); EMA and SMA
+#         already match ta.ema / ta.sma, so they are the same in both
+INDICATOR_BACKENDS = ('pandas', 'pine')
+
+
+def _backend(backend: str) -> str:
+    if backend not in INDICATOR_BACKENDS:
+        raise ValueError(f"Unknown indicator backend {backend!r} (expected one of {INDICATOR_BACKENDS})")
+    return backend
+
+
+def column(df: pd.DataFrame, name: str) -> pd.Series:
+    """df['High'] or df['high'], whichever the frame uses."""
+    return df[name] if name in df.columns else df[name.lower()]
+
+
+def calculate_ema(series: pd.Series, period: int, adjust: bool = False) -> pd.Series:
+    return series.ewm(span=period, adjust=adjust).mean()
+
+
+def calculate_sma(series: pd.Series, period: int) -> pd.Series:
+    return series.rolling(window=period).mean()
+
+
+def true_range(df: pd.DataFrame) -> pd.Series:
+    high = column(df, 'High').to_numpy(dtype=np.float64)
+    low = column(df, 'Low').to_numpy(dtype=np.float64)
+    prev_close = np.empty(len(high))
+    prev_close[:1] = np.nan
+    prev_close[1:] = column(df, 'Close').to_numpy(dtype=np.float64)[:-1]
+    # fmax skips NaN like concat(...).max(axis=1) (first bar: high - low)
+    tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    return pd.Series(tr, index=df.index)
+
+
+def calculate_atr(df: pd.DataFrame, period: int = 14, backend: str = 'pandas') -> pd.Series:
+    if _backend(backend) == 'pine':
+        return pine_atr(df, period)
+    return true_range(df).rolling(window=period).mean()
+
+
+def calculate_rsi(series: pd.Series, period: int = 14, backend: str = 'pandas') -> pd.Series:
+    if _backend(backend) == 'pine':
+        return pine_rsi(series, period)
+    delta = series.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    rs = gain / (loss + 1e-10)
+    return 100 - (100 / (1 + rs))
+
+
+def _simplified_adx(df: pd.DataFrame, period: int) -> pd.Series:
+    """Trend measure: up/down close balance plus close-to-close vs high-low range.
+
+    Each bar i >= 2 * period looks at the trailing window [i - period, i).
+    """
+    high = column(df, 'High').to_numpy()
+    low = column(df, 'Low').to_numpy()
+    close = column(df, 'Close').to_numpy()
+
+    n = len(close)
+    adx = np.zeros(n)
+    if n <= period * 2:
+        return pd.Series(adx, index=df.index)
+
+    # Window ending at bar i - 1 for every i in [2 * period, n)
+    windows = np.lib.stride_tricks.sliding_window_view
+    rows = slice(period, n - period)
+    up = np.zeros(n, dtype=np.int64)
+    up[1:] = close[1:] > close[:-1]
+    ups = windows(up, period)[rows].sum(axis=1)
+    dm = np.abs(ups - (period - ups)) / period
+
+    avg_range = windows(high - low, period)[rows].mean(axis=1)
+    avg_close_range = windows(np.abs(np.diff(close)), period - 1)[rows].mean(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = (dm * 50) + (avg_close_range / avg_range) * 25
+    adx[period * 2:] = np.where(avg_range > 0, value, 0.0)
+
+    return pd.Series(adx, index=df.index)
+
+
+def calculate_adx(df: pd.DataFrame, period: int = 14, method: str = 'simplified',
+                  eps: float = 1e-4, backend: str = 'pandas') -> pd.Series:
+    """ADX in one of the variants the backtesters grew.
+
+    simplified: _simplified_adx (enhanced / offline)
+    dm:         +DM/-DM exclusive (-DM compared with the filtered +DM), SMA smoothing (v9)
+    dm_abs:     -DM from |low change| in either direction (rbfx_backtest)
+    dm_clip:    +DM/-DM clipped at 0, not exclusive (v9_volume_test)
+    wilder:     Pine ta.dmi(period, period), Wilder RMA smoothing (see wilder_dmi)
+
+    The dm* variants smooth TR and DM with a rolling mean and add eps to the
+    DX denominator. backend='pine' always means wilder.
+    """
+    if _backend(backend) == 'pine':
+        method = 'wilder'
+    if method == 'simplified':
+        return _simplified_adx(df, period)
+    if method == 'wilder':
+        return wilder_dmi(df, period)[2]
+    if method not in ADX_METHODS:
+        raise ValueError(f"Unknown ADX method {method!r} (expected one of {ADX_METHODS})")
+
+    up = column(df, 'High').diff()
+    down = column(df, 'Low').diff()
+    if method == 'dm':
+        minus = -down
+        plus_dm = np.where((up > minus) & (up > 0), up, 0)
+        minus_dm = np.where((minus > plus_dm) & (minus > 0), minus, 0)
+    elif method == 'dm_abs':
+        minus = down.abs() * -1
+        plus_dm = np.where((up > minus.abs()) & (up > 0), up, 0)
+        minus_dm = np.where((minus.abs() > plus_dm) & (minus < 0), minus.abs(), 0)
+    else:
+        plus_dm = up.clip(lower=0)
+        minus_dm = (-down).clip(lower=0)
+
+    atr = calculate_atr(df, period)
+    plus_di = 100 * pd.Series(np.asarray(plus_dm, dtype=np.float64), index=df.index).rolling(window=period).mean() / atr
+    minus_di = 100 * pd.Series(np.asarray(minus_dm, dtype=np.float64), index=df.index).rolling(window=period).mean() / atr
+
+    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di + eps)
+    return dx.rolling(window=period).mean()
+
+
+def rma(values, period: int) -> np.ndarray:
+    """Wilder's moving average, Pine ta.rma.
+
+    Seeded with the SMA of the first `period` values after any leading NaNs,
+    then y = x / period + y[-1] * (1 - 1 / period). The recursion runs in
+    pandas' compiled ewm; NaNs are only expected before the seed.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    valid = ~np.isnan(x)
+    first = int(valid.argmax())
+    seed = first + period - 1
+    if not valid[first] or seed >= len(x):
+        return out
+    tail = x[seed:].copy()
+    tail[0] = x[first:seed + 1].mean()
+    out[seed:] = pd.Series(tail).ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+    return out
+
+
+def wilder_dmi(df: pd.DataFrame, di_length: int = 14,
+               adx_smoothing: Optional[int] = None) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """+DI, -DI and ADX exactly as Pine's ta.dmi(di_length, adx_smoothing).
+
+    TR is NaN on the first bar (no previous close) like ta.tr, DI values
+    carry forward through zero-range stretches (fixnan), and DX divides by
+    1 when +DI + -DI is 0. WilderDMI is the bar-by-bar version.
+    """
+    adx_smoothing = adx_smoothing or di_length
+    high = column(df, 'High').to_numpy(dtype=np.float64)
+    low = column(df, 'Low').to_numpy(dtype=np.float64)
+    close = column(df, 'Close').to_numpy(dtype=np.float64)
+
+    up = np.full(len(high), np.nan)
+    down = np.full(len(high), np.nan)
+    tr = np.full(len(high), np.nan)
+    up[1:] = high[1:] - high[:-1]
+    down[1:] = low[:-1] - low[1:]
+    tr[1:] = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - close[:-1]),
+                                                       np.abs(low[1:] - close[:-1])))
+    with np.errstate(invalid='ignore'):
+        plus_dm = np.where(np.isnan(up), np.nan, np.where((up > down) & (up > 0), up, 0.0))
+        minus_dm = np.where(np.isnan(down), np.nan, np.where((down > up) & (down > 0), down, 0.0))
+
+    trur = rma(tr, di_length)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus = pd.Series(np.where(trur > 0, 100 * rma(plus_dm, di_length) / trur, np.nan)).ffill().to_numpy()
+        minus = pd.Series(np.where(trur > 0, 100 * rma(minus_dm, di_length) / trur, np.nan)).ffill().to_numpy()
+    total = plus + minus
+    adx = 100 * rma(np.abs(plus - minus) / np.where(total == 0, 1.0, total), adx_smoothing)
+
+    return (pd.Series(plus, index=df.index), pd.Series(minus, index=df.index),
+            pd.Series(adx, index=df.index))
+
+
+def calculate_stdev(series: pd.Series, period: int = 20, backend: str = 'pandas') -> pd.Series:
+    """Rolling std: sample (ddof=1) for pandas, population (ddof=0) like ta.stdev for pine."""
+    return series.rolling(window=period).std(ddof=0 if _backend(backend) == 'pine' else 1)
+
+
+def calculate_bollinger_bands(series: pd.Series, period: int = 20, mult: float = 1.0,
+                              backend: str = 'pandas') -> Tuple[pd.Series, pd.Series, pd.Series]:
+    sma = series.rolling(window=period).mean()
+    std = calculate_stdev(series, period, backend)
+    upper = sma + mult * std
+    lower = sma - mult * std
+    return sma, upper, lower
+
+
+def calculate_volume_zscore(df: pd.DataFrame, period: int = 20, eps: float = 1e-4) -> pd.Series:
+    """Volume Z-score for the Sentinel."""
+    vol = column(df, 'Volume')
+    avg_vol = vol.rolling(window=period).mean()
+    std_vol = vol.rolling(window=period).std()
+    return (vol - avg_vol) / (std_vol + eps)
+
+def pine_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
+    """ta.atr: RMA of the true range (first bar high - low, like ta.tr(true))."""
+    return pd.Series(rma(true_range(df).to_numpy(), period), index=df.index)
+
+
+def pine_rsi(series: pd.Series, period: int = 14) -> pd.Series:
+    """ta.rsi: RMA of gains over RMA of losses; 100 with no losses, 0 with no gains."""
+    delta = series.diff().to_numpy()
+    with np.errstate(invalid='ignore'):
+        gain = rma(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0)), period)
+        loss = rma(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0)), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(loss == 0, 100.0, np.where(gain == 0, 0.0, 100 - 100 / (1 + gain / loss)))
+    return pd.Series(np.where(np.isnan(gain) | np.isnan(loss), np.nan, rsi), index=series.index)
+
+
+def _prev(values: np.ndarray) -> np.ndarray:
+    return np.concatenate([[np.nan], values[:-1]])
+
+
+def crossover(a, b) -> np.ndarray:
+    """ta.crossover: a > b now and a <= b on the previous bar (NaN never crosses).
+
+    Either side may be a series or a scalar level.
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    with np.errstate(invalid='ignore'):
+        return (a > b) & (_prev(a) <= _prev(b))
+
+
+def crossunder(a, b) -> np.ndarray:
+    """ta.crossunder: a < b now and a >= b on the previous bar."""
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    with np.errstate(invalid='ignore'):
+        return (a < b) & (_prev(a) >= _prev(b))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# STREAMING (one bar at a time, O(1) per update)
+# ═══════════════════════════════════════════════════════════════════════════════
+class RMAStream:
+    """Pine's pine_rma: SMA of the first `period` values, then the Wilder recursion."""
+
+    __slots__ = ('period', 'alpha', 'value', '_sum', '_count')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.value = np.nan
+        self._sum = 0.0
+        self._count = 0
+
+    def update(self, x: float) -> float:
+        if self._count < self.period:
+            if np.isnan(x):  # Seed window restarts after a NaN, like ta.sma
+                self._sum, self._count = 0.0, 0
+                return self.value
+            self._sum += x
+            self._count += 1
+            if self._count == self.period:
+                self.value = self._sum / self.period
+            return self.value
+        self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class WilderDMI:
+    """Streaming ta.dmi: feed closed bars, read +DI, -DI and ADX.
+
+        dmi = WilderDMI(14)
+        for bar in bars:
+            plus_di, minus_di, adx = dmi.update(bar.high, bar.low, bar.close)
+
+    Same values as wilder_dmi over the same bars (to float rounding).
+    """
+
+    def __init__(self, di_length: int = 14, adx_smoothing: Optional[int] = None):
+        self.tr = RMAStream(di_length)
+        self.plus_dm = RMAStream(di_length)
+        self.minus_dm = RMAStream(di_length)
+        self.dx = RMAStream(adx_smoothing or di_length)
+        self.plus = self.minus = self.adx = np.nan
+        self._prev = None  # (high, low, close) of the previous bar
+
+    def update(self, high: float, low: float, close: float) -> Tuple[float, float, float]:
+        prev, self._prev = self._prev, (high, low, close)
+        if prev is None:
+            return self.plus, self.minus, self.adx
+        prev_high, prev_low, prev_close = prev
+
+        up = high - prev_high
+        down = prev_low - low
+        trur = self.tr.update(max(high - low, abs(high - prev_close), abs(low - prev_close)))
+        plus_rma = self.plus_dm.update(up if up > down and up > 0 else 0.0)
+        minus_rma = self.minus_dm.update(down if down > up and down > 0 else 0.0)
+
+        if trur > 0:  # fixnan: keep the last DI otherwise
+            self.plus = 100 * plus_rma / trur
+            self.minus = 100 * minus_rma / trur
+        if not np.isnan(self.plus):
+            total = self.plus + self.minus
+            self.adx = 100 * self.dx.update(abs(self.plus - self.minus) / (total if total != 0 else 1.0))
+        return self.plus, self.minus, self.adx
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SESSIONS (EST)
+# ═══════════════════════════════════════════════════════════════════════════════
+# (start, end) in hours; minutes count as fractions when ends are exclusive
+SESSION_WINDOWS = {
+    'london': (3, 6),
+    'ny_am': (8, 11),
+    'ny_pm': (13, 16),
+    'silver_bullet': (10, 11),
+    'power_hour': (9, 10),
+    'valid_session': (3, 16),  # Any major session
+}
+
+
+def session_flags(times, inclusive_end: bool = True,
+                  windows: Optional[Dict[str, Tuple[float, float]]] = None) -> Dict[str, np.ndarray]:
+    """Session masks for a DatetimeIndex / datetime column.
+
+    inclusive_end=True:  start <= hour <= end (enhanced, 3-6 covers 03:00-06:59)
+    inclusive_end=False: start <= hour + minute / 60 < end (v9)
+    windows overrides SESSION_WINDOWS entries. 'killzone' is london | ny_am.
+    """
+    times = pd.DatetimeIndex(times)
+    hour = np.asarray(times.hour)
+    spec = {**SESSION_WINDOWS, **(windows or {})}
+    if inclusive_end:
+        flags = {name: (hour >= lo) & (hour <= hi) for name, (lo, hi) in spec.items()}
+    else:
+        clock = hour + np.asarray(times.minute) / 60
+        flags = {name: (clock >= lo) & (clock < hi) for name, (lo, hi) in spec.items()}
+    flags['asian'] = (hour >= 19) | (hour <= 2)
+    flags['killzone'] = flags['london'] | flags['ny_am']
+    return flags
+
+
+def session_info(timestamp, inclusive_end: bool = True,
+                 windows: Optional[Dict[str, Tuple[float, float]]] = None) -> Dict[str, bool]:
+    """session_flags for a single timestamp."""
+    hour = timestamp.hour
+    spec = {**SESSION_WINDOWS, **(windows or {})}
+    if inclusive_end:
+        info = {name: lo <= hour <= hi for name, (lo, hi) in spec.items()}
+    else:
+        clock = hour + timestamp.minute / 60
+        info = {name: lo <= clock < hi for name, (lo, hi) in spec.items()}
+    info['asian'] = hour >= 19 or hour <= 2
+    info['killzone'] = info['london'] or info['ny_am']
+    return info
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# STYLES (per-script quirks)
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass(frozen=True)
+class CoreStyle:
+    ema_adjust: bool = False
+    adx_method: str = 'simplified'  # See calculate_adx
+    adx_eps: float = 1e-4
+    zscore_eps: float = 1e-4
+    session_end_inclusive: bool = True
+    session_windows: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+
+    def ema(self, series: pd.Series, period: int) -> pd.Series:
+        return calculate_ema(series, period, self.ema_adjust)
+
+    def adx(self, df: pd.DataFrame, period: int = 14, backend: str = 'pandas') -> pd.Series:
+        return calculate_adx(df, period, self.adx_method, self.adx_eps, backend)
+
+    def volume_zscore(self, df: pd.DataFrame, period: int = 20) -> pd.Series:
+        return calculate_volume_zscore(df, period, self.zscore_eps)
+
+    def sessions(self, times, **windows) -> Dict[str, np.ndarray]:
+        return session_flags(times, self.session_end_inclusive, {**self.session_windows, **windows})
+
+    def session_info(self, timestamp, **windows) -> Dict[str, bool]:
+        return session_info(timestamp, self.session_end_inclusive, {**self.session_windows, **windows})
+
+
+STYLES = {
+    'enhanced': CoreStyle(),
+    'offline': CoreStyle(),
+    'classic': CoreStyle(adx_method='dm_abs'),
+    'v9': CoreStyle(adx_method='dm', session_end_inclusive=False,
+                    session_windows={'power_hour': (9.5, 10.5)}),
+    'v9_volume': CoreStyle(ema_adjust=True, adx_method='dm_clip', adx_eps=1e-3, zscore_eps=1e-3,
+                           session_end_inclusive=False),
+}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TRADING COSTS
+# ═══════════════════════════════════════════════════════════════════════════════
+# Spread multiplier by entry session (first match wins, anything else OFF_SESSION)
+SESSION_SPREAD_MULT = (('london', 1.0), ('ny_am', 1.0), ('ny_pm', 1.2), ('asian', 1.8))
+OFF_SESSION_SPREAD_MULT = 1.5
+
+# Typical retail ECN costs; apply with replace(config, **COST_PROFILES[instrument])
+COST_PROFILES = {
+    'EURUSD': dict(spread_pips=0.8, session_spreads=True, slippage_atr=0.02, commission_per_lot=7.0),
+    'USDJPY': dict(spread_pips=1.0, session_spreads=True, slippage_atr=0.02, commission_per_lot=7.0),
+    'XAUUSD': dict(spread_pips=2.5, session_spreads=True, slippage_atr=0.03, commission_per_lot=7.0),
+    'XAGUSD': dict(spread_pips=3.0, session_spreads=True, slippage_atr=0.03, commission_per_lot=7.0),
+}
+COST_PARAMS = ('spread_pips', 'session_spreads', 'slippage_atr', 'commission_per_lot')
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """Spread, slippage and commission, charged per trade as arrays.
+
+    Chart prices are treated as mid: the spread is paid once per round trip
+    (at entry), market fills (the entry and stop exits) slip slippage_atr x
+    ATR at entry against the trade, and take-profit limits fill at the level.
+    Entries filled by a resting limit order (limit_entry) pay the spread but
+    no slippage.
+    Commission is per standard lot, round turn, in account currency. A
+    trade risking R over sl_pips trades R / (sl_pips x pip_value) lots
+    (pip_value = USD per pip per lot, instrument_specs), so in R it is
+    commission / (sl_pips x pip_value).
+
+    Costs never move the SL/TP touches, so one resolved set of exits can be
+    priced under any number of cost models.
+    """
+    spread_pips: float = 0.0
+    session_spreads: bool = False
+    slippage_atr: float = 0.0
+    commission_per_lot: float = 0.0
+
+    @classmethod
+    def from_config(cls, config) -> 'CostModel':
+        """The cost fields of a BacktestConfig / V9Config."""
+        return cls(**{f.name: getattr(config, f.name) for f in fields(cls) if hasattr(config, f.name)})
+
+    @property
+    def free(self) -> bool:
+        return self.spread_pips == 0 and self.slippage_atr == 0 and self.commission_per_lot == 0
+
+    def spread(self, entry_times, pip_size) -> np.ndarray:
+        """Spread in price at each entry (scaled by SESSION_SPREAD_MULT when session_spreads)."""
+        spread = self.spread_pips * np.asarray(pip_size, dtype=np.float64)
+        if not self.session_spreads or self.spread_pips == 0:
+            return np.broadcast_to(spread, (len(entry_times),))
+        flags = session_flags(entry_times)
+        mult = np.select([flags[name] for name, _ in SESSION_SPREAD_MULT],
+                         [m for _, m in SESSION_SPREAD_MULT], OFF_SESSION_SPREAD_MULT)
+        return spread * mult
+
+    def price_costs(self, entry_times, atr, stopped, pip_size,
+                    limit_entry=False) -> Tuple[np.ndarray, np.ndarray]:
+        """(entry_cost, exit_cost) in price units, both charged against the trade.
+
+        stopped is a mask, or the fraction of each position closed at a stop.
+        limit_entry (bool or mask) marks entries filled at a limit price.
+        """
+        slip = self.slippage_atr * np.asarray(atr, dtype=np.float64)
+        entry_cost = self.spread(entry_times, pip_size) + np.where(limit_entry, 0.0, slip)
+        exit_cost = slip * np.asarray(stopped, dtype=np.float64)
+        return entry_cost, exit_cost
+
+    def cost_r(self, entry_times, atr, stopped, sl_distance, pip_size, pip_value,
+               limit_entry=False) -> np.ndarray:
+        """Total cost of each trade in R (positive = paid)."""
+        entry_cost, exit_cost = self.price_costs(entry_times, atr, stopped, pip_size, limit_entry)
+        sl_pips = sl_distance / pip_size
+        return (entry_cost + exit_cost) / sl_distance + self.commission_per_lot / (sl_pips * pip_value)
+
+
+def instrument_specs(instrument, price) -> Tuple[np.ndarray, np.ndarray]:
+    """(pip_size, pip_value) for an instrument name or array of names.
+
+    pip_value is USD per pip per standard lot at price (it only depends on
+    price for USD-base pairs such as USDJPY).
+    """
+    pip_size, _ = InstitutionalRiskEngine.spec_arrays(instrument)
+    return pip_size, InstitutionalRiskEngine.pip_values(instrument, price)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SCALE-OUT LADDER
+# ═══════════════════════════════════════════════════════════════════════════════
+# The 1R / 2R / 3.5R targets of InstitutionalRiskEngine.calculate_lot_size
+LADDER_R = (1.0, 2.0, 3.5)
+
+
+@dataclass(frozen=True)
+class Ladder:
+    """Partial take-profits: fractions[i] of the position closes at levels_r[i] x risk.
+
+    Every leg shares the initial stop until price reaches the first level
+    (even with a zero fraction there); with move_stop the remaining legs
+    then stop at entry + stop_r x risk (0 = breakeven), from the next bar.
+    Levels are touches, so one bar can fill several; a stop and a fill on
+    the same bar is a stop unless intrabar data shows the fill came first.
+
+    Fill times never depend on the fractions: legs() resolves a set of
+    trades once and combine() prices any number of fraction splits on it.
+    """
+    fractions: Tuple[float, ...] = (0.5, 0.3, 0.2)
+    levels_r: Tuple[float, ...] = LADDER_R
+    move_stop: bool = True
+    stop_r: float = 0.0
+
+    def __post_init__(self):
+        f = np.asarray(self.fractions, dtype=np.float64)
+        if len(f) != len(self.levels_r) or (f < 0).any() or abs(f.sum() - 1.0) > 1e-9:
+            raise ValueError(f"Ladder fractions {self.fractions} must be >= 0, one per level "
+                             f"{self.levels_r}, and sum to 1")
+
+    @classmethod
+    def from_config(cls, config) -> 'Ladder':
+        """The ladder_* fields of a BacktestConfig."""
+        return cls(fractions=tuple(config.ladder_fractions), move_stop=config.ladder_move_stop,
+                   stop_r=config.ladder_stop_r)
+
+    def legs(self, scanner: BarScanner, entry_idx, is_buy, entry, risk,
+             intrabar: Optional[IntrabarIndex] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(exit_idx, r, filled) per trade and level, each (n_trades, n_levels).
+
+        r is the R of a whole position closed where that leg closed; exit_idx
+        is scanner.n for legs still open at the end of data. With intrabar,
+        a level and the stop it races touched on one bar are settled by the
+        child bars.
+        """
+        entry_idx = np.asarray(entry_idx, dtype=np.int64)
+        is_buy = np.asarray(is_buy, dtype=bool)
+        entry = np.asarray(entry, dtype=np.float64)
+        risk = np.asarray(risk, dtype=np.float64)
+        sign = np.where(is_buy, 1.0, -1.0)
+        n = scanner.n
+
+        def touch(rows, start, level, target):
+            # Targets of longs / stops of shorts are reached by the highs
+            out = np.full(len(rows), n, dtype=np.int64)
+            up = is_buy[rows] == target
+            if up.any():
+                out[up] = scanner.first_high_at_or_above(start[up], level[up])
+            if (~up).any():
+                out[~up] = scanner.first_low_at_or_below(start[~up], level[~up])
+            return out
+
+        def fills(hit, stop_bar, stop_r, level_r):
+            # Level before its stop; a shared bar is a stop unless the child bars say otherwise
+            out = hit < stop_bar
+            if intrabar is not None:
+                tied = np.flatnonzero((hit == stop_bar) & (hit < n))
+                if len(tied):
+                    e, s, r = entry[tied], sign[tied], risk[tied]
+                    out[tied] = intrabar.resolve(hit[tied], is_buy[tied], e + s * stop_r[tied] * r,
+                                                 e + s * level_r * r) == EXIT_TP
+            return out
+
+        every = np.arange(len(entry_idx))
+        start = entry_idx + 1
+        first_stop = touch(every, start, entry - sign * risk, False)
+        hits = np.stack([touch(every, start, entry + sign * r * risk, True) for r in self.levels_r], axis=1)
+
+        stop_at = np.repeat(first_stop[:, None], len(self.levels_r), axis=1)
+        stop_value = np.full(stop_at.shape, -1.0)
+        first_filled = fills(hits[:, 0], first_stop, stop_value[:, 0], self.levels_r[0])
+        if self.move_stop:
+            # A first fill sharing its bar with the initial stop leaves the rest on that stop
+            rows = np.flatnonzero(first_filled & (hits[:, 0] < first_stop))
+            moved = entry[rows] + sign[rows] * self.stop_r * risk[rows]
+            stop_at[rows, 1:] = touch(rows, hits[rows, 0] + 1, moved, False)[:, None]
+            stop_value[rows, 1:] = self.stop_r
+
+        filled = np.column_stack([first_filled] + [fills(hits[:, i], stop_at[:, i], stop_value[:, i], level)
+                                                   for i, level in enumerate(self.levels_r[1:], 1)])
+        exit_idx = np.where(filled, hits, stop_at)
+        r = np.where(filled, np.asarray(self.levels_r, dtype=np.float64), stop_value)
+        return exit_idx, r, filled
+
+    def combine(self, exit_idx: np.ndarray, r: np.ndarray,
+                filled: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(position exit_idx, position R, R per leg, fraction stopped out) for these fractions."""
+        f = np.asarray(self.fractions, dtype=np.float64)
+        active = f > 0
+        leg_r = r * f
+        return (exit_idx[:, active].max(axis=1), leg_r.sum(axis=1), leg_r,
+                (~filled[:, active]) @ f[active])
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TRADE ENGINES
+# ═══════════════════════════════════════════════════════════════════════════════
+WARMUP_BARS = 250
+EXIT_COOLDOWN = 5
+
+
+def atr_brackets(close: np.ndarray, atr: np.ndarray, bars: np.ndarray, is_buy: np.ndarray,
+                 sl_mult: float, tp_mult: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(entry, sign, sl, tp) for entries at the close of `bars`."""
+    entry = close[bars]
+    sign = np.where(is_buy, 1.0, -1.0)
+    sl = entry - sign * atr[bars] * sl_mult
+    tp = entry + sign * atr[bars] * tp_mult
+    return entry, sign, sl, tp
+
+
+def select_trades(candidates: np.ndarray, exit_idx: np.ndarray, n_bars: int,
+                  start: int = WARMUP_BARS, cooldown: int = EXIT_COOLDOWN) -> np.ndarray:
+    """Pick the candidates a one-position-at-a-time loop would actually trade.
+
+    The next entry is allowed cooldown + 1 bars after each exit. Exits are
+    already resolved, so this walks candidates only, not bars. Returns
+    positions into `candidates`.
+    """
+    taken = []
+    next_free = start
+    for k in range(len(candidates)):
+        if candidates[k] < next_free:
+            continue
+        taken.append(k)
+        if exit_idx[k] >= n_bars:  # Still open at the end of data
+            break
+        next_free = exit_idx[k] + cooldown + 1
+    return np.asarray(taken, dtype=np.int64)
+
+
+def apply_cooldown(candidates, cooldown: int, start_bar: int = 0) -> np.ndarray:
+    """Keep candidate bars at least `cooldown` bars after the previous kept one (entries may overlap)."""
+    kept = []
+    last = -100
+    for i in candidates:
+        if i >= start_bar and i - last >= cooldown:
+            kept.append(i)
+            last = i
+    return np.asarray(kept, dtype=np.int64)
+
+
+def _trade_candidates(atr: np.ndarray, buy: np.ndarray, sell: np.ndarray, warmup: int) -> np.ndarray:
+    """Bars sequential_trades may enter on: buy/sell with ATR > 0 from warmup on."""
+    with np.errstate(invalid='ignore'):
+        valid_atr = atr > 0
+    return np.flatnonzero((buy | sell) & valid_atr & (np.arange(len(atr)) >= warmup))
+
+
+def _ladder_exits(ladder: 'Ladder', legs, entry, sign, risk):
+    """(exit_idx, outcome, exit_price, tp, legs) of whole positions for one fraction split."""
+    leg_exit, leg_r_full, filled = legs
+    exit_idx, position_r, leg_r, stopped = ladder.combine(leg_exit, leg_r_full, filled)
+    exit_price = entry + sign * position_r * risk
+    tp = entry + sign * ladder.levels_r[-1] * risk
+    outcome = np.where(stopped == 0, EXIT_TP, np.where(filled[:, 0], EXIT_TRAIL, EXIT_SL)).astype(np.int8)
+    return exit_idx, outcome, exit_price, tp, (leg_exit, leg_r, filled, stopped)
+
+
+def _closed_trades(n: int, candidates, is_buy, sign, entry, sl, tp, exit_idx, outcome, exit_price,
+                   legs, exit_mode: str, warmup: int, cooldown: int) -> Dict[str, np.ndarray]:
+    """One position at a time over resolved candidates, as sequential_trades' arrays."""
+    with stage("engine.select_trades"):
+        taken = select_trades(candidates, exit_idx, n, start=warmup, cooldown=cooldown)
+        closed = taken[exit_idx[taken] < n]
+
+    if exit_mode == 'fixed':
+        won = outcome[closed] == EXIT_TP
+    else:
+        won = sign[closed] * (exit_price[closed] - entry[closed]) > 0
+    stopped = legs[3] if legs else (outcome != EXIT_TP).astype(np.float64)
+    out = {
+        'entry_idx': candidates[closed],
+        'exit_idx': exit_idx[closed],
+        'is_buy': is_buy[closed],
+        'sign': sign[closed],
+        'won': won,
+        'outcome': outcome[closed],
+        'stopped': stopped[closed],
+        'entry': entry[closed],
+        'sl': sl[closed],
+        'tp': tp[closed],
+        'exit_price': exit_price[closed],
+    }
+    if legs:
+        out['leg_exit_idx'] = legs[0][closed]
+        out['leg_r'] = legs[1][closed]
+        out['leg_filled'] = legs[2][closed]
+    return out
+
+
+def sequential_trades(high: np.ndarray, low: np.ndarray, close: np.ndarray, atr: np.ndarray,
+                      buy: np.ndarray, sell: np.ndarray, sl_mult: float, tp_mult: float,
+                      warmup: int = WARMUP_BARS, cooldown: int = EXIT_COOLDOWN,
+                      scanner: Optional[BarScanner] = None,
+                      intrabar: Optional[IntrabarIndex] = None,
+                      exit_mode: str = 'fixed', trail_mult: float = 3.0, trail_start_r: float = 1.0,
+                      ema: Optional[np.ndarray] = None, ladder: Optional[Ladder] = None) -> Dict[str, np.ndarray]:
+    """One position at a time, SL/TP plus optional trailing stop, exit cooldown (the rbfx_backtest* loops).
+
+    Entries are taken at the close of buy/sell bars with ATR > 0 from
+    `warmup` on; buy wins when both are set. Bars touching both SL and TP
+    count as stops unless intrabar data settles them. exit_mode other than
+    'fixed' trails the stop (rbfx_first_touch.resolve_trailing_exits, ema
+    for 'ema'); a trade then wins when it closes in profit. exit_mode
+    'ladder' scales out at the Ladder levels instead of tp (ladder defaults
+    to Ladder()). Returns arrays for the closed trades: entry_idx, exit_idx,
+    is_buy, sign, won, outcome, stopped (fraction closed by a stop), entry,
+    sl, tp, exit_price (fraction-weighted for ladders), plus for ladders
+    leg_exit_idx, leg_r (realized R per leg) and leg_filled, one column per
+    level (see leg_ledger).
+    """
+    if exit_mode == 'ladder':
+        return ladder_sweep(high, low, close, atr, buy, sell, sl_mult, [ladder or Ladder()],
+                            warmup=warmup, cooldown=cooldown, scanner=scanner, intrabar=intrabar)[0]
+    n = len(close)
+    candidates = _trade_candidates(atr, buy, sell, warmup)
+    is_buy = buy[candidates]
+    entry, sign, sl, tp = atr_brackets(close, atr, candidates, is_buy, sl_mult, tp_mult)
+
+    with stage("engine.resolve_exits"):
+        if exit_mode == 'fixed':
+            scanner = scanner or BarScanner(high, low)
+            exit_idx, outcome = resolve_exits(scanner, candidates, is_buy, sl, tp, intrabar=intrabar)
+            exit_price = np.where(outcome == EXIT_TP, tp, sl)
+        else:
+            exit_idx, outcome, exit_price = resolve_trailing_exits(
+                high, low, close, candidates, is_buy, sl, tp, exit_mode, trail_mult,
+                atr=atr, ema=ema, start_r=trail_start_r, intrabar=intrabar)
+    return _closed_trades(n, candidates, is_buy, sign, entry, sl, tp, exit_idx, outcome, exit_price,
+                          None, exit_mode, warmup, cooldown)
+
+
+def ladder_sweep(high: np.ndarray, low: np.ndarray, close: np.ndarray, atr: np.ndarray,
+                 buy: np.ndarray, sell: np.ndarray, sl_mult: float, ladders: Sequence[Ladder],
+                 warmup: int = WARMUP_BARS, cooldown: int = EXIT_COOLDOWN,
+                 scanner: Optional[BarScanner] = None,
+                 intrabar: Optional[IntrabarIndex] = None) -> List[Dict[str, np.ndarray]]:
+    """sequential_trades(exit_mode='ladder') for each of several Ladders.
+
+    Legs are resolved once per distinct (levels_r, move_stop, stop_r) and
+    every fraction split is priced on them with Ladder.combine; only the
+    one-position-at-a-time walk over the candidates runs per ladder.
+    """
+    n = len(close)
+    candidates = _trade_candidates(atr, buy, sell, warmup)
+    is_buy = buy[candidates]
+    entry, sign, sl, _ = atr_brackets(close, atr, candidates, is_buy, sl_mult, 0.0)
+    risk = np.abs(entry - sl)
+
+    resolved = {}
+    out = []
+    for ladder in ladders:
+        key = (tuple(ladder.levels_r), ladder.move_stop, ladder.stop_r)
+        if key not in resolved:
+            with stage("engine.resolve_exits"):
+                scanner = scanner or BarScanner(high, low)
+                resolved[key] = ladder.legs(scanner, candidates, is_buy, entry, risk, intrabar=intrabar)
+        exit_idx, outcome, exit_price, tp, legs = _ladder_exits(ladder, resolved[key], entry, sign, risk)
+        out.append(_closed_trades(n, candidates, is_buy, sign, entry, sl, tp, exit_idx, outcome, exit_price,
+                                  legs, 'ladder', warmup, cooldown))
+    return out
+
+
+def compound_risk(r_multiples: np.ndarray, initial_balance: float,
+                  risk_per_trade: float) -> Tuple[np.ndarray, float, list]:
+    """Fixed-fraction P&L: each trade risks risk_per_trade of the running balance.
+
+    Returns (pnls, final_balance, equity_curve).
+    """
+    balance = initial_balance
+    equity_curve = [balance]
+    pnls = np.empty(len(r_multiples))
+    for k in range(len(r_multiples)):
+        pnls[k] = balance * risk_per_trade * r_multiples[k]
+        balance += pnls[k]
+        equity_curve.append(balance)
+    return pnls, balance, equity_curve
+
+
+def leg_ledger(index, trades: Dict[str, np.ndarray], ladder: Ladder) -> pd.DataFrame:
+    """One row per (trade, ladder leg) from sequential_trades(exit_mode='ladder') output.
+
+    Columns: trade, leg, level_r, fraction, entry_time, exit_time, filled
+    (target reached), r (realized R of the leg, fraction included).
+    """
+    active = np.flatnonzero(np.asarray(ladder.fractions) > 0)
+    m = len(trades['entry_idx'])
+    exit_idx = trades['leg_exit_idx'][:, active]
+    return pd.DataFrame({
+        'trade': np.repeat(np.arange(m), len(active)),
+        'leg': np.tile(active, m),
+        'level_r': np.tile(np.asarray(ladder.levels_r)[active], m),
+        'fraction': np.tile(np.asarray(ladder.fractions)[active], m),
+        'entry_time': np.asarray(index[np.repeat(trades['entry_idx'], len(active))]),
+        'exit_time': np.asarray(index[exit_idx.ravel()]),
+        'filled': trades['leg_filled'][:, active].ravel(),
+        'r': trades['leg_r'][:, active].ravel(),
+    })
+
+
+def trade_log(index, trades: Dict[str, np.ndarray], pnls: np.ndarray,
+              r_multiples: np.ndarray) -> List[Dict]:
+    """sequential_trades output as the trade dicts the rbfx_backtest* scripts report."""
+    return [{
+        'entry_time': index[trades['entry_idx'][k]],
+        'exit_time': index[trades['exit_idx'][k]],
+        'type': 'BUY' if trades['is_buy'][k] else 'SELL',
+        'entry': trades['entry'][k],
+        'exit': trades['exit_price'][k],
+        'pnl': pnls[k],
+        'result': 'WIN' if trades['won'][k] else 'LOSS',
+        'r_multiple': r_multiples[k],
+    } for k in range(len(pnls))]
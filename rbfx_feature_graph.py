@@ -0,0 +1,226 @@
+"""
+RetailBeastFX - Lazy Feature Graph v1.0
+Indicator columns as nodes with declared inputs and BacktestConfig params.
+
+Each feature names the columns it reads and the config fields it depends
+on. A column is computed the first time something asks for it, and cached
+under (name, values of every param it transitively depends on). So within
+a sweep, EMA_Slow(21) is computed once for every config with ema_slow=21,
+BB_Std is shared by every bb_mult, and ATR (no period param) is computed
+once per indicator backend. Nothing a strategy doesn't read is ever computed.
+
+    cache = FeatureCache(df)
+    for config in configs:
+        feats = cache.view(config)
+        feats['EMA_Fast'], feats['RSI']   # computed or reused on demand
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from rbfx_backtest_enhanced import (
+    BacktestConfig,
+    calculate_ema,
+    calculate_sma,
+    calculate_atr,
+    calculate_rsi,
+    calculate_adx,
+    get_session_flags,
+)
+from rbfx_core import calculate_stdev
+from rbfx_profiler import stage, count
+
+# Pseudo-inputs: the whole bar frame / its index
+BARS = '@bars'
+INDEX = '@index'
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FEATURE DEFINITIONS
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass(frozen=True)
+class Feature:
+    compute: Callable  # compute(*dep values, *param values)
+    deps: Tuple[str, ...] = ()  # Features, raw bar columns (as Series), BARS or INDEX
+    params: Tuple[str, ...] = ()  # BacktestConfig fields, passed after the deps
+
+
+def _values(result) -> np.ndarray:
+    return result.to_numpy() if isinstance(result, pd.Series) else result
+
+
+FEATURES: Dict[str, Feature] = {
+    'EMA_Fast': Feature(calculate_ema, ('Close',), ('ema_fast',)),
+    'EMA_Slow': Feature(calculate_ema, ('Close',), ('ema_slow',)),
+    'EMA_Trend': Feature(calculate_ema, ('Close',), ('ema_trend',)),
+    'EMA_Trail': Feature(calculate_ema, ('Close',), ('ema_trail',)),
+
+    # calculate_bollinger_bands, split so the std is shared across bb_mult
+    'BB_Mid': Feature(calculate_sma, ('Close',), ('bb_period',)),
+    'BB_Std': Feature(calculate_stdev, ('Close',), ('bb_period', 'indicator_backend')),
+    'BB_Upper': Feature(lambda mid, std, mult: mid + mult * std, ('BB_Mid', 'BB_Std'), ('bb_mult',)),
+    'BB_Lower': Feature(lambda mid, std, mult: mid - mult * std, ('BB_Mid', 'BB_Std'), ('bb_mult',)),
+    'BB_Width': Feature(lambda upper, lower, mid: (upper - lower) / mid, ('BB_Upper', 'BB_Lower', 'BB_Mid')),
+    'BB_WidthMA': Feature(lambda width: pd.Series(width).rolling(20).mean(), ('BB_Width',)),
+
+    'ATR': Feature(lambda bars, backend: calculate_atr(bars, 14, backend), (BARS,), ('indicator_backend',)),
+    'RSI': Feature(calculate_rsi, ('Close',), ('rsi_period', 'indicator_backend')),
+    'ADX': Feature(lambda bars, period, backend: calculate_adx(bars, period, backend=backend),
+                   (BARS,), ('adx_period', 'indicator_backend')),
+    'VolMA': Feature(lambda volume: volume.rolling(20).mean(), ('Volume',)),
+
+    # Session flags (one get_session_flags call feeds all four)
+    'Sessions': Feature(get_session_flags, (INDEX,)),
+    'InLondon': Feature(lambda s: s['london'], ('Sessions',)),
+    'InNY': Feature(lambda s: s['ny_am'], ('Sessions',)),
+    'InSilverBullet': Feature(lambda s: s['silver_bullet'], ('Sessions',)),
+    'ValidSession': Feature(lambda s: s['valid_session'], ('Sessions',)),
+}
+
+
+def feature_params(name: str, features: Dict[str, Feature] = FEATURES) -> Tuple[str, ...]:
+    """Every config field the feature depends on, directly or through its inputs."""
+    if name not in features:
+        return ()
+    found = set(features[name].params)
+    for dep in features[name].deps:
+        found.update(feature_params(dep, features))
+    return tuple(sorted(found))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CACHE
+# ═══════════════════════════════════════════════════════════════════════════════
+class FeatureCache:
+    """Computed features for one bar frame, shared by every config that views it.
+
+    Bounded LRU (max_entries columns); bars are only read.
+    """
+
+    def __init__(self, bars: pd.DataFrame, max_entries: int = 256,
+                 features: Optional[Dict[str, Feature]] = None):
+        self.bars = bars
+        self.max_entries = max_entries
+        self.features = FEATURES if features is None else features
+        self.entries: 'OrderedDict[Tuple, object]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._params = {name: feature_params(name, self.features) for name in self.features}
+
+    def view(self, config: BacktestConfig) -> 'LazyFeatures':
+        return LazyFeatures(self, config)
+
+    def key(self, name: str, config: BacktestConfig) -> Tuple:
+        return (name,) + tuple(getattr(config, p) for p in self._params[name])
+
+    def get(self, name: str, config: BacktestConfig):
+        if name == BARS:
+            return self.bars
+        if name == INDEX:
+            return self.bars.index
+        if name not in self.features:
+            if name not in self.bars.columns:
+                raise KeyError(f"Unknown feature or column: {name}")
+            return self.bars[name]
+
+        key = self.key(name, config)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            count("feature.hits")
+            return self.entries[key]
+
+        feature = self.features[name]
+        inputs = [self.get(dep, config) for dep in feature.deps]
+        with stage(f"feature.{name}"):
+            value = _values(feature.compute(*inputs, *(getattr(config, p) for p in feature.params)))
+        self.misses += 1
+        count("feature.misses")
+        self.entries[key] = value
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+
+class LazyFeatures:
+    """Mapping-style view of a FeatureCache for one config.
+
+    feats[name] returns numpy arrays for features and bar columns; a column
+    is materialized on first access and reused by later views whose params
+    match.
+    """
+
+    def __init__(self, cache: FeatureCache, config: BacktestConfig):
+        self.cache = cache
+        self.config = config
+        self.bars = cache.bars
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        value = self.cache.get(name, self.config)
+        return value.to_numpy() if isinstance(value, pd.Series) else value
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.cache.features or name in self.bars.columns
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def main():
+    import sys
+    import time
+    from itertools import product
+    from rbfx_backtest_enhanced import generate_realistic_data, signal_bundle
+    from rbfx_grid_optimizer import PARAM_GRID, build_config, signal_key
+    from rbfx_rules import lazy_signal_bundle
+
+    print("=" * 70)
+    print("RetailBeastFX - Lazy Feature Graph v1.0")
+    print("=" * 70)
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"\n📊 GENERATING {n:,} SYNTHETIC CANDLES...")
+    df = generate_realistic_data(n, seed=42)
+
+    configs = {}
+    keys = list(PARAM_GRID)
+    for combo in product(*PARAM_GRID.values()):
+        params = dict(zip(keys, combo))
+        configs.setdefault(signal_key(params), build_config(params))
+    print(f"   PARAM_GRID: {len(configs)} distinct signal configurations")
+
+    print("\n" + "=" * 70)
+    print("⚡ SIGNALS FOR THE WHOLE GRID")
+    print("=" * 70)
+    t0 = time.perf_counter()
+    eager = {k: signal_bundle(df, c) for k, c in configs.items()}
+    t_eager = time.perf_counter() - t0
+
+    cache = FeatureCache(df)
+    t0 = time.perf_counter()
+    lazy = {k: lazy_signal_bundle(df, c, cache) for k, c in configs.items()}
+    t_lazy = time.perf_counter() - t0
+
+    same = all(np.array_equal(eager[k].buy, lazy[k].buy) and np.array_equal(eager[k].sell, lazy[k].sell)
+               and np.array_equal(eager[k].setup, lazy[k].setup) for k in configs)
+    print(f"   Eager (every column, every config): {t_eager:6.2f}s")
+    print(f"   Lazy + shared FeatureCache:         {t_lazy:6.2f}s  ({t_eager / t_lazy:.1f}x)")
+    print(f"   Columns computed: {cache.misses} | reused: {cache.hits} | identical signals: {'✅' if same else '❌'}")
+
+    computed = {}
+    for key in cache.entries:
+        computed[key[0]] = computed.get(key[0], 0) + 1
+    print(f"\n   {'Feature':16} | {'Variants':>8} | Params")
+    print("   " + "-" * 50)
+    for name in sorted(computed):
+        print(f"   {name:16} | {computed[name]:>8} | {', '.join(cache._params[name]) or '-'}")
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
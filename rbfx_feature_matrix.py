@@ -0,0 +1,278 @@
+"""
+RetailBeastFX - Compact Feature Matrix v1.0
+Column-block storage for long signal histories.
+
+generate_signals keeps ~50 columns per bar in a wide pandas frame: float64
+indicators and 1-byte bools, ~180 bytes per bar. FeatureMatrix stores the
+same columns as three dense blocks:
+- prices: OHLCV, one row per column (float64 by default)
+- values: indicator/numeric columns, float32 or float64
+- bits:   boolean conditions, 8 bars per byte (np.packbits)
+
+Blocks are (columns x bars) and C-contiguous, so every price or indicator
+column is a zero-copy 1-D view. Boolean conditions can be combined while
+still packed (all_of / any_of) and are only unpacked once. Matrices can be
+saved as .npy files and memory-mapped back without reading them into RAM.
+
+    fm = build_feature_matrix(df, BacktestConfig(), dtype=np.float32)
+    trades, balance, curve = run_backtest_fast(fm.to_bundle(), config)
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rbfx_backtest_enhanced import (
+    BacktestConfig,
+    SignalBundle,
+    SETUP_NORMAL,
+    SETUP_BEST,
+    SETUP_SILVER_BULLET,
+    generate_realistic_data,
+    generate_signals,
+    signal_columns,
+    run_backtest_fast,
+    calculate_metrics,
+)
+
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FEATURE MATRIX
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass
+class FeatureMatrix:
+    index: pd.Index
+    prices: np.ndarray  # (len(PRICE_COLUMNS), n_bars)
+    values: np.ndarray  # (len(float_names), n_bars)
+    bits: np.ndarray  # (len(bool_names), ceil(n_bars / 8)) uint8, little bit order
+    float_names: Tuple[str, ...]
+    bool_names: Tuple[str, ...]
+
+    def __post_init__(self):
+        self._rows = {name: ('price', i) for i, name in enumerate(PRICE_COLUMNS)}
+        self._rows.update({name: ('value', i) for i, name in enumerate(self.float_names)})
+        self._rows.update({name: ('bit', i) for i, name in enumerate(self.bool_names)})
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rows
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.prices.nbytes + self.values.nbytes + self.bits.nbytes + self.index.nbytes
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Column as a 1-D array (a view, except for unpacked booleans)."""
+        kind, row = self._rows[name]
+        if kind == 'price':
+            return self.prices[row]
+        if kind == 'value':
+            return self.values[row]
+        return self._unpack(self.bits[row])
+
+    def packed(self, name: str) -> np.ndarray:
+        """Packed bytes of a boolean column (view)."""
+        kind, row = self._rows[name]
+        if kind != 'bit':
+            raise KeyError(f"{name} is not a boolean column")
+        return self.bits[row]
+
+    def all_of(self, *names: str) -> np.ndarray:
+        """AND of boolean columns, combined while packed."""
+        out = self.packed(names[0]).copy()
+        for name in names[1:]:
+            out &= self.packed(name)
+        return self._unpack(out)
+
+    def any_of(self, *names: str) -> np.ndarray:
+        """OR of boolean columns (absent names are skipped)."""
+        out = np.zeros(self.bits.shape[1], dtype=np.uint8)
+        for name in names:
+            if name in self._rows:
+                out |= self.packed(name)
+        return self._unpack(out)
+
+    def _unpack(self, packed: np.ndarray) -> np.ndarray:
+        return np.unpackbits(packed, count=len(self), bitorder='little').view(bool)
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # Engine / pandas interop
+    # ─────────────────────────────────────────────────────────────────────────
+    def to_bundle(self, diagnostics: Tuple[str, ...] = ()) -> SignalBundle:
+        """SignalBundle for run_backtest_fast.
+
+        High/Low/Close are views when prices are float64. ATR is upcast to
+        float64 when stored as float32 (SL/TP levels then carry float32
+        rounding, so results can differ from the float64 run by a few trades).
+        """
+        sb = self.any_of('SilverBulletBuy', 'SilverBulletSell')
+        best = self.any_of('BestBuySetup', 'BestSellSetup')
+        return SignalBundle(
+            index=self.index,
+            high=self['High'].astype(np.float64, copy=False),
+            low=self['Low'].astype(np.float64, copy=False),
+            close=self['Close'].astype(np.float64, copy=False),
+            atr=self['ATR'].astype(np.float64, copy=False),
+            buy=self['BuySignal'],
+            sell=self['SellSignal'],
+            setup=np.where(sb, SETUP_SILVER_BULLET, np.where(best, SETUP_BEST, SETUP_NORMAL)).astype(np.int8),
+            diagnostics={name: self[name] for name in diagnostics},
+        )
+
+    def to_frame(self, names: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Wide DataFrame of the requested columns (all by default)."""
+        names = list(names) if names is not None else self.columns
+        return pd.DataFrame({name: self[name] for name in names}, index=self.index)
+
+    @classmethod
+    def from_columns(cls, index: pd.Index, columns: Dict[str, object], dtype=np.float32,
+                     price_dtype=np.float64) -> 'FeatureMatrix':
+        """Matrix from {name: array-like}; bool columns are packed, the rest go to values."""
+        prices = np.empty((len(PRICE_COLUMNS), len(index)), dtype=price_dtype)
+        float_names, bool_names = [], []
+        for name, col in columns.items():
+            if name in PRICE_COLUMNS:
+                continue
+            (bool_names if np.asarray(col).dtype == bool else float_names).append(name)
+
+        for i, name in enumerate(PRICE_COLUMNS):
+            prices[i] = np.asarray(columns[name], dtype=np.float64) if name in columns else np.nan
+        values = np.empty((len(float_names), len(index)), dtype=dtype)
+        for i, name in enumerate(float_names):
+            values[i] = np.asarray(columns[name], dtype=np.float64)
+        bits = np.empty((len(bool_names), (len(index) + 7) // 8), dtype=np.uint8)
+        for i, name in enumerate(bool_names):
+            bits[i] = np.packbits(np.asarray(columns[name], dtype=bool), bitorder='little')
+
+        return cls(index, prices, values, bits, tuple(float_names), tuple(bool_names))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dtype=np.float32, price_dtype=np.float64) -> 'FeatureMatrix':
+        """Matrix from a generate_signals frame (or any numeric/bool frame)."""
+        return cls.from_columns(df.index, {c: df[c].to_numpy() for c in df.columns}, dtype, price_dtype)
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # Persistence
+    # ─────────────────────────────────────────────────────────────────────────
+    def save(self, path: str):
+        """Write the blocks as .npy files (plus column names) into directory `path`."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'index.npy'), self.index.to_numpy())
+        np.save(os.path.join(path, 'prices.npy'), self.prices)
+        np.save(os.path.join(path, 'values.npy'), self.values)
+        np.save(os.path.join(path, 'bits.npy'), self.bits)
+        with open(os.path.join(path, 'columns.json'), 'w') as f:
+            json.dump({
+                'float_names': self.float_names,
+                'bool_names': self.bool_names,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'FeatureMatrix':
+        """Read a saved matrix; with mmap the blocks stay on disk until touched."""
+        mode = 'r' if mmap else None
+        with open(os.path.join(path, 'columns.json')) as f:
+            meta = json.load(f)
+        return cls(
+            index=pd.Index(np.load(os.path.join(path, 'index.npy'))),
+            prices=np.load(os.path.join(path, 'prices.npy'), mmap_mode=mode),
+            values=np.load(os.path.join(path, 'values.npy'), mmap_mode=mode),
+            bits=np.load(os.path.join(path, 'bits.npy'), mmap_mode=mode),
+            float_names=tuple(meta['float_names']),
+            bool_names=tuple(meta['bool_names']),
+        )
+
+
+def build_feature_matrix(df: pd.DataFrame, config: BacktestConfig, dtype=np.float32,
+                         price_dtype=np.float64) -> FeatureMatrix:
+    """All generate_signals columns for config, stored compactly (df is only read)."""
+    cols = signal_columns(df, config)
+    columns = {name: df[name].to_numpy() for name in PRICE_COLUMNS if name in df.columns}
+    columns.update((name, np.asarray(values)) for name, values in cols.items())
+    return FeatureMatrix.from_columns(df.index, columns, dtype, price_dtype)
+
+
+def estimate_nbytes(n_bars: int, n_float: int, n_bool: int, dtype=np.float32,
+                    price_dtype=np.float64) -> int:
+    """Bytes needed for n_bars of a FeatureMatrix (index included)."""
+    per_bar = (len(PRICE_COLUMNS) * np.dtype(price_dtype).itemsize + n_float * np.dtype(dtype).itemsize
+               + 8)  # int64 index
+    return n_bars * per_bar + n_bool * ((n_bars + 7) // 8)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def main():
+    print("=" * 70)
+    print("RetailBeastFX - Compact Feature Matrix v1.0")
+    print("=" * 70)
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"\n📊 GENERATING {n:,} SYNTHETIC CANDLES...")
+    df = generate_realistic_data(n, seed=42)
+    config = BacktestConfig()
+
+    frame = generate_signals(df.copy(), config)
+    frame_bytes = frame.memory_usage(deep=True).sum()
+    fm64 = build_feature_matrix(df, config, dtype=np.float64)
+    fm32 = build_feature_matrix(df, config, dtype=np.float32)
+
+    print("\n" + "=" * 70)
+    print("💾 MEMORY PER SYMBOL")
+    print("=" * 70)
+    print(f"\n   {len(fm32.float_names)} numeric + {len(fm32.bool_names)} boolean feature columns")
+    print(f"   {'Layout':28} | {'Total':>10} | {'Bytes/bar':>9}")
+    print("   " + "-" * 54)
+    for label, size in (("pandas frame (float64/bool)", frame_bytes),
+                        ("FeatureMatrix float64", fm64.nbytes),
+                        ("FeatureMatrix float32", fm32.nbytes)):
+        print(f"   {label:28} | {size / 1e6:8.1f}MB | {size / n:9.1f}")
+
+    print("\n" + "=" * 70)
+    print("⚙️  ENGINE ON ZERO-COPY VIEWS")
+    print("=" * 70)
+    reference, _, _ = run_backtest_fast(frame, config)
+    for label, fm in (("float64", fm64), ("float32", fm32)):
+        t0 = time.perf_counter()
+        bundle = fm.to_bundle()
+        trades, balance, curve = run_backtest_fast(bundle, config)
+        elapsed = time.perf_counter() - t0
+        same = sum(a.entry_time == b.entry_time and a.result == b.result for a, b in zip(trades, reference))
+        m = calculate_metrics(trades, config.initial_balance, balance, curve)
+        print(f"   {label}: {len(trades)} trades ({same} identical to pandas run), "
+              f"PF {m.get('profit_factor', 0):.2f}, {elapsed * 1e3:.0f}ms "
+              f"(High view: {np.shares_memory(bundle.high, fm.prices)})")
+
+    # 10 years of 1-minute bars x 20 symbols
+    bars = 10 * 252 * 24 * 60
+    symbols = 20
+    print("\n" + "=" * 70)
+    print(f"📐 PROJECTION: {symbols} symbols x 10 years of 1m bars ({bars * symbols / 1e6:.0f}M bars)")
+    print("=" * 70)
+    for label, nbytes in (
+        ("pandas frame", frame_bytes / n * bars),
+        ("FeatureMatrix float64", estimate_nbytes(bars, len(fm32.float_names), len(fm32.bool_names), np.float64)),
+        ("FeatureMatrix float32", estimate_nbytes(bars, len(fm32.float_names), len(fm32.bool_names), np.float32)),
+        ("float32 + float32 prices", estimate_nbytes(bars, len(fm32.float_names), len(fm32.bool_names),
+                                                      np.float32, np.float32)),
+    ):
+        print(f"   {label:26} {nbytes * symbols / 1e9:7.1f} GB")
+    print("\n   Saved matrices can be memory-mapped (FeatureMatrix.load(path, mmap=True)),")
+    print("   so only the symbols being backtested need to be resident.")
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+RetailBeastFX - Forward Scan Kernels v1.0
+Vectorized "first bar at or after i where a series reaches a level" queries.
+
+Stop/target touches, zone invalidation and limit fills all reduce to the same
+question asked once per trade or zone. ForwardScanner answers any number of
+them in one pass using block maxima plus a sparse table, instead of walking
+bars with iloc.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+# Queries are resolved in chunks so the (chunk x block) gather stays small
+QUERY_CHUNK = 65536
+# Cells per (bars x child bars) gather when settling same-bar exits
+INTRABAR_CHUNK = 1 << 20
+# Cells per (open trades x window) step of resolve_trailing_exits, and its narrowest window
+TRAIL_CHUNK = 1 << 18
+TRAIL_MIN_WINDOW = 8
+
+
+class ForwardScanner:
+    """Index over one series answering first-index-at-or-above-level queries.
+
+    Build once per series (O(n)), then each batch of q queries costs
+    O(q * (block_size + log n)) fully inside NumPy. NaN values never match.
+    Scan a minimum series by passing its negation (see BarScanner).
+    """
+
+    def __init__(self, values: np.ndarray, block_size: int = 64):
+        values = np.asarray(values, dtype=np.float64)
+        self.n = len(values)
+        self.block_size = block_size
+        self.n_blocks = max(1, -(-self.n // block_size))
+
+        padded = np.full(self.n_blocks * block_size, -np.inf)
+        padded[:self.n] = np.where(np.isnan(values), -np.inf, values)
+        self.blocks = padded.reshape(self.n_blocks, block_size)
+
+        # table[k][b] = max of block maxima b .. b + 2**k - 1
+        table = [self.blocks.max(axis=1)]
+        k = 1
+        while (1 << k) <= self.n_blocks:
+            prev = table[-1]
+            half = 1 << (k - 1)
+            table.append(np.maximum(prev[:-half], prev[half:]))
+            k += 1
+        self.table = table
+
+    def first_at_or_above(self, start, level, stop=None, strict: bool = False) -> np.ndarray:
+        """First index j >= start with values[j] >= level (> level if strict).
+
+        start/level/stop broadcast against each other. Returns n where no
+        index in [start, stop) qualifies.
+        """
+        start, level = np.broadcast_arrays(np.asarray(start, dtype=np.int64),
+                                           np.asarray(level, dtype=np.float64))
+        start = start.ravel()
+        level = level.ravel()
+        if strict:
+            level = np.nextafter(level, np.inf)
+
+        result = np.full(len(start), self.n, dtype=np.int64)
+        for lo in range(0, len(start), QUERY_CHUNK):
+            hi = lo + QUERY_CHUNK
+            result[lo:hi] = self._scan(start[lo:hi], level[lo:hi])
+
+        if stop is not None:
+            stop = np.broadcast_to(np.asarray(stop, dtype=np.int64), result.shape)
+            result = np.where(result < stop, result, self.n)
+        return result
+
+    def _scan(self, start: np.ndarray, level: np.ndarray) -> np.ndarray:
+        B = self.block_size
+        out = np.full(len(start), self.n, dtype=np.int64)
+        valid = (start >= 0) & (start < self.n) & ~np.isnan(level)
+        if not valid.any():
+            return out
+
+        idx = np.flatnonzero(valid)
+        s = start[idx]
+        lv = level[idx]
+
+        # 1. Partial scan of the block containing start
+        b0 = s // B
+        rows = self.blocks[b0]
+        hit = (rows >= lv[:, None]) & (np.arange(B) >= (s % B)[:, None])
+        has = hit.any(axis=1)
+        out[idx[has]] = b0[has] * B + hit[has].argmax(axis=1)
+
+        # 2. Binary lifting over block maxima for the rest
+        rest = ~has
+        if not rest.any():
+            return out
+        ridx = idx[rest]
+        lv = lv[rest]
+        pos = b0[rest] + 1
+        for k in range(len(self.table) - 1, -1, -1):
+            tk = self.table[k]
+            inside = pos < len(tk)
+            skip = np.zeros(len(pos), dtype=bool)
+            skip[inside] = tk[pos[inside]] < lv[inside]
+            pos = pos + skip * (1 << k)
+
+        found = pos < self.n_blocks
+        found[found] = self.table[0][pos[found]] >= lv[found]
+        if found.any():
+            rows = self.blocks[pos[found]]
+            first = (rows >= lv[found][:, None]).argmax(axis=1)
+            out[ridx[found]] = pos[found] * B + first
+        return out
+
+
+class BarScanner:
+    """Paired scanners over an OHLC frame's High and Low columns."""
+
+    def __init__(self, high: np.ndarray, low: np.ndarray, block_size: int = 64):
+        self.n = len(high)
+        self.up = ForwardScanner(high, block_size)
+        self.down = ForwardScanner(-np.asarray(low, dtype=np.float64), block_size)
+
+    def first_high_at_or_above(self, start, level, stop=None, strict: bool = False) -> np.ndarray:
+        return self.up.first_at_or_above(start, level, stop, strict)
+
+    def first_low_at_or_below(self, start, level, stop=None, strict: bool = False) -> np.ndarray:
+        return self.down.first_at_or_above(start, -np.asarray(level, dtype=np.float64), stop, strict)
+
+
+def first_cross(values: np.ndarray, start, level, above: bool = True,
+                stop=None, strict: bool = False,
+                scanner: Optional[ForwardScanner] = None) -> np.ndarray:
+    """One-shot helper: first index >= start where values cross level.
+
+    above=True looks for values >= level, above=False for values <= level.
+    Pass a prebuilt scanner (built on values or -values) to reuse it.
+    """
+    level = np.asarray(level, dtype=np.float64)
+    if above:
+        scanner = scanner or ForwardScanner(values)
+        return scanner.first_at_or_above(start, level, stop, strict)
+    scanner = scanner or ForwardScanner(-np.asarray(values, dtype=np.float64))
+    return scanner.first_at_or_above(start, -level, stop, strict)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BATCH FIRST-TOUCH RESOLVER
+# ═══════════════════════════════════════════════════════════════════════════════
+EXIT_SL = -1
+EXIT_NONE = 0
+EXIT_TP = 1
+
+
+class IntrabarIndex:
+    """Lower-timeframe bars (1m or ticks) behind each parent bar.
+
+    Parent bar i covers the child bars stamped in [parent_times[i],
+    parent_times[i + 1]); the last one spans the median bar length. The
+    ranges come from one searchsorted call, and only the children of bars
+    passed to resolve() are ever read, so a backtest pays for the fine data
+    only on bars where SL and TP were both touched. For ticks pass the price
+    as child_high and leave child_low out.
+    """
+
+    def __init__(self, parent_times, child_times, child_high: np.ndarray,
+                 child_low: Optional[np.ndarray] = None):
+        parent = pd.DatetimeIndex(parent_times).as_unit('ns').asi8
+        child = pd.DatetimeIndex(child_times).as_unit('ns').asi8
+        span = int(np.median(np.diff(parent))) if len(parent) > 1 else 0
+        bounds = np.append(parent, parent[-1] + span) if len(parent) else parent
+
+        edges = np.searchsorted(child, bounds, side='left')
+        self.start = edges[:-1]
+        self.end = edges[1:]
+        self.high = np.asarray(child_high, dtype=np.float64)
+        self.low = self.high if child_low is None else np.asarray(child_low, dtype=np.float64)
+
+    def resolve(self, bars, is_buy, sl, tp) -> np.ndarray:
+        """EXIT_SL / EXIT_TP for trades that touched SL and TP within parent `bars`.
+
+        The first child bar touching either level decides; a child bar that
+        touches both, or a parent bar with no children, stays a stop.
+        """
+        bars = np.asarray(bars, dtype=np.int64)
+        is_buy, sl, tp = np.broadcast_arrays(np.asarray(is_buy, dtype=bool),
+                                             np.asarray(sl, dtype=np.float64),
+                                             np.asarray(tp, dtype=np.float64))
+        outcome = np.full(len(bars), EXIT_SL, dtype=np.int8)
+        if len(bars) == 0 or len(self.high) == 0:
+            return outcome
+
+        lo = self.start[bars]
+        width = max(1, int((self.end[bars] - lo).max()))
+        rows = max(1, INTRABAR_CHUNK // width)
+        for a in range(0, len(bars), rows):
+            z = slice(a, a + rows)
+            cols = lo[z, None] + np.arange(width)
+            inside = cols < self.end[bars[z], None]
+            cols = np.minimum(cols, len(self.high) - 1)
+            high, low = self.high[cols], self.low[cols]
+            buy = is_buy[z, None]
+            with np.errstate(invalid='ignore'):
+                sl_touch = inside & np.where(buy, low <= sl[z, None], high >= sl[z, None])
+                tp_touch = inside & np.where(buy, high >= tp[z, None], low <= tp[z, None])
+            sl_first = np.where(sl_touch.any(axis=1), sl_touch.argmax(axis=1), width)
+            tp_first = np.where(tp_touch.any(axis=1), tp_touch.argmax(axis=1), width)
+            outcome[z] = np.where(tp_first < sl_first, EXIT_TP, EXIT_SL)
+        return outcome
+
+
+def resolve_exits(scanner: BarScanner, entry_idx, is_buy, sl, tp,
+                  max_bars: Optional[int] = None,
+                  intrabar: Optional[IntrabarIndex] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Resolve SL/TP for many trades entered at the close of entry_idx.
+
+    Scanning starts on the bar after entry. When SL and TP are touched on the
+    same bar the stop wins (worst case, as in every backtester here), unless
+    an IntrabarIndex is given: then that bar's child bars decide which was
+    hit first. With max_bars the search stops before entry_idx + max_bars,
+    matching simulate_trade's range(entry + 1, entry + max_bars).
+
+    Returns:
+        (exit_idx, outcome) with outcome EXIT_SL / EXIT_TP / EXIT_NONE and
+        exit_idx == scanner.n when nothing was touched.
+    """
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    is_buy, sl, tp = np.broadcast_arrays(np.asarray(is_buy, dtype=bool),
+                                         np.asarray(sl, dtype=np.float64),
+                                         np.asarray(tp, dtype=np.float64))
+    start = entry_idx + 1
+    stop = entry_idx + max_bars if max_bars is not None else None
+    n = scanner.n
+
+    sl_hit = np.full(len(entry_idx), n, dtype=np.int64)
+    tp_hit = np.full(len(entry_idx), n, dtype=np.int64)
+    b = is_buy
+    s = ~is_buy
+    if b.any():
+        st = stop[b] if stop is not None else None
+        sl_hit[b] = scanner.first_low_at_or_below(start[b], sl[b], st)
+        tp_hit[b] = scanner.first_high_at_or_above(start[b], tp[b], st)
+    if s.any():
+        st = stop[s] if stop is not None else None
+        sl_hit[s] = scanner.first_high_at_or_above(start[s], sl[s], st)
+        tp_hit[s] = scanner.first_low_at_or_below(start[s], tp[s], st)
+
+    exit_idx = np.minimum(sl_hit, tp_hit)
+    outcome = np.where(exit_idx >= n, EXIT_NONE, np.where(sl_hit <= tp_hit, EXIT_SL, EXIT_TP)).astype(np.int8)
+    if intrabar is not None:
+        tied = np.flatnonzero((sl_hit == tp_hit) & (exit_idx < n))
+        outcome[tied] = intrabar.resolve(exit_idx[tied], is_buy[tied], sl[tied], tp[tied])
+    return exit_idx, outcome
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TRAILING-STOP RESOLVER
+# ═══════════════════════════════════════════════════════════════════════════════
+EXIT_TRAIL = 2  # Stopped out after the stop had been moved (profit or breakeven)
+
+# fixed = plain SL/TP; atr = chandelier (best price since entry - trail_mult x ATR);
+# ema = stop follows an EMA; breakeven = stop to entry. Trailing arms at start_r.
+TRAIL_MODES = ('fixed', 'atr', 'ema', 'breakeven')
+
+
+def resolve_trailing_exits(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                           entry_idx, is_buy, sl, tp, mode: str = 'atr', trail_mult=3.0,
+                           atr: Optional[np.ndarray] = None, ema: Optional[np.ndarray] = None,
+                           start_r=1.0, max_bars: Optional[int] = None,
+                           intrabar: Optional[IntrabarIndex] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Resolve exits for many trades whose stop moves with the price path.
+
+    Each trade is entered at the close of entry_idx and checked bar by bar
+    against the stop in force at the previous close and against tp (NaN or
+    inf = no target); SL wins ties unless intrabar data settles them. After
+    each close the stop ratchets towards the mode's level once the best
+    price since entry is start_r x the initial risk in profit. A close
+    through the new stop exits at that close.
+
+    Trades are rows: trail_mult and start_r may be per-row arrays, so one
+    call prices a whole sweep of trail settings (stack the entries once per
+    setting). Each step advances every open row a window of bars at once:
+    the stop path over the window is a running max, so a row's first exit
+    comes from one (rows x window) pass. Windows start at TRAIL_MIN_WINDOW
+    bars and double each step, capped at about TRAIL_CHUNK cells, so a
+    trade held for a million bars takes a few dozen steps. The work is the
+    total bars held plus at most one window of overshoot per row.
+
+    Returns:
+        (exit_idx, outcome, exit_price) with outcome EXIT_SL / EXIT_TRAIL /
+        EXIT_TP / EXIT_NONE. Rows still open at max_bars exit at that close
+        (exit_idx = the last bar held); rows open at the end of data get
+        exit_idx == len(close) and the last close as exit_price.
+    """
+    if mode not in TRAIL_MODES:
+        raise ValueError(f"Unknown exit mode {mode!r} (expected one of {TRAIL_MODES})")
+    if mode == 'atr' and atr is None:
+        raise ValueError("mode='atr' needs the atr array")
+    if mode == 'ema' and ema is None:
+        raise ValueError("mode='ema' needs the ema array")
+
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    entry_idx, is_buy, sl, tp, trail_mult, start_r = np.broadcast_arrays(
+        entry_idx, np.asarray(is_buy, dtype=bool), np.asarray(sl, dtype=np.float64),
+        np.asarray(tp, dtype=np.float64), np.asarray(trail_mult, dtype=np.float64),
+        np.asarray(start_r, dtype=np.float64))
+    n = len(close)
+    m = len(entry_idx)
+
+    # Work in "long space": shorts are mirrored by negating prices, so one set
+    # of comparisons handles both directions
+    sign = np.where(is_buy, 1.0, -1.0)
+    entry = sign * close[entry_idx]
+    stop = sign * sl
+    target = np.where(np.isnan(tp), np.inf, sign * tp)
+    arm_at = entry + start_r * (entry - stop)
+    best = entry.copy()
+    moved = np.zeros(m, dtype=bool)
+    last = np.full(m, n - 1, dtype=np.int64)
+    if max_bars is not None:
+        last = np.minimum(entry_idx + max_bars - 1, n - 1)
+
+    exit_idx = np.full(m, n, dtype=np.int64)
+    outcome = np.full(m, EXIT_NONE, dtype=np.int8)
+    exit_price = np.full(m, np.nan)
+    timed_out = entry_idx >= last
+    exit_idx[timed_out] = np.where(max_bars is not None, last[timed_out], n)
+    exit_price[timed_out] = close[np.minimum(last[timed_out], n - 1)]
+
+    rows = np.flatnonzero(~timed_out)
+    start = entry_idx + 1  # First bar of each row's next window
+    width = TRAIL_MIN_WINDOW
+    while len(rows):
+        j = start[rows, None] + np.arange(width)
+        jc = np.minimum(j, n - 1)
+        s = sign[rows, None]
+        up = s > 0
+        hi = np.where(up, high[jc], -low[jc])
+        lo = np.where(up, low[jc], -high[jc])
+        st0 = stop[rows, None]
+        tg = target[rows, None]
+
+        # Stop after each bar's close: ratchets only up, so a running max
+        peak = np.maximum(best[rows, None], np.maximum.accumulate(hi, axis=1))
+        if mode == 'fixed':
+            st = np.broadcast_to(st0, j.shape)
+        else:
+            if mode == 'atr':
+                level = peak - trail_mult[rows, None] * atr[jc]
+            elif mode == 'ema':
+                level = s * ema[jc]
+            else:
+                level = np.broadcast_to(entry[rows, None], j.shape)
+            with np.errstate(invalid='ignore'):
+                level = np.where((peak >= arm_at[rows, None]) & ~np.isnan(level), level, -np.inf)
+            st = np.maximum(st0, np.maximum.accumulate(level, axis=1))
+        prev = np.concatenate([st0, st[:, :-1]], axis=1)  # Stop in force during each bar
+        now_moved = moved[rows, None] | (st > st0)
+
+        with np.errstate(invalid='ignore'):
+            hit_sl = lo <= prev
+            hit_tp = hi >= tg
+            through = now_moved & (s * close[jc] <= st)
+        event = hit_sl | hit_tp | through | (j >= last[rows, None])
+        has = event.any(axis=1)
+
+        # No exit in the window: carry the state to the next one
+        idle = ~has
+        carry = rows[idle]
+        stop[carry] = st[idle, -1]
+        best[carry] = peak[idle, -1]
+        moved[carry] = now_moved[idle, -1]
+        start[carry] += width
+
+        # First event bar per row, settled in the same order as a bar walk
+        r = np.flatnonzero(has)
+        k = event[r].argmax(axis=1)
+        out = rows[r]
+        jj = j[r, k]
+        sl_k, tp_k = hit_sl[r, k], hit_tp[r, k]
+        sk = s[r, 0]
+        prev_k, tg_k = prev[r, k], tg[r, 0]
+        if intrabar is not None:
+            tied = np.flatnonzero(sl_k & tp_k)
+            if len(tied):
+                sl_k[tied] = intrabar.resolve(jj[tied], up[r[tied], 0], sk[tied] * prev_k[tied],
+                                              sk[tied] * tg_k[tied]) == EXIT_SL
+        tp_k &= ~sl_k
+        was_moved = moved[out] | (prev_k > st0[r, 0])
+        trail_k = ~sl_k & ~tp_k & through[r, k]
+        end_k = ~sl_k & ~tp_k & ~trail_k
+
+        exit_idx[out] = np.where(end_k, last[out] if max_bars is not None else n, jj)
+        exit_price[out] = np.select([sl_k, tp_k, trail_k], [sk * prev_k, sk * tg_k, close[jj]],
+                                    close[last[out]])
+        outcome[out] = np.select([tp_k, sl_k & was_moved, sl_k, trail_k],
+                                 [EXIT_TP, EXIT_TRAIL, EXIT_SL, EXIT_TRAIL], EXIT_NONE)
+        rows = carry
+        # Most trades close early: widen by doubling, up to ~TRAIL_CHUNK cells
+        width = max(TRAIL_MIN_WINDOW, min(2 * width, TRAIL_CHUNK // max(len(rows), 1)))
+    return exit_idx, outcome, exit_price
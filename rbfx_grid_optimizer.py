@@ -6,18 +6,40 @@ Systematic parameter sweep to find optimal strategy configurations.
 import pandas as pd
 import numpy as np
 from itertools import product
-from typing import Dict, List, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+import hashlib
+import json
+import os
 import sys
+import time
 
 # Import from enhanced backtester
 from rbfx_backtest_enhanced import (
     BacktestConfig, 
     generate_realistic_data,
-    generate_signals,
-    run_backtest,
-    calculate_metrics
+    SignalBundle,
+    run_backtest_fast,
+    run_ladder_sweep,
+    calculate_metrics,
+    WARMUP_BARS,
 )
+from rbfx_v9_backtest import (
+    V9Config,
+    generate_market_data,
+    THRESHOLD_PARAMS,
+    score_bars,
+    batch_trades,
+    calculate_v9_metrics,
+)
+from rbfx_core import COST_PARAMS
+from rbfx_result_store import ResultStore, MISS, data_fingerprint, hash_config, code_version, V9_ENGINE_FILES
+from rbfx_feature_graph import FeatureCache
+from rbfx_rules import lazy_signal_bundle
+import rbfx_profiler
+from rbfx_profiler import stage, count, profiled
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # PARAMETER GRID
@@ -45,54 +67,356 @@ FAST_GRID = {
     'killzone_only': [True],
 }
 
+# PARAM_GRID plus the dimensions an exhaustive grid can't afford (155,520 cells)
+SEARCH_SPACE = {
+    **PARAM_GRID,
+    'rsi_overbought': [65, 70, 75],
+    'bb_mult': [1.0, 1.5, 2.0],
+    'ema_trend': [100, 200],
+    'cooldown': [3, 5, 10],
+}
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # OPTIMIZER
 # ═══════════════════════════════════════════════════════════════════════════════
-def run_grid_optimization(df: pd.DataFrame, param_grid: Dict, min_trades: int = 10) -> List[Dict]:
-    """Run grid search over parameter combinations."""
+# Parameters that only affect trade management, not generate_signals output
+EXECUTION_PARAMS = ('sl_atr_mult', 'tp_atr_mult', 'cooldown', 'execution', 'instrument',
+                    'exit_mode', 'trail_atr_mult', 'trail_start_r', 'ema_trail',
+                    'ladder_fractions', 'ladder_move_stop', 'ladder_stop_r') + COST_PARAMS
+
+def build_config(params: Dict) -> BacktestConfig:
+    """BacktestConfig for one grid cell (unlisted parameters keep BacktestConfig defaults)."""
+    return BacktestConfig(**params)
+
+def config_hash(params: Dict) -> str:
+    """Stable hash of a parameter set (key order and numpy scalars don't matter)."""
+    canonical = json.dumps({k: params[k] for k in sorted(params)}, default=str, sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+def signal_key(params: Dict) -> Tuple:
+    """Key shared by all grid cells that produce identical signals."""
+    return tuple(sorted((k, v) for k, v in params.items() if k not in EXECUTION_PARAMS))
+
+def precompute_signals(df: pd.DataFrame, param_grid: Dict) -> Dict[Tuple, SignalBundle]:
+    """Build signals once per distinct signal configuration in the grid.
+    
+    SL/TP multipliers don't change the signals, so a grid with 4 SL x TP
+    pairs needs a quarter of the signal passes, and indicators are shared
+    between configurations through one FeatureCache (only the columns each
+    strategy reads are computed). Bundles hold only the entry arrays and
+    share df's price columns, so keeping one per signal configuration costs
+    a few bytes per bar.
+    """
+    keys = list(param_grid.keys())
+    signals = {}
+    features = FeatureCache(df)
+    for combo in product(*param_grid.values()):
+        params = dict(zip(keys, combo))
+        key = signal_key(params)
+        if key not in signals:
+            signals[key] = lazy_signal_bundle(df, build_config(params), features)
+    return signals
+
+def slice_window(df_signals: Union[pd.DataFrame, SignalBundle],
+                 window: Optional[Tuple[int, int]]) -> Union[pd.DataFrame, SignalBundle]:
+    """Bars [start, end) plus the WARMUP_BARS before start as lead-in.
+    
+    The backtester never enters during its first WARMUP_BARS bars, so the
+    lead-in makes trading start exactly at `start` while indicators (already
+    computed on the full series) are reused as-is.
+    """
+    if window is None:
+        return df_signals
+    start, end = window
+    if isinstance(df_signals, SignalBundle):
+        return df_signals.slice(max(0, start - WARMUP_BARS), end)
+    return df_signals.iloc[max(0, start - WARMUP_BARS):end]
+
+def evaluate_params(df_signals, params: Dict, window: Optional[Tuple[int, int]] = None,
+                    store: Optional[ResultStore] = None, data_fp: Optional[str] = None) -> Optional[Dict]:
+    """calculate_metrics for one parameter set (None if the backtest fails).
+    
+    df_signals may be a callable returning the signals, so a cache hit
+    in `store` skips signal generation entirely. data_fp must identify the
+    bars and window when a store is given. Failed backtests are reported
+    and never stored, so the next run retries them.
+    """
+    config = build_config(params)
+    if store is not None:
+        with stage("store.get"):
+            cached = store.get(data_fp, config)
+        if cached is not MISS:
+            count("store.hits")
+            return cached
+        count("store.misses")
+    
+    try:
+        frame = df_signals() if callable(df_signals) else df_signals
+        trades, final_balance, equity_curve = run_backtest_fast(slice_window(frame, window), config)
+        with stage("calculate_metrics"):
+            metrics = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
+    except Exception as e:
+        count("grid.errors")
+        print(f"   ⚠️ Backtest failed for {params}: {e!r}")
+        return None
+    
+    if store is not None:
+        with stage("store.put"):
+            store.put(data_fp, config, metrics, trades)
+    return metrics
+
+def eligible(metrics: Optional[Dict], params: Dict, min_trades: int) -> Optional[Dict]:
+    """Metrics tagged with params if the cell traded at least min_trades, else None."""
+    if not metrics or metrics.get('total_trades', 0) < min_trades:
+        return None
+    return {**metrics, 'params': params}
+
+@profiled("grid")
+def run_grid_optimization(df: pd.DataFrame, param_grid: Dict, min_trades: int = 10,
+                          signals: Optional[Dict[Tuple, SignalBundle]] = None,
+                          window: Optional[Tuple[int, int]] = None,
+                          verbose: bool = True,
+                          store: Optional[ResultStore] = None) -> List[Dict]:
+    """Run grid search over parameter combinations.
+    
+    Pass `signals` from precompute_signals to reuse indicator passes across
+    calls, and `window` to backtest only bars [start, end) of the series.
+    With a `store`, cells already cached for this data and code version are
+    read back instead of recomputed, and signals are only generated for the
+    cells that are missing.
+    """
     
     # Generate all combinations
     keys = list(param_grid.keys())
     values = list(param_grid.values())
     combinations = list(product(*values))
     
-    print(f"   Testing {len(combinations)} parameter combinations...")
+    if verbose:
+        print(f"   Testing {len(combinations)} parameter combinations...")
+    
+    if signals is None:
+        signals = {}
+    data_fp = None
+    if store is not None:
+        data_fp = data_fingerprint(df if df is not None else next(iter(signals.values())).source, window)
+    
+    features = FeatureCache(df) if df is not None else None
+    
+    def signals_for(params):
+        key = signal_key(params)
+        if key not in signals:
+            signals[key] = lazy_signal_bundle(df, build_config(params), features)
+        return signals[key]
     
     results = []
     
     for i, combo in enumerate(combinations):
         params = dict(zip(keys, combo))
         
-        # Create config
-        config = BacktestConfig(
-            strategy=params.get('strategy', 'All Signals'),
-            sl_atr_mult=params.get('sl_atr_mult', 1.5),
-            tp_atr_mult=params.get('tp_atr_mult', 4.5),
-            ema_fast=params.get('ema_fast', 8),
-            ema_slow=params.get('ema_slow', 21),
-            bb_period=params.get('bb_period', 20),
-            rsi_oversold=params.get('rsi_oversold', 30),
-            killzone_only=params.get('killzone_only', True),
-        )
-        
-        # Run backtest
-        try:
-            df_signals = generate_signals(df.copy(), config)
-            trades, final_balance, equity_curve = run_backtest(df_signals, config)
-            
-            if len(trades) >= min_trades:
-                metrics = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
-                metrics['params'] = params
-                results.append(metrics)
-        except Exception as e:
-            pass  # Skip failed combinations
+        # Run backtest (or read it back from the store)
+        with stage("cell"):
+            metrics = evaluate_params(lambda: signals_for(params), params, window, store, data_fp)
+        metrics = eligible(metrics, params, min_trades)
+        if metrics:
+            results.append(metrics)
         
         # Progress
-        if (i + 1) % 50 == 0:
+        if verbose and (i + 1) % 50 == 0:
             print(f"   Progress: {i+1}/{len(combinations)} ({(i+1)/len(combinations)*100:.0f}%)")
     
     return results
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# GENETIC / SUCCESSIVE-HALVING SEARCH
+# ═══════════════════════════════════════════════════════════════════════════════
+# Per-process data for pool workers (set once by _init_search)
+_SEARCH_DF: Optional[pd.DataFrame] = None
+_SEARCH_STORE: Optional[ResultStore] = None
+_SEARCH_FEATURES: Optional[FeatureCache] = None
+
+def _init_search(df: pd.DataFrame, store: Optional[ResultStore] = None):
+    global _SEARCH_DF, _SEARCH_STORE, _SEARCH_FEATURES
+    _SEARCH_DF = df
+    _SEARCH_STORE = store
+    _SEARCH_FEATURES = FeatureCache(df)
+    _search_signals.cache_clear()
+
+@lru_cache(maxsize=64)
+def _search_signals(key: Tuple) -> SignalBundle:
+    return lazy_signal_bundle(_SEARCH_DF, build_config(dict(key)), _SEARCH_FEATURES)
+
+def _evaluate_cell(args) -> Optional[Dict]:
+    """Metrics for one parameter set on bars [start, end), or None if it fails."""
+    params, window, min_trades, data_fp = args
+    metrics = evaluate_params(lambda: _search_signals(signal_key(params)), params, window,
+                              _SEARCH_STORE, data_fp)
+    return eligible(metrics, params, min_trades)
+
+class CellEvaluator:
+    """Evaluates parameter sets in a process pool, memoized by config_hash.
+    
+    Repeated individuals (common once a population converges) and repeated
+    (params, window) pairs are never recomputed.
+    """
+    
+    def __init__(self, df: pd.DataFrame, min_trades: int = 10, workers: Optional[int] = None,
+                 store: Optional[ResultStore] = None):
+        self.df = df
+        self.min_trades = min_trades
+        self.workers = workers or os.cpu_count() or 1
+        self.store = store
+        self.cache: Dict[Tuple[str, Optional[Tuple[int, int]]], Optional[Dict]] = {}
+        self.evaluations = 0
+        self.pool = None
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_search,
+                                            initargs=(df, store))
+        else:
+            _init_search(df, store)
+    
+    @profiled("evaluate")
+    def evaluate(self, population: List[Dict], window: Optional[Tuple[int, int]] = None) -> List[Optional[Dict]]:
+        keys = [(config_hash(p), window) for p in population]
+        todo = {}
+        for key, params in zip(keys, population):
+            if key not in self.cache and key not in todo:
+                todo[key] = params
+        if todo:
+            data_fp = data_fingerprint(self.df, window) if self.store is not None else None
+            tasks = [(params, window, self.min_trades, data_fp) for params in todo.values()]
+            if self.pool is not None:
+                # Group cells sharing signals so each worker reuses its signal cache
+                order = sorted(range(len(tasks)), key=lambda i: signal_key(tasks[i][0]))
+                chunk = max(1, len(tasks) // (self.workers * 4))
+                outputs = list(self.pool.map(_evaluate_cell, [tasks[i] for i in order], chunksize=chunk))
+                results = [None] * len(tasks)
+                for i, out in zip(order, outputs):
+                    results[i] = out
+            else:
+                results = []
+                for t in tasks:
+                    with stage("cell"):
+                        results.append(_evaluate_cell(t))
+            self.cache.update(zip(todo, results))
+            self.evaluations += len(todo)
+        return [self.cache[key] for key in keys]
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+def _fitness(result: Optional[Dict], sort_key: str) -> float:
+    return result.get(sort_key, 0) if result else float('-inf')
+
+def _random_params(space: Dict, rng: np.random.Generator) -> Dict:
+    return {k: v[rng.integers(len(v))] for k, v in space.items()}
+
+def _mutate(params: Dict, space: Dict, rate: float, rng: np.random.Generator) -> Dict:
+    """Move each gene to a neighbouring grid value (or any value for categoricals) with prob. rate."""
+    child = dict(params)
+    for k, values in space.items():
+        if len(values) < 2 or rng.random() >= rate:
+            continue
+        i = values.index(child[k])
+        if isinstance(values[0], (str, bool)):
+            j = rng.integers(len(values) - 1)
+            child[k] = values[j if j < i else j + 1]
+        else:
+            step = 1 if rng.random() < 0.5 else -1
+            if not 0 <= i + step < len(values):
+                step = -step
+            child[k] = values[i + step]
+    return child
+
+@profiled("genetic")
+def run_genetic_optimization(df: pd.DataFrame, space: Dict = SEARCH_SPACE, min_trades: int = 10,
+                             population: int = 24, generations: int = 10, elite: int = 4,
+                             mutation_rate: float = 0.2, sort_key: str = 'profit_factor',
+                             max_evaluations: Optional[int] = None, workers: Optional[int] = None,
+                             seed: int = 42, store: Optional[ResultStore] = None) -> List[Dict]:
+    """Genetic search over a grid-style parameter space.
+    
+    Tournament selection, uniform crossover and neighbour mutation; the top
+    `elite` survive unchanged. Returns every evaluated cell that met
+    min_trades, in the same format as run_grid_optimization.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(np.prod([len(v) for v in space.values()]))
+    print(f"   Genetic search: population {population} x {generations} generations over {total} cells...")
+    
+    evaluator = CellEvaluator(df, min_trades, workers, store)
+    try:
+        pop = [_random_params(space, rng) for _ in range(population)]
+        for gen in range(generations):
+            scores = [_fitness(r, sort_key) for r in evaluator.evaluate(pop)]
+            ranked = [pop[i] for i in np.argsort(scores)[::-1]]
+            best = max(scores)
+            print(f"   Generation {gen+1}/{generations}: best {sort_key} {best:.2f} "
+                  f"({evaluator.evaluations} evaluations)")
+            if max_evaluations and evaluator.evaluations >= max_evaluations:
+                break
+            
+            def tournament():
+                picks = rng.integers(len(pop), size=3)
+                return pop[max(picks, key=lambda i: scores[i])]
+            
+            children = ranked[:elite]
+            while len(children) < population:
+                a, b = tournament(), tournament()
+                child = {k: (a[k] if rng.random() < 0.5 else b[k]) for k in space}
+                children.append(_mutate(child, space, mutation_rate, rng))
+            pop = children
+        
+        results = [r for r in evaluator.cache.values() if r is not None]
+        print(f"   Evaluated {evaluator.evaluations} cells ({evaluator.evaluations / total * 100:.1f}% of full grid)")
+        return results
+    finally:
+        evaluator.close()
+
+@profiled("halving")
+def run_successive_halving(df: pd.DataFrame, space: Dict = SEARCH_SPACE, min_trades: int = 10,
+                           n_configs: int = 81, eta: int = 3, sort_key: str = 'profit_factor',
+                           workers: Optional[int] = None, seed: int = 42,
+                           store: Optional[ResultStore] = None) -> List[Dict]:
+    """Successive halving over the most recent bars.
+    
+    Samples n_configs cells, scores them on the last 1/eta**R of the data,
+    keeps the top 1/eta and repeats on eta times more bars until the
+    survivors are scored on the full series. Returns the full-series results.
+    """
+    rng = np.random.default_rng(seed)
+    rungs = max(0, int(np.floor(np.log(n_configs) / np.log(eta))))
+    total = int(np.prod([len(v) for v in space.values()]))
+    print(f"   Successive halving: {n_configs} cells, {rungs + 1} rungs (eta={eta})...")
+    
+    evaluator = CellEvaluator(df, 1, workers, store)
+    try:
+        seen = {}
+        while len(seen) < min(n_configs, total):
+            p = _random_params(space, rng)
+            seen.setdefault(config_hash(p), p)
+        survivors = list(seen.values())
+        
+        n = len(df)
+        for rung in range(rungs + 1):
+            bars = max(WARMUP_BARS, int(n / eta ** (rungs - rung)))
+            window = None if rung == rungs else (n - bars, n)
+            rung_min = max(1, int(min_trades * bars / n))
+            results = evaluator.evaluate(survivors, window)
+            scores = [_fitness(r, sort_key) if r and r['total_trades'] >= rung_min else float('-inf')
+                      for r in results]
+            print(f"   Rung {rung+1}: {len(survivors)} cells on last {bars} bars, "
+                  f"best {sort_key} {max(scores):.2f}")
+            if rung < rungs:
+                keep = max(1, len(survivors) // eta)
+                survivors = [survivors[i] for i in np.argsort(scores)[::-1][:keep]]
+        
+        print(f"   Evaluated {evaluator.evaluations} (cell, window) pairs")
+        return [r for r in results if r is not None and r['total_trades'] >= min_trades]
+    finally:
+        evaluator.close()
+
 def rank_results(results: List[Dict], sort_key: str = 'profit_factor', top_n: int = 10) -> List[Dict]:
     """Rank results by specified metric."""
     sorted_results = sorted(results, key=lambda x: x.get(sort_key, 0), reverse=True)
@@ -102,6 +426,104 @@ def format_params(params: Dict) -> str:
     """Format parameters for display."""
     return f"{params['strategy'][:12]:12} | SL:{params['sl_atr_mult']:.1f} TP:{params['tp_atr_mult']:.1f} | EMA:{params['ema_fast']}/{params['ema_slow']} | KZ:{'Y' if params['killzone_only'] else 'N'}"
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# V9 CONFLUENCE GRID
+# ═══════════════════════════════════════════════════════════════════════════════
+# Threshold dimensions (THRESHOLD_PARAMS) reuse one score pass; the rest
+# (adx_threshold here) start a new one
+V9_GRID = {
+    'min_confluence': [4, 5, 6, 7, 8, 9],
+    'apex_confluence': [7, 8, 9],
+    'atr_mult_sl': [1.5, 2.0],
+    'atr_mult_tp': [4.0, 6.0],
+    'adx_threshold': [20, 25],
+}
+
+def v9_signal_key(params: Dict) -> Tuple:
+    """Key shared by all v9 cells that produce identical confluence scores."""
+    return tuple(sorted((k, v) for k, v in params.items() if k not in THRESHOLD_PARAMS))
+
+_V9_DF: Optional[pd.DataFrame] = None
+_V9_STORE: Optional[ResultStore] = None
+
+def _init_v9(df: pd.DataFrame, store: Optional[ResultStore] = None):
+    global _V9_DF, _V9_STORE
+    _V9_DF = df
+    _V9_STORE = store
+
+def _evaluate_v9_group(args) -> List[Optional[Dict]]:
+    """Metrics for cells sharing one v9_signal_key: one score pass, one batch resolve."""
+    cells, data_fp = args
+    configs = [V9Config(**params) for params in cells]
+    with stage("v9.score_bars"):
+        scores = score_bars(_V9_DF, configs[0])
+    with stage("v9.batch_trades"):
+        frames = batch_trades(scores, configs)
+    results = []
+    for config, trades in zip(configs, frames):
+        metrics = calculate_v9_metrics(trades)
+        if _V9_STORE is not None:
+            with stage("store.put"):
+                _V9_STORE.put(data_fp, config, metrics,
+                              trades.to_dict('records') if _V9_STORE.store_trades else None)
+        results.append(metrics)
+    return results
+
+@profiled("v9_grid")
+def run_v9_grid_optimization(df: pd.DataFrame, param_grid: Dict = V9_GRID, min_trades: int = 10,
+                             workers: int = 1, store: Optional[ResultStore] = None,
+                             verbose: bool = True) -> List[Dict]:
+    """Grid search over V9Config fields (rbfx_v9_backtest layout: lowercase + datetime).
+    
+    Cells are grouped by v9_signal_key, so a sweep over min_confluence /
+    apex_confluence / SL / TP scores the bars once per group and resolves
+    every cell's trades in one batch. Groups run in a process pool when
+    workers > 1. Cached cells are read from `store`, which should be opened
+    with version=code_version(*V9_ENGINE_FILES).
+    """
+    keys = list(param_grid.keys())
+    cells = [dict(zip(keys, combo)) for combo in product(*param_grid.values())]
+    if verbose:
+        print(f"   Testing {len(cells)} v9 combinations...")
+    
+    metrics: List = [MISS] * len(cells)
+    data_fp = None
+    if store is not None:
+        data_fp = data_fingerprint(df)
+        with stage("store.get"):
+            cached = store.get_many(data_fp, [V9Config(**p) for p in cells])
+        for i, params in enumerate(cells):
+            metrics[i] = cached.get(hash_config(V9Config(**params)), MISS)
+        count("store.hits", sum(m is not MISS for m in metrics))
+    
+    groups: Dict[Tuple, List[int]] = {}
+    for i, params in enumerate(cells):
+        if metrics[i] is MISS:
+            groups.setdefault(v9_signal_key(params), []).append(i)
+    tasks = [([cells[i] for i in members], data_fp) for members in groups.values()]
+    if verbose and store is not None:
+        print(f"   Cached: {len(cells) - sum(len(m) for m in groups.values())} | "
+              f"to run: {sum(len(m) for m in groups.values())} in {len(groups)} score passes")
+    
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_v9, initargs=(df, store)) as pool:
+            outputs = list(pool.map(_evaluate_v9_group, tasks))
+    else:
+        _init_v9(df, store)
+        outputs = [_evaluate_v9_group(t) for t in tasks]
+    for members, out in zip(groups.values(), outputs):
+        for i, m in zip(members, out):
+            metrics[i] = m
+    
+    return [r for r in (eligible(m, p, min_trades) for m, p in zip(metrics, cells)) if r]
+
+V9_LABELS = {'min_confluence': 'Conf≥', 'apex_confluence': 'Apex≥', 'atr_mult_sl': 'SL:',
+             'atr_mult_tp': 'TP:', 'adx_threshold': 'ADX:', 'signal_cooldown': 'CD:'}
+
+def format_v9_params(params: Dict) -> str:
+    """Format v9 parameters for display."""
+    return " ".join(f"{V9_LABELS.get(k, k + '=')}{v}" for k, v in params.items())
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # HEAT MAP ANALYSIS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -150,31 +572,38 @@ def print_heat_map(param_impact: Dict):
 # ═══════════════════════════════════════════════════════════════════════════════
 # R:R ANALYSIS
 # ═══════════════════════════════════════════════════════════════════════════════
-def analyze_rr_combinations(df: pd.DataFrame, strategy: str = "All Signals") -> pd.DataFrame:
+def analyze_rr_combinations(df: pd.DataFrame, strategy: str = "All Signals",
+                            store: Optional[ResultStore] = None) -> pd.DataFrame:
     """Analyze all R:R combinations for a given strategy."""
     
     sl_values = [1.0, 1.5, 2.0, 2.5, 3.0]
     tp_values = [1.5, 2.0, 3.0, 4.0, 4.5, 6.0]
     
     rr_results = []
+    data_fp = data_fingerprint(df) if store is not None else None
+    signals = {}
+    
+    def signals_for(params):
+        # SL/TP don't change signals: one generate_signals call for the whole matrix
+        if 'frame' not in signals:
+            signals['frame'] = lazy_signal_bundle(df, build_config(params))
+        return signals['frame']
     
     for sl_mult in sl_values:
         for tp_mult in tp_values:
             if tp_mult <= sl_mult:  # Skip negative R:R
                 continue
             
-            config = BacktestConfig(
-                strategy=strategy,
-                killzone_only=True,
-                sl_atr_mult=sl_mult,
-                tp_atr_mult=tp_mult
-            )
+            params = {
+                'strategy': strategy,
+                'killzone_only': True,
+                'sl_atr_mult': sl_mult,
+                'tp_atr_mult': tp_mult,
+            }
             
-            df_signals = generate_signals(df.copy(), config)
-            trades, final_balance, equity_curve = run_backtest(df_signals, config)
-            
-            if len(trades) >= 5:
-                metrics = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
+            metrics = eligible(evaluate_params(lambda: signals_for(params), params, None, store, data_fp),
+                               params, 5)
+            if metrics:
                 rr_results.append({
                     'SL_Mult': sl_mult,
                     'TP_Mult': tp_mult,
@@ -227,9 +656,131 @@ def print_rr_matrix(rr_df: pd.DataFrame):
     
     print("\n   Legend: ★ = PF ≥ 1.5 (Strong) | ● = PF ≥ 1.0 (Profitable) | ○ = PF < 1.0 (Losing)")
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# SCALE-OUT LADDER ANALYSIS
+# ═══════════════════════════════════════════════════════════════════════════════
+# Fractions closed at 1R / 2R / 3.5R (rbfx_core.LADDER_R)
+LADDER_FRACTIONS = [
+    (1.0, 0.0, 0.0),
+    (0.5, 0.5, 0.0),
+    (0.5, 0.3, 0.2),
+    (0.34, 0.33, 0.33),
+    (0.25, 0.25, 0.5),
+    (0.0, 0.0, 1.0),
+]
+
+def analyze_ladder_fractions(df: pd.DataFrame, strategy: str = "All Signals", sl_atr_mult: float = 1.5,
+                             fractions: List[Tuple[float, ...]] = LADDER_FRACTIONS,
+                             store: Optional[ResultStore] = None) -> pd.DataFrame:
+    """Scale-out splits with and without the breakeven stop move, on one set of signals.
+    
+    Signals are generated once; per stop setting the ladder legs are
+    resolved once and every split is priced on them (run_ladder_sweep).
+    """
+    data_fp = data_fingerprint(df) if store is not None else None
+    bundle = None
+    cells = {}  # (split index, move_stop) -> (params, metrics)
+    
+    for move_stop in (True, False):
+        params = [{
+            'strategy': strategy,
+            'killzone_only': True,
+            'sl_atr_mult': sl_atr_mult,
+            'exit_mode': 'ladder',
+            'ladder_fractions': tuple(split),
+            'ladder_move_stop': move_stop,
+        } for split in fractions]
+        configs = [build_config(p) for p in params]
+        metrics = [store.get(data_fp, config) if store is not None else MISS for config in configs]
+        missing = [k for k, m in enumerate(metrics) if m is MISS]
+        if missing:
+            if bundle is None:
+                # Ladder settings don't change signals: one generate_signals call for the table
+                bundle = lazy_signal_bundle(df, configs[0])
+            runs = run_ladder_sweep(bundle, configs[missing[0]], [fractions[k] for k in missing])
+            for k, (trades, final_balance, equity_curve) in zip(missing, runs):
+                metrics[k] = calculate_metrics(trades, configs[k].initial_balance, final_balance, equity_curve)
+                if store is not None:
+                    with stage("store.put"):
+                        store.put(data_fp, configs[k], metrics[k], trades)
+        for k in range(len(fractions)):
+            cells[k, move_stop] = (params[k], metrics[k])
+    
+    rows = []
+    for k, split in enumerate(fractions):
+        for move_stop in (True, False):
+            metrics = eligible(cells[k, move_stop][1], cells[k, move_stop][0], 5)
+            if metrics:
+                rows.append({
+                    'Fractions': '/'.join(f"{f:.2f}" for f in split),
+                    'Breakeven': move_stop,
+                    'Trades': metrics['total_trades'],
+                    'Win_Rate': metrics['win_rate'],
+                    'Profit_Factor': metrics['profit_factor'],
+                    'Total_R': metrics['total_r'],
+                    'Max_DD': metrics['max_drawdown']
+                })
+    
+    return pd.DataFrame(rows)
+
+def print_ladder_table(ladder_df: pd.DataFrame):
+    """Print the scale-out analysis, one line per split."""
+    if ladder_df.empty:
+        print("   No valid ladder splits found.")
+        return
+    
+    print("\n📊 SCALE-OUT LADDER (1R / 2R / 3.5R)")
+    print("-" * 60)
+    print(f"   {'Fractions':16} | {'BE':>3} | {'Trades':>6} | {'WR':>6} | {'PF':>5} | {'Total R':>8}")
+    for r in ladder_df.itertuples(index=False):
+        print(f"   {r.Fractions:16} | {'Y' if r.Breakeven else 'N':>3} | {r.Trades:>6} | "
+              f"{r.Win_Rate:5.1f}% | {r.Profit_Factor:5.2f} | {r.Total_R:+7.1f}R")
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # MAIN
 # ═══════════════════════════════════════════════════════════════════════════════
+def run_v9_demo(use_cache: bool = True):
+    """--v9: confluence threshold sweep on the v9 backtester."""
+    print("\n📊 GENERATING v9 MARKET DATA...")
+    df = generate_market_data(bars=100_000, volatility=0.003)
+    # Fixed timestamps (the generator ends at now()) so cached results match across runs
+    df['datetime'] = pd.date_range(start='2026-01-05', periods=len(df), freq='15min')
+    print(f"   Generated {len(df)} candles")
+    
+    store = ResultStore(version=code_version(*V9_ENGINE_FILES)) if use_cache else None
+    if store is not None:
+        print(f"   Result cache: {store.path} ({store.count()} results for this code version)")
+    
+    print("\n" + "=" * 70)
+    print("🔍 RUNNING V9 CONFLUENCE GRID")
+    print("=" * 70)
+    t0 = time.perf_counter()
+    results = run_v9_grid_optimization(df, V9_GRID, min_trades=10, workers=os.cpu_count() or 1, store=store)
+    print(f"   Completed in {time.perf_counter() - t0:.2f}s | Valid combinations: {len(results)}")
+    if not results:
+        print("❌ No valid results.")
+        return
+    
+    print("\n" + "=" * 70)
+    print("🏆 TOP 10 BY PROFIT FACTOR")
+    print("=" * 70)
+    print(f"\n   {'#':>2} | {'Params':42} | {'Trades':>6} | {'WR':>6} | {'PF':>6} | {'Total R':>8}")
+    print("   " + "-" * 84)
+    for i, r in enumerate(rank_results(results, 'profit_factor', 10)):
+        print(f"   {i+1:>2} | {format_v9_params(r['params']):42} | {r['total_trades']:>6} | "
+              f"{r['win_rate']:5.1f}% | {r['profit_factor']:6.2f} | {r['total_r']:+7.1f}R")
+    
+    print("\n" + "=" * 70)
+    print("📊 WIN RATE BY MIN CONFLUENCE (SL 2.0 / TP 6.0, ADX 25, APEX 8)")
+    print("=" * 70)
+    for r in sorted(results, key=lambda r: r['params']['min_confluence']):
+        p = r['params']
+        if (p['atr_mult_sl'], p['atr_mult_tp'], p['adx_threshold'], p['apex_confluence']) == (2.0, 6.0, 25, 8):
+            print(f"   Confluence ≥{p['min_confluence']}: {r['total_trades']:>5} trades | "
+                  f"{r['win_rate']:5.1f}% WR | APEX {r['apex_trades']:>4} ({r['apex_wr']:5.1f}% WR) | "
+                  f"{r['total_r']:+7.1f}R")
+    print("\n" + "=" * 70)
+
 def main():
     print("=" * 70)
     print("RetailBeastFX - Grid Optimizer v1.0")
@@ -241,21 +792,48 @@ def main():
     print(f"   Generated {len(df)} candles")
     
     # Ask for mode
-    use_fast = True  # Default to fast mode
-    if len(sys.argv) > 1 and sys.argv[1] == "--full":
-        use_fast = False
+    args = [a for a in sys.argv[1:] if a not in ("--no-cache", "--profile")]
+    mode = args[0] if args else "--fast"
+    mode_names = {"--full": "FULL", "--genetic": "GENETIC", "--halving": "SUCCESSIVE HALVING", "--v9": "V9 CONFLUENCE"}
+    print(f"\n   Mode: {mode_names.get(mode, 'FAST')} (use --full, --genetic, --halving or --v9 for other searches)")
     
-    grid = FAST_GRID if use_fast else PARAM_GRID
-    print(f"\n   Mode: {'FAST' if use_fast else 'FULL'} (use --full for comprehensive search)")
+    if mode == "--v9":
+        run_v9_demo(use_cache="--no-cache" not in sys.argv)
+        return
+    
+    # Cached results from earlier runs on the same data and code (--no-cache to disable)
+    store = None if "--no-cache" in sys.argv else ResultStore()
+    if store is not None:
+        print(f"   Result cache: {store.path} ({store.count()} results for this code version)")
     
     # Run optimization
     print("\n" + "=" * 70)
     print("🔍 RUNNING GRID OPTIMIZATION")
     print("=" * 70)
     
-    results = run_grid_optimization(df, grid, min_trades=10)
+    # Per-stage timings (--profile); pool workers aren't collected, so search runs in-process
+    profile = "--profile" in sys.argv
+    workers = 1 if profile else None
+    with rbfx_profiler.profiling() if profile else nullcontext():
+        if mode == "--genetic":
+            results = run_genetic_optimization(df, SEARCH_SPACE, min_trades=10, workers=workers, store=store)
+        elif mode == "--halving":
+            results = run_successive_halving(df, SEARCH_SPACE, min_trades=10, workers=workers, store=store)
+        else:
+            grid = PARAM_GRID if mode == "--full" else FAST_GRID
+            results = run_grid_optimization(df, grid, min_trades=10, store=store)
     print(f"\n   Valid combinations: {len(results)}")
     
+    if profile:
+        print("\n" + "=" * 70)
+        print("⏱️  STAGE PROFILE")
+        print("=" * 70)
+        rbfx_profiler.print_report()
+        rbfx_profiler.export_chrome_trace("rbfx_profile.trace.json")
+        rbfx_profiler.export_speedscope("rbfx_profile.speedscope.json")
+        print("\n   Trace written to rbfx_profile.trace.json (chrome://tracing, ui.perfetto.dev)")
+        print("   and rbfx_profile.speedscope.json (speedscope.app)")
+    
     if not results:
         print("❌ No valid results. Try adjusting parameters or increasing data.")
         return
@@ -312,9 +890,15 @@ def main():
     best_strategy = top_pf[0]['params']['strategy'] if top_pf else "All Signals"
     print(f"\n   Analyzing: {best_strategy}")
     
-    rr_df = analyze_rr_combinations(df, best_strategy)
+    rr_df = analyze_rr_combinations(df, best_strategy, store)
     print_rr_matrix(rr_df)
     
+    # Scale-out ladder for the same strategy
+    print("\n" + "=" * 70)
+    print("🪜 PARTIAL TAKE-PROFIT LADDER (Best Strategy)")
+    print("=" * 70)
+    print_ladder_table(analyze_ladder_fractions(df, best_strategy, store=store))
+    
     # Final recommendations
     print("\n" + "=" * 70)
     print("📋 OPTIMIZATION SUMMARY")
@@ -338,7 +922,7 @@ def main():
     print("\n" + "=" * 70)
     print("⚠️  DISCLAIMER: Synthetic data optimization")
     print("    Parameters may be overfit to this specific dataset.")
-    print("    Validate with walk-forward analysis before live trading.")
+    print("    Validate with walk-forward analysis (rbfx_walk_forward.py) before live trading.")
     print("=" * 70)
 
 
@@ -0,0 +1,281 @@
+"""
+RetailBeastFX - Limit Order Entry Engine v1.0
+Pending orders at order block / FVG edges instead of market entries at the close.
+
+The ICT scripts (AEP_ICT_OrderBlocks.pine, AEP_ICT_SilverBullet.pine) enter
+on the retrace into a zone, not on the bar that created it. Here:
+- Every order block and FVG (detect_order_blocks / detect_fvgs rules) places
+  a limit order at its proximal edge, 50% mean threshold or distal edge
+- The order fills on the first bar within expiry_bars whose low (buy) or
+  high (sell) reaches the limit, at the limit or the better open on a gap
+- Filled orders hand off to resolve_exits for SL/TP, then one position at a
+  time with the usual cooldown
+
+Fills are forward-min / forward-max queries answered by one BarScanner for
+all orders at once, so hundreds of thousands of pending orders cost a few
+array passes.
+"""
+
+import time
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from rbfx_backtest_enhanced import (
+    BacktestConfig,
+    Trade,
+    book_trades,
+    generate_realistic_data,
+    generate_signals,
+    calculate_metrics,
+    run_backtest_fast,
+)
+from rbfx_core import WARMUP_BARS, calculate_atr, select_trades, session_flags
+from rbfx_first_touch import BarScanner, IntrabarIndex, resolve_exits, EXIT_SL, EXIT_TP
+
+ZONE_OB = 0
+ZONE_FVG = 1
+ZONE_KINDS = ('ob', 'fvg')  # Trade.setup_type
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass
+class LimitOrderConfig:
+    zones: str = "both"  # ob, fvg, both
+    edge: str = "proximal"  # proximal (near edge), mid (50% mean threshold), distal (far edge)
+    expiry_bars: int = 20  # Pending for this many bars after the zone forms (Pine FVG boxes: 20)
+    ob_impulse_atr: float = 1.5  # detect_order_blocks: impulse body > 1.5 ATR
+    fvg_min_atr: float = 0.1  # detect_fvgs: gap >= 0.1 ATR
+    session: Optional[str] = None  # Only place orders in this session_flags window (e.g. 'silver_bullet')
+    stop_buffer_atr: Optional[float] = None  # None = config.sl_atr_mult x ATR from the fill, else beyond the zone
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ZONES → PENDING ORDERS
+# ═══════════════════════════════════════════════════════════════════════════════
+def detect_zones(df: pd.DataFrame, atr: np.ndarray, orders: LimitOrderConfig) -> Dict[str, np.ndarray]:
+    """Every order block and FVG as arrays, in placement order.
+
+    Same rules as detect_order_blocks / detect_fvgs, without their
+    keep-the-last-few trimming. A zone is known at the close of `placed`
+    (the impulse bar for OBs, the third candle for FVGs). Returns placed,
+    is_buy, top, bottom, kind.
+    """
+    if orders.zones not in ("ob", "fvg", "both"):
+        raise ValueError(f"Unknown zones {orders.zones!r} (expected 'ob', 'fvg' or 'both')")
+    o = df['Open'].to_numpy(dtype=np.float64)
+    h = df['High'].to_numpy(dtype=np.float64)
+    l = df['Low'].to_numpy(dtype=np.float64)
+    c = df['Close'].to_numpy(dtype=np.float64)
+    n = len(c)
+    parts = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool), np.zeros(0), np.zeros(0),
+              np.zeros(0, dtype=np.int8))]
+
+    if orders.zones in ("ob", "both") and n > 4:
+        i = np.arange(3, n - 1)
+        body = c[i] - o[i]
+        with np.errstate(invalid='ignore'):
+            bull = (c[i - 1] < o[i - 1]) & (body > atr[i] * orders.ob_impulse_atr)
+            bear = (c[i - 1] > o[i - 1]) & (-body > atr[i] * orders.ob_impulse_atr)
+        for mask, buy in ((bull, True), (bear, False)):
+            at = i[mask]
+            parts.append((at, np.full(len(at), buy), h[at - 1], l[at - 1], np.full(len(at), ZONE_OB)))
+
+    if orders.zones in ("fvg", "both") and n > 2:
+        i = np.arange(2, n)
+        min_gap = np.where(np.isnan(atr[i]), 0.0001, atr[i] * orders.fvg_min_atr)
+        bull = (l[i] > h[i - 2]) & (l[i] - h[i - 2] >= min_gap)
+        bear = (h[i] < l[i - 2]) & (l[i - 2] - h[i] >= min_gap)
+        parts.append((i[bull], np.ones(bull.sum(), dtype=bool), l[i[bull]], h[i[bull] - 2],
+                      np.full(bull.sum(), ZONE_FVG)))
+        parts.append((i[bear], np.zeros(bear.sum(), dtype=bool), l[i[bear] - 2], h[i[bear]],
+                      np.full(bear.sum(), ZONE_FVG)))
+
+    placed, is_buy, top, bottom, kind = (np.concatenate(p) for p in zip(*parts))
+    order = np.argsort(placed, kind='stable')
+    return {
+        'placed': placed[order].astype(np.int64),
+        'is_buy': is_buy[order].astype(bool),
+        'top': top[order],
+        'bottom': bottom[order],
+        'kind': kind[order].astype(np.int8),
+    }
+
+
+def limit_prices(zones: Dict[str, np.ndarray], edge: str) -> np.ndarray:
+    """Limit price per zone: buys rest at the top (proximal) / bottom (distal), sells the reverse."""
+    top, bottom, buy = zones['top'], zones['bottom'], zones['is_buy']
+    if edge == "proximal":
+        return np.where(buy, top, bottom)
+    if edge == "distal":
+        return np.where(buy, bottom, top)
+    if edge == "mid":
+        return (top + bottom) / 2
+    raise ValueError(f"Unknown edge {edge!r} (expected 'proximal', 'mid' or 'distal')")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FILL SIMULATION
+# ═══════════════════════════════════════════════════════════════════════════════
+def fill_orders(scanner: BarScanner, open_: np.ndarray, placed, is_buy, limit,
+                expiry_bars: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(fill_idx, fill_price) for limit orders resting from the bar after `placed`.
+
+    A buy fills on the first bar whose low reaches the limit, a sell when the
+    high does, within expiry_bars bars. A bar opening through the limit
+    fills at the open. fill_idx == scanner.n for orders that expired unfilled.
+    """
+    placed = np.asarray(placed, dtype=np.int64)
+    is_buy = np.asarray(is_buy, dtype=bool)
+    limit = np.asarray(limit, dtype=np.float64)
+    start = placed + 1
+    stop = placed + expiry_bars + 1
+
+    fill_idx = np.full(len(placed), scanner.n, dtype=np.int64)
+    b, s = is_buy, ~is_buy
+    if b.any():
+        fill_idx[b] = scanner.first_low_at_or_below(start[b], limit[b], stop[b])
+    if s.any():
+        fill_idx[s] = scanner.first_high_at_or_above(start[s], limit[s], stop[s])
+
+    filled = fill_idx < scanner.n
+    fill_price = np.full(len(placed), np.nan)
+    gap_open = open_[fill_idx[filled]]
+    fill_price[filled] = np.where(is_buy[filled], np.minimum(limit[filled], gap_open),
+                                  np.maximum(limit[filled], gap_open))
+    return fill_idx, fill_price
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ENGINE
+# ═══════════════════════════════════════════════════════════════════════════════
+def limit_order_trades(df: pd.DataFrame, config: BacktestConfig, orders: LimitOrderConfig,
+                       scanner: Optional[BarScanner] = None,
+                       intrabar: Optional[IntrabarIndex] = None) -> Dict[str, np.ndarray]:
+    """Zone limit orders → fills → SL/TP → one position at a time.
+
+    SL is sl_atr_mult x ATR (at placement) from the fill, or beyond the
+    zone's far edge by stop_buffer_atr x ATR; TP keeps the config's R:R. A
+    fill bar that also reaches the stop counts as stopped out; targets are
+    only checked from the next bar. Returns sequential_trades-style arrays
+    for the closed trades plus placed_idx and kind.
+    """
+    n = len(df)
+    atr = df['ATR'].to_numpy(dtype=np.float64) if 'ATR' in df.columns else calculate_atr(df, 14).to_numpy()
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    scanner = scanner or BarScanner(high, low)
+
+    zones = detect_zones(df, atr, orders)
+    keep = zones['placed'] >= WARMUP_BARS
+    if orders.session is not None:
+        keep &= session_flags(df.index)[orders.session][zones['placed']]
+    zones = {k: v[keep] for k, v in zones.items()}
+    placed, is_buy = zones['placed'], zones['is_buy']
+    limit = limit_prices(zones, orders.edge)
+
+    fill_idx, fill_price = fill_orders(scanner, df['Open'].to_numpy(dtype=np.float64),
+                                       placed, is_buy, limit, orders.expiry_bars)
+    filled = np.flatnonzero(fill_idx < n)
+    # Entries must be in bar order for select_trades
+    filled = filled[np.argsort(fill_idx[filled], kind='stable')]
+    placed, is_buy, entry_idx, entry = placed[filled], is_buy[filled], fill_idx[filled], fill_price[filled]
+    sign = np.where(is_buy, 1.0, -1.0)
+    zone_atr = atr[placed]
+    if orders.stop_buffer_atr is None:
+        risk = zone_atr * config.sl_atr_mult
+    else:
+        far = np.where(is_buy, zones['bottom'][filled], zones['top'][filled])
+        risk = sign * (entry - far) + zone_atr * orders.stop_buffer_atr
+    valid = risk > 0
+    placed, is_buy, entry_idx, entry, sign, risk = (a[valid] for a in (placed, is_buy, entry_idx, entry, sign, risk))
+    kind = zones['kind'][filled][valid]
+    sl = entry - sign * risk
+    tp = entry + sign * risk * (config.tp_atr_mult / config.sl_atr_mult)
+
+    # Hand off to the SL/TP resolver; the fill bar itself can only stop out
+    exit_idx, outcome = resolve_exits(scanner, entry_idx, is_buy, sl, tp, intrabar=intrabar)
+    stopped_on_fill = np.where(is_buy, low[entry_idx] <= sl, high[entry_idx] >= sl)
+    exit_idx = np.where(stopped_on_fill, entry_idx, exit_idx)
+    outcome = np.where(stopped_on_fill, EXIT_SL, outcome).astype(np.int8)
+
+    taken = select_trades(entry_idx, exit_idx, n, start=WARMUP_BARS, cooldown=config.cooldown)
+    closed = taken[exit_idx[taken] < n]
+    won = outcome[closed] == EXIT_TP
+    return {
+        'entry_idx': entry_idx[closed],
+        'exit_idx': exit_idx[closed],
+        'placed_idx': placed[closed],
+        'kind': kind[closed],
+        'is_buy': is_buy[closed],
+        'sign': sign[closed],
+        'won': won,
+        'outcome': outcome[closed],
+        'stopped': (~won).astype(np.float64),
+        'limit_entry': True,
+        'entry': entry[closed],
+        'sl': sl[closed],
+        'tp': tp[closed],
+        'risk': risk[closed],
+        'exit_price': np.where(won, tp[closed], sl[closed]),
+    }
+
+
+def run_limit_backtest(df: pd.DataFrame, config: BacktestConfig, orders: Optional[LimitOrderConfig] = None,
+                       intrabar: Optional[IntrabarIndex] = None) -> Tuple[List[Trade], float, List[float]]:
+    """Limit-entry backtest with the run_backtest return shape.
+
+    Fills are booked by book_trades like run_backtest_fast's entries:
+    execution="lots" sizing for the order's own stop distance and the
+    config's spread, slippage and commission (the limit fill itself does
+    not slip; stop exits do). Only exit_mode="fixed" is
+    supported (the trailing and ladder engines enter at a bar's close).
+    """
+    if config.exit_mode != "fixed":
+        raise ValueError(f'run_limit_backtest supports exit_mode="fixed" only, got {config.exit_mode!r}')
+    orders = orders or LimitOrderConfig()
+    engine = limit_order_trades(df, config, orders, intrabar=intrabar)
+    atr = df['ATR'].to_numpy(dtype=np.float64) if 'ATR' in df.columns else calculate_atr(df, 14).to_numpy()
+    return book_trades(df.index, atr, config, engine, engine['kind'], ZONE_KINDS)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def main():
+    print("=" * 70)
+    print("RetailBeastFX - Limit Order Entry Engine v1.0")
+    print("=" * 70)
+
+    print("\n📊 GENERATING SYNTHETIC DATA...")
+    df = generate_realistic_data(100_000, seed=42)
+    config = BacktestConfig(sl_atr_mult=1.5, tp_atr_mult=4.5)
+    df_signals = generate_signals(df.copy(), config)
+    print(f"   Generated {len(df)} candles")
+
+    t0 = time.perf_counter()
+    trades, final_balance, equity_curve = run_backtest_fast(df_signals, config)
+    market = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
+    print(f"   Market entries (signal close): {time.perf_counter() - t0:.2f}s")
+
+    print(f"\n   {'Entry':28} | {'Orders':>7} | {'Trades':>6} | {'WR':>6} | {'PF':>5} | {'Total R':>8}")
+    print("   " + "-" * 74)
+    print(f"   {'Market @ close':28} | {'-':>7} | {market['total_trades']:>6} | {market['win_rate']:5.1f}% | "
+          f"{market['profit_factor']:5.2f} | {market['total_r']:+7.1f}R")
+
+    for zones, edge in [("ob", "proximal"), ("ob", "mid"), ("fvg", "proximal"), ("fvg", "mid"), ("both", "proximal")]:
+        orders = LimitOrderConfig(zones=zones, edge=edge)
+        t0 = time.perf_counter()
+        placed = len(detect_zones(df_signals, df_signals['ATR'].to_numpy(), orders)['placed'])
+        trades, final_balance, equity_curve = run_limit_backtest(df_signals, config, orders)
+        elapsed = time.perf_counter() - t0
+        if not trades:
+            continue
+        m = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
+        label = f"Limit {zones.upper()} {edge} ({elapsed:.2f}s)"
+        print(f"   {label:28} | {placed:>7,} | {m['total_trades']:>6} | {m['win_rate']:5.1f}% | "
+              f"{m['profit_factor']:5.2f} | {m['total_r']:+7.1f}R")
+
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
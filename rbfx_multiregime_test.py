@@ -7,18 +7,19 @@ Tests strategies across different market conditions:
 - Mixed/Realistic
 """
 
+import sys
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
-from dataclasses import dataclass
+from typing import Dict, Optional
 
 # Import from enhanced backtester
 from rbfx_backtest_enhanced import (
     BacktestConfig, 
-    generate_signals,
+    signal_bundle,
     run_backtest,
     calculate_metrics
 )
+from rbfx_result_store import ResultStore, MISS, data_fingerprint
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # MARKET REGIME GENERATORS
@@ -222,7 +223,8 @@ def generate_mixed_market(n_candles: int = 4000, seed: int = 42) -> pd.DataFrame
 # MULTI-REGIME TESTER
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def test_strategy_on_regime(df: pd.DataFrame, strategy: str, config_overrides: Dict = None) -> Dict:
+def test_strategy_on_regime(df: pd.DataFrame, strategy: str, config_overrides: Dict = None,
+                            store: Optional[ResultStore] = None) -> Dict:
     """Test a single strategy on a given market regime."""
     config = BacktestConfig(
         strategy=strategy,
@@ -235,21 +237,27 @@ def test_strategy_on_regime(df: pd.DataFrame, strategy: str, config_overrides: D
         for k, v in config_overrides.items():
             setattr(config, k, v)
     
-    try:
-        df_signals = generate_signals(df.copy(), config)
-        trades, final_balance, equity_curve = run_backtest(df_signals, config)
-        
-        if len(trades) >= 5:
-            metrics = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
-            return metrics
-    except Exception as e:
-        pass
+    data_fp = data_fingerprint(df) if store is not None else None
+    metrics = store.get(data_fp, config) if store is not None else MISS
     
+    if metrics is MISS:
+        try:
+            trades, final_balance, equity_curve = run_backtest(signal_bundle(df, config), config)
+            metrics = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
+        except Exception as e:
+            # Not cached: the next run retries it
+            print(f"   ⚠️ {strategy} failed: {e!r}")
+            return None
+        if store is not None:
+            store.put(data_fp, config, metrics, trades)
+    
+    if metrics and metrics.get('total_trades', 0) >= 5:
+        return metrics
     return None
 
 
-def run_multi_regime_test():
-    """Run all strategies across all market regimes."""
+def run_multi_regime_test(store: Optional[ResultStore] = None):
+    """Run all strategies across all market regimes (cached in `store` if given)."""
     
     strategies = [
         "Original",
@@ -282,7 +290,7 @@ def run_multi_regime_test():
         results[regime_name] = {}
         
         for strategy in strategies:
-            metrics = test_strategy_on_regime(df, strategy)
+            metrics = test_strategy_on_regime(df, strategy, store=store)
             if metrics:
                 results[regime_name][strategy] = {
                     'trades': metrics['total_trades'],
@@ -458,4 +466,4 @@ def run_multi_regime_test():
 
 
 if __name__ == "__main__":
-    run_multi_regime_test()
+    run_multi_regime_test(None if "--no-cache" in sys.argv else ResultStore())
@@ -3,10 +3,14 @@ RetailBeastFX - Confluence Optimizer v2
 Find which conditions produce the highest win rates
 """
 
+import os
+import sys
 import pandas as pd
 import numpy as np
 from itertools import combinations
 
+from rbfx_result_store import ResultStore, MISS, data_fingerprint, code_version
+
 print("=" * 60)
 print("LOADING...")
 print("=" * 60)
@@ -18,6 +22,9 @@ NUM_CANDLES = 3000
 SL_ATR_MULT = 2.0
 TP_ATR_MULT = 6.0
 
+# Results cached across runs, keyed on this script's own source (--no-cache to disable)
+STORE = None if "--no-cache" in sys.argv else ResultStore(version=code_version(os.path.abspath(__file__)))
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # SYNTHETIC DATA - More trending for realistic results
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -112,7 +119,7 @@ conditions = {
 # ═══════════════════════════════════════════════════════════════════════════════
 # BACKTEST FUNCTION
 # ═══════════════════════════════════════════════════════════════════════════════
-def test_combo(condition_names):
+def backtest_combo(condition_names):
     # Build signal
     signal = conditions['Bull_Candle'].copy()
     for name in condition_names:
@@ -155,6 +162,18 @@ def test_combo(condition_names):
         return None
     return {'wins': wins, 'losses': losses, 'total': total, 'wr': wins/total*100}
 
+DATA_FP = data_fingerprint(df)
+
+def test_combo(condition_names):
+    """backtest_combo, read from / written to STORE when caching is on."""
+    key = {'conditions': sorted(condition_names), 'sl_atr_mult': SL_ATR_MULT, 'tp_atr_mult': TP_ATR_MULT}
+    result = STORE.get(DATA_FP, key) if STORE else MISS
+    if result is MISS:
+        result = backtest_combo(condition_names)
+        if STORE:
+            STORE.put(DATA_FP, key, result)
+    return result
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # RUN TESTS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,390 @@
+"""
+RetailBeastFX - Portfolio Backtester v1.0
+Multi-symbol backtest with shared equity and per-instrument specs.
+
+Symbols are aligned on a common timeline and carried as 2-D (bars x symbols)
+arrays. SL/TP for every signal of every symbol is resolved in one batch
+forward scan (columns are laid end to end, each scan stopped at its column's
+end), so the only sequential work is walking signal events in time order to
+apply the shared balance and the portfolio limits:
+- one position per symbol, with the usual exit cooldown
+- max concurrent risk (sum of open risk as a fraction of balance)
+- correlation cap (max open positions stacked on the same correlated move)
+"""
+
+import heapq
+import time
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from rbfx_backtest_enhanced import (
+    BacktestConfig,
+    Trade,
+    InstitutionalRiskEngine,
+    WARMUP_BARS,
+    generate_realistic_data,
+    signal_bundle,
+    calculate_metrics,
+)
+from rbfx_core import CostModel, instrument_specs
+from rbfx_first_touch import BarScanner, IntrabarIndex, resolve_exits, EXIT_TP
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass
+class PortfolioConfig:
+    max_portfolio_risk: float = 0.05  # Max open risk (5% with 1% per trade = 5 positions)
+    max_correlated: int = 2  # Max open positions on the same correlated move
+    correlation_threshold: float = 0.7
+    correlation_lookback: int = 960  # Bars of returns per correlation estimate (10 days of 15m)
+    correlation_refresh: int = 96  # Re-estimate once per day of 15m bars
+    instruments: Dict[str, str] = field(default_factory=dict)  # symbol -> INSTRUMENT_SPECS key
+
+
+@dataclass
+class PortfolioResult:
+    ledger: pd.DataFrame  # One row per closed trade, with symbol and lots
+    trades: List[Trade]  # Same trades for calculate_metrics
+    final_balance: float
+    equity_curve: List[float]  # Balance after each closed trade
+    equity: pd.Series  # Realized balance on the common timeline
+    rejected: Dict[str, int]  # Signals skipped per portfolio rule
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ALIGNMENT
+# ═══════════════════════════════════════════════════════════════════════════════
+PANEL_COLUMNS = ['High', 'Low', 'Close', 'ATR', 'BuySignal', 'SellSignal']
+
+
+def build_panel(data: Dict[str, pd.DataFrame], config: BacktestConfig) -> Dict[str, np.ndarray]:
+    """Generate signals per symbol and align them as (bars x symbols) arrays.
+
+    Signals are computed on each symbol's own bars (so indicator windows never
+    see gaps) and then placed on the union timeline. Bars a symbol does not
+    have are NaN prices / no signal, which the forward scans never touch.
+    Each symbol's first WARMUP_BARS bars are excluded from trading.
+    """
+    symbols = list(data)
+    timeline = data[symbols[0]].index
+    for sym in symbols[1:]:
+        timeline = timeline.union(data[sym].index)
+
+    panel = {col: np.empty((len(timeline), len(symbols)),
+                           dtype=bool if col.endswith('Signal') else np.float64)
+             for col in PANEL_COLUMNS}
+    for j, sym in enumerate(symbols):
+        bundle = signal_bundle(data[sym], config)
+        warm = np.arange(len(bundle)) >= WARMUP_BARS
+        columns = {
+            'High': bundle.high,
+            'Low': bundle.low,
+            'Close': bundle.close,
+            'ATR': bundle.atr,
+            'BuySignal': bundle.buy & warm,
+            'SellSignal': bundle.sell & warm,
+        }
+        rows = timeline.get_indexer(bundle.index)
+        for col in PANEL_COLUMNS:
+            panel[col][:, j] = False if col.endswith('Signal') else np.nan
+            panel[col][rows, j] = columns[col]
+
+    panel['timeline'] = timeline
+    panel['symbols'] = symbols
+    return panel
+
+
+def rolling_correlations(close: np.ndarray, lookback: int, refresh: int) -> np.ndarray:
+    """Correlation matrices of bar returns, one per refresh block.
+
+    Matrix k uses returns from bars [k * refresh - lookback, k * refresh) and
+    is valid for bars [k * refresh, (k + 1) * refresh), so no bar ever sees
+    its own or later returns. Missing bars count as zero return.
+    """
+    n, m = close.shape
+    returns = np.zeros_like(close)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = np.log(close[1:] / close[:-1])
+    returns[~np.isfinite(returns)] = 0.0
+
+    n_blocks = -(-n // refresh)
+    corr = np.zeros((n_blocks, m, m))
+    for k in range(n_blocks):
+        end = k * refresh
+        window = returns[max(0, end - lookback):end]
+        if len(window) < 2:
+            continue
+        centered = window - window.mean(axis=0)
+        std = np.sqrt((centered ** 2).sum(axis=0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            c = (centered.T @ centered) / np.outer(std, std)
+        corr[k] = np.nan_to_num(c)
+    return corr
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PORTFOLIO ENGINE
+# ═══════════════════════════════════════════════════════════════════════════════
+def run_portfolio_backtest(data: Dict[str, pd.DataFrame], config: BacktestConfig,
+                           portfolio: Optional[PortfolioConfig] = None,
+                           panel: Optional[Dict[str, np.ndarray]] = None,
+                           intrabar: Optional[Dict[str, IntrabarIndex]] = None) -> PortfolioResult:
+    """Backtest N symbols against one shared balance.
+
+    Every entry risks config.risk_per_trade of the realized balance at entry
+    time. execution="lots" sizes each entry with its symbol's INSTRUMENT_SPECS
+    entry (PortfolioConfig.instruments, default config.instrument) exactly as
+    run_backtest_fast does, and the config's spread, slippage and commission
+    (rbfx_core.CostModel) are charged per trade at that instrument's pip
+    size. intrabar maps symbols to IntrabarIndex data on the common timeline
+    for settling same-bar SL/TP. Only exit_mode="fixed" is supported. With a
+    single symbol and no binding limits the result equals run_backtest_fast.
+    """
+    if config.exit_mode != "fixed":
+        raise ValueError(f'run_portfolio_backtest supports exit_mode="fixed" only, got {config.exit_mode!r}')
+    portfolio = portfolio or PortfolioConfig()
+    panel = panel or build_panel(data, config)
+    symbols = panel['symbols']
+    n, m = panel['Close'].shape
+
+    # 1. Columns end to end: flat index = symbol * n + bar
+    high = panel['High'].T.ravel()
+    low = panel['Low'].T.ravel()
+    close = panel['Close'].T.ravel()
+    atr = panel['ATR'].T.ravel()
+    buy = panel['BuySignal'].T.ravel()
+    sell = panel['SellSignal'].T.ravel()
+
+    with np.errstate(invalid='ignore'):
+        flat = np.flatnonzero((buy | sell) & (atr > 0))
+    sym = flat // n
+    bar = flat % n
+    is_buy = buy[flat]
+    sign = np.where(is_buy, 1.0, -1.0)
+    entry = close[flat]
+    sl = entry - sign * atr[flat] * config.sl_atr_mult
+    tp = entry + sign * atr[flat] * config.tp_atr_mult
+
+    # 2. All SL/TP first touches at once, each scan stopped at its column's end
+    scanner = BarScanner(high, low)
+    column_end = (sym + 1) * n
+    exit_flat, outcome = resolve_exits(scanner, flat, is_buy, sl, tp, max_bars=column_end - flat)
+    for s, index in (intrabar or {}).items():
+        # Same-bar ties need the symbol's own child bars: re-resolve its column
+        col = symbols.index(s)
+        rows = np.flatnonzero(sym == col)
+        local, outcome[rows] = resolve_exits(BarScanner(panel['High'][:, col], panel['Low'][:, col]),
+                                             bar[rows], is_buy[rows], sl[rows], tp[rows], intrabar=index)
+        exit_flat[rows] = np.where(local >= n, len(high), local + col * n)
+    still_open = exit_flat >= len(high)
+    exit_bar = np.where(still_open, n, exit_flat - sym * n)
+    won = outcome == EXIT_TP
+    exit_price = np.where(won, tp, sl)
+
+    # 3. Per-instrument costs and sizing, balance-independent part vectorized
+    instrument = np.array([portfolio.instruments.get(s, config.instrument) for s in symbols])[sym]
+    costs = CostModel.from_config(config)
+    cost_r = np.zeros(len(flat))
+    if not costs.free:
+        pip_size, pip_value = instrument_specs(instrument, entry)
+        entry_times = panel['timeline'][bar]
+        cost_r = costs.cost_r(entry_times, atr[flat], ~won, np.abs(entry - sl), pip_size, pip_value)
+        entry_cost, exit_cost = costs.price_costs(entry_times, atr[flat], ~won, pip_size)
+        entry = entry + sign * entry_cost
+        exit_price = exit_price - sign * exit_cost
+    if config.execution == "lots":
+        sizes = InstitutionalRiskEngine.calculate_lot_sizes(
+            balance=1.0,
+            risk_pct=config.risk_per_trade * 100,
+            atr=atr[flat],
+            sl_atr_mult=config.sl_atr_mult,
+            entry_price=entry,
+            instrument=instrument,
+            direction=sign,
+        )
+        pip_size, pip_value = instrument_specs(instrument, entry)
+        lots_per_dollar = sizes['risk_amount'] / (sizes['sl_pips'] * pip_value)
+        pnl_per_lot = (exit_price - entry) * sign / pip_size * pip_value
+    rr = config.tp_atr_mult / config.sl_atr_mult
+
+    corr = None
+    if portfolio.max_correlated > 0 and m > 1:
+        corr = rolling_correlations(panel['Close'], portfolio.correlation_lookback,
+                                    portfolio.correlation_refresh)
+
+    # 4. Walk signal events in time order (symbol order breaks ties)
+    order = np.lexsort((sym, bar))
+    balance = config.initial_balance
+    open_heap = []  # (exit_bar, event) for open positions
+    open_sym = {}  # symbol -> (direction, risk fraction)
+    open_risk = 0.0
+    next_free = np.full(m, WARMUP_BARS, dtype=np.int64)
+    blocked = np.zeros(m, dtype=bool)  # Symbol has a position that never closes
+    taken, lots_taken, pnl_taken, risk_taken = [], [], [], []
+    rejected = {'max_risk': 0, 'correlation': 0}
+
+    for e in order:
+        t = bar[e]
+        s = sym[e]
+        while open_heap and open_heap[0][0] <= t:
+            _, k = heapq.heappop(open_heap)
+            balance += pnl_taken[k]
+            _, risk_frac = open_sym.pop(sym[taken[k]])
+            open_risk -= risk_frac
+
+        if blocked[s] or t < next_free[s] or s in open_sym:
+            continue
+        if open_risk + config.risk_per_trade > portfolio.max_portfolio_risk + 1e-12:
+            rejected['max_risk'] += 1
+            continue
+        if corr is not None and open_sym:
+            c = corr[t // portfolio.correlation_refresh]
+            stacked = sum(1 for o, (d, _) in open_sym.items()
+                          if c[s, o] * d * sign[e] >= portfolio.correlation_threshold)
+            if stacked >= portfolio.max_correlated:
+                rejected['correlation'] += 1
+                continue
+
+        open_sym[s] = (sign[e], config.risk_per_trade)
+        open_risk += config.risk_per_trade
+        if still_open[e]:
+            blocked[s] = True
+            continue
+
+        risk_amount = balance * config.risk_per_trade
+        if config.execution == "lots":
+            lots = np.floor(balance * lots_per_dollar[e] / config.lot_step + 1e-9) * config.lot_step
+            lots = max(lots, config.min_lot)
+            pnl = pnl_per_lot[e] * lots - config.commission_per_lot * lots
+        else:
+            lots = np.nan
+            pnl = risk_amount * ((rr if won[e] else -1.0) - cost_r[e])
+        next_free[s] = exit_bar[e] + config.cooldown + 1
+        heapq.heappush(open_heap, (exit_bar[e], len(taken)))
+        taken.append(e)
+        lots_taken.append(lots)
+        pnl_taken.append(pnl)
+        risk_taken.append(risk_amount)
+
+    # 5. Ledger in exit order (the order P&L hits the balance)
+    taken = np.asarray(taken, dtype=np.int64)
+    pnl_arr = np.asarray(pnl_taken, dtype=np.float64)
+    lots_arr = np.asarray(lots_taken, dtype=np.float64)
+    risk_arr = np.asarray(risk_taken, dtype=np.float64)
+    by_exit = np.lexsort((np.arange(len(taken)), exit_bar[taken]))
+    taken, pnl_arr, lots_arr, risk_arr = taken[by_exit], pnl_arr[by_exit], lots_arr[by_exit], risk_arr[by_exit]
+    balance_after = config.initial_balance + np.cumsum(pnl_arr)
+
+    timeline = panel['timeline']
+    ledger = pd.DataFrame({
+        'symbol': np.asarray(symbols, dtype=object)[sym[taken]],
+        'instrument': instrument[taken],
+        'entry_time': timeline[bar[taken]],
+        'exit_time': timeline[exit_bar[taken]],
+        'type': np.where(is_buy[taken], 'BUY', 'SELL'),
+        'entry_price': entry[taken],
+        'sl_price': sl[taken],
+        'tp_price': tp[taken],
+        'exit_price': exit_price[taken],
+        'lots': lots_arr,
+        'pnl': pnl_arr,
+        'r_multiple': pnl_arr / risk_arr if len(taken) else pnl_arr,
+        'result': np.where(won[taken], 'WIN', 'LOSS'),
+    })
+
+    trades = [
+        Trade(
+            entry_time=row.entry_time,
+            exit_time=row.exit_time,
+            trade_type=row.type,
+            entry_price=float(row.entry_price),
+            sl_price=float(row.sl_price),
+            tp_price=float(row.tp_price),
+            exit_price=float(row.exit_price),
+            pnl=float(row.pnl),
+            r_multiple=float(row.r_multiple),
+            result=row.result,
+            setup_type='normal',
+        )
+        for row in ledger.itertuples(index=False)
+    ]
+
+    pnl_by_bar = np.bincount(exit_bar[taken], weights=pnl_arr, minlength=n)[:n]
+    equity = pd.Series(config.initial_balance + np.cumsum(pnl_by_bar), index=timeline)
+
+    return PortfolioResult(
+        ledger=ledger,
+        trades=trades,
+        final_balance=float(balance_after[-1]) if len(taken) else config.initial_balance,
+        equity_curve=[config.initial_balance] + balance_after.tolist(),
+        equity=equity,
+        rejected=rejected,
+    )
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def generate_portfolio_data(n_symbols: int, n_candles: int, group_size: int = 3,
+                            seed: int = 42) -> Dict[str, pd.DataFrame]:
+    """Synthetic universe: groups of correlated symbols sharing one base path."""
+    data = {}
+    rng = np.random.default_rng(seed)
+    for g in range(-(-n_symbols // group_size)):
+        base = generate_realistic_data(n_candles, seed=seed + g)
+        for k in range(min(group_size, n_symbols - g * group_size)):
+            # Same bar-to-bar move scaled by a slowly drifting idiosyncratic factor
+            factor = np.exp(np.cumsum(rng.normal(0, 0.0001, n_candles)))[:, None]
+            df = base.copy()
+            df[['Open', 'High', 'Low', 'Close']] = base[['Open', 'High', 'Low', 'Close']].to_numpy() * factor
+            df['High'] = df[['Open', 'High', 'Close']].max(axis=1)
+            df['Low'] = df[['Open', 'Low', 'Close']].min(axis=1)
+            data[f"SYM{g * group_size + k:02d}"] = df
+    return data
+
+
+def main():
+    print("=" * 70)
+    print("RetailBeastFX - Portfolio Backtester v1.0")
+    print("=" * 70)
+
+    n_symbols = 30
+    n_candles = 124800  # ~5 years of 15m bars (24h x 5d)
+
+    print(f"\n📊 GENERATING {n_symbols} SYMBOLS x {n_candles} CANDLES...")
+    data = generate_portfolio_data(n_symbols, n_candles)
+    instruments = list(InstitutionalRiskEngine.INSTRUMENT_SPECS)
+
+    config = BacktestConfig(strategy="Trend Following", sl_atr_mult=1.5, tp_atr_mult=4.5)
+    portfolio = PortfolioConfig(instruments={s: instruments[i % len(instruments)] for i, s in enumerate(data)})
+
+    t0 = time.perf_counter()
+    panel = build_panel(data, config)
+    t1 = time.perf_counter()
+    result = run_portfolio_backtest(data, config, portfolio, panel)
+    t2 = time.perf_counter()
+    print(f"   Signals: {t1 - t0:.1f}s | Portfolio engine: {t2 - t1:.1f}s | Total: {t2 - t0:.1f}s")
+
+    if not result.trades:
+        print("❌ No trades generated.")
+        return
+
+    m = calculate_metrics(result.trades, config.initial_balance, result.final_balance, result.equity_curve)
+    print(f"\n   Trades: {m['total_trades']} | Win rate: {m['win_rate']:.1f}% | PF: {m['profit_factor']:.2f}")
+    print(f"   Total R: {m['total_r']:+.1f}R | Max DD: {m['max_drawdown']:.1f}%")
+    print(f"   Rejected: {result.rejected['max_risk']} by max risk, "
+          f"{result.rejected['correlation']} by correlation cap")
+
+    print(f"\n   {'Symbol':<8} | {'Instrument':<10} | {'Trades':>6} | {'Win %':>6} | {'Total R':>8}")
+    print("   " + "-" * 54)
+    summary = result.ledger.groupby(['symbol', 'instrument']).agg(
+        trades=('r_multiple', 'size'), win=('result', lambda r: (r == 'WIN').mean() * 100),
+        total_r=('r_multiple', 'sum'))
+    for row in summary.head(10).reset_index().itertuples(index=False):
+        print(f"   {row.symbol:<8} | {row.instrument:<10} | {row.trades:>6} | {row.win:5.1f}% | {row.total_r:+7.1f}R")
+
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+RetailBeastFX - Stage Profiler v1.0
+Opt-in timers and counters for the signal, backtest and optimizer stages.
+
+    from rbfx_profiler import profiling, print_report, export_chrome_trace
+
+    with profiling():
+        run_grid_optimization(df, PARAM_GRID)
+    print_report()
+    export_chrome_trace("grid_trace.json")    # chrome://tracing or ui.perfetto.dev
+    export_speedscope("grid.speedscope.json")  # speedscope.app
+
+Instrumented code wraps each stage in `with stage("name"):` (or decorates a
+whole function with @profiled()). Stages nest, so
+the report shows e.g. grid.cell/generate_signals/indicator.adx. While
+profiling is off, stage() hands back one shared no-op context manager, so
+the cost is a global lookup and two empty method calls per stage.
+"""
+
+import os
+import json
+import time
+import functools
+import threading
+from dataclasses import dataclass
+from typing import Dict, List
+
+import pandas as pd
+
+# Raw events kept for trace export (aggregates are always exact)
+MAX_EVENTS = 1_000_000
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    total_ns: int = 0
+    min_ns: int = 0
+    max_ns: int = 0
+
+
+_stats: Dict[str, StageStats] = {}
+_counters: Dict[str, float] = {}
+_events: List[tuple] = []  # (path, start_ns, duration_ns, thread id)
+_origin_ns = time.perf_counter_ns()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# STAGE CONTEXT MANAGERS
+# ═══════════════════════════════════════════════════════════════════════════════
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('name', 'path', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.path = f"{stack[-1]}/{self.name}" if stack else self.name
+        stack.append(self.path)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter_ns() - self.start
+        _local.stack.pop()
+        with _lock:
+            s = _stats.get(self.path)
+            if s is None:
+                _stats[self.path] = StageStats(1, duration, duration, duration)
+            else:
+                s.calls += 1
+                s.total_ns += duration
+                s.min_ns = min(s.min_ns, duration)
+                s.max_ns = max(s.max_ns, duration)
+            if len(_events) < MAX_EVENTS:
+                _events.append((self.path, self.start, duration, threading.get_ident()))
+        return False
+
+
+def stage(name: str):
+    """Time the enclosed block as `name` (nested under any open stage)."""
+    return _Stage(name) if _enabled else _NULL
+
+
+def profiled(name: str = None):
+    """Decorator: time every call of the function as one stage."""
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Stage(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name: str, n: float = 1):
+    """Add n to a named counter (trades, cache hits, bars, ...)."""
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONTROL
+# ═══════════════════════════════════════════════════════════════════════════════
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Drop all collected timings, counters and events."""
+    global _origin_ns
+    with _lock:
+        _stats.clear()
+        _counters.clear()
+        _events.clear()
+        _origin_ns = time.perf_counter_ns()
+
+
+class profiling:
+    """Enable profiling for a block (collected data is kept after it exits)."""
+
+    def __init__(self, clear: bool = True):
+        self.clear = clear
+
+    def __enter__(self):
+        if self.clear:
+            reset()
+        self._was_enabled = _enabled
+        enable()
+        return self
+
+    def __exit__(self, *exc):
+        if not self._was_enabled:
+            disable()
+        return False
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REPORTING
+# ═══════════════════════════════════════════════════════════════════════════════
+def report() -> pd.DataFrame:
+    """Per-stage totals; self_s excludes time spent in nested stages."""
+    with _lock:
+        items = {path: StageStats(s.calls, s.total_ns, s.min_ns, s.max_ns) for path, s in _stats.items()}
+    if not items:
+        return pd.DataFrame(columns=['stage', 'depth', 'calls', 'total_s', 'self_s', 'mean_ms', 'max_ms', 'pct'])
+
+    child_ns = {path: 0 for path in items}
+    for path, s in items.items():
+        parent = path.rpartition('/')[0]
+        if parent in child_ns:
+            child_ns[parent] += s.total_ns
+    root_ns = sum(s.total_ns for path, s in items.items() if '/' not in path) or 1
+
+    rows = [{
+        'stage': path,
+        'depth': path.count('/'),
+        'calls': s.calls,
+        'total_s': s.total_ns / 1e9,
+        'self_s': (s.total_ns - child_ns[path]) / 1e9,
+        'mean_ms': s.total_ns / s.calls / 1e6,
+        'max_ms': s.max_ns / 1e6,
+        'pct': s.total_ns / root_ns * 100,
+    } for path, s in items.items()]
+    return pd.DataFrame(rows).sort_values('stage').reset_index(drop=True)
+
+
+def counters() -> Dict[str, float]:
+    with _lock:
+        return dict(_counters)
+
+
+def print_report(min_pct: float = 0.0):
+    """Indented stage table plus counters."""
+    df = report()
+    print(f"\n   {'Stage':48} | {'Calls':>8} | {'Total':>9} | {'Self':>9} | {'Mean':>9} | {'%':>6}")
+    print("   " + "-" * 100)
+    for r in df.itertuples(index=False):
+        if r.pct < min_pct:
+            continue
+        label = "  " * r.depth + r.stage.rpartition('/')[2]
+        print(f"   {label:48} | {r.calls:>8} | {r.total_s:8.3f}s | {r.self_s:8.3f}s | "
+              f"{r.mean_ms:7.3f}ms | {r.pct:5.1f}%")
+    c = counters()
+    if c:
+        print("\n   Counters:")
+        for name in sorted(c):
+            print(f"      {name:30} {c[name]:>14,.0f}")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EXPORT
+# ═══════════════════════════════════════════════════════════════════════════════
+def export_chrome_trace(path: str):
+    """Chrome trace-event JSON (complete 'X' events, microseconds)."""
+    with _lock:
+        events = list(_events)
+        origin = _origin_ns
+    pid = os.getpid()
+    trace = [{
+        'name': p.rpartition('/')[2],
+        'cat': p.partition('/')[0],
+        'ph': 'X',
+        'ts': (start - origin) / 1e3,
+        'dur': duration / 1e3,
+        'pid': pid,
+        'tid': tid,
+        'args': {'path': p},
+    } for p, start, duration, tid in events]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def export_speedscope(path: str, name: str = "RetailBeastFX"):
+    """speedscope 'evented' profile, one per thread."""
+    with _lock:
+        events = list(_events)
+        origin = _origin_ns
+
+    frames: List[Dict] = []
+    frame_index: Dict[str, int] = {}
+
+    def frame(p: str) -> int:
+        if p not in frame_index:
+            frame_index[p] = len(frames)
+            frames.append({'name': p.rpartition('/')[2], 'file': p})
+        return frame_index[p]
+
+    profiles = []
+    for tid in sorted({e[3] for e in events}):
+        opens_closes = []
+        for p, start, duration, t in events:
+            if t != tid:
+                continue
+            at = (start - origin) / 1e3
+            # Longer (outer) stages open first and close last at equal timestamps
+            opens_closes.append((at, 1, -duration, 'O', frame(p)))
+            opens_closes.append((at + duration / 1e3, 0, duration, 'C', frame(p)))
+        opens_closes.sort()
+        if not opens_closes:
+            continue
+        profiles.append({
+            'type': 'evented',
+            'name': f"{name} (thread {tid})",
+            'unit': 'microseconds',
+            'startValue': opens_closes[0][0],
+            'endValue': opens_closes[-1][0],
+            'events': [{'type': kind, 'frame': fr, 'at': at} for at, _, _, kind, fr in opens_closes],
+        })
+
+    with open(path, 'w') as f:
+        json.dump({
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': profiles,
+            'name': name,
+            'exporter': 'rbfx_profiler',
+        }, f)
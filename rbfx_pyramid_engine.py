@@ -0,0 +1,305 @@
+"""
+RetailBeastFX - Pyramiding & Disaster Exit Engine v1.0
+Multi-leg position simulation driven by InstitutionalRiskEngine.
+
+Each position starts from a generate_signals entry. While it is open:
+- Legs of 25/50/75% (pyramiding_sizes ADX tiers) are added when ADX and the
+  unrealized R cross add_threshold / rr_threshold (k-th add needs k x rr_threshold)
+- The whole position exits on SL, TP, or a disaster_levels alert
+  (ADX collapse and/or structure break)
+
+The state machine is event driven: every transition (exit, k-th add) is a
+forward-scan query answered for all positions at once, so the cost scales
+with the number of events, not bars x parameters.
+"""
+
+import time
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+
+from rbfx_backtest_enhanced import (
+    BacktestConfig,
+    Trade,
+    InstitutionalRiskEngine,
+    WARMUP_BARS,
+    generate_realistic_data,
+    generate_signals,
+    calculate_metrics,
+)
+from rbfx_core import select_trades
+from rbfx_first_touch import ForwardScanner, BarScanner, resolve_exits, EXIT_SL, EXIT_TP, EXIT_NONE
+
+EXIT_DISASTER = 2
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass
+class PyramidConfig:
+    # Pyramiding (InstitutionalRiskEngine.pyramiding_suggestion defaults)
+    add_threshold: float = 30.0
+    rr_threshold: float = 1.0
+    max_adds: int = 3
+
+    # Disaster exit (InstitutionalRiskEngine.disaster_alert defaults)
+    adx_collapse_threshold: float = 10.0
+    adx_lookback: int = 5  # "adx_prev" = ADX this many bars ago
+    structure_lookback: int = 10  # Close through the prior N-bar swing = structure break
+    exit_severity: int = InstitutionalRiskEngine.SEVERITY_WARNING  # Exit at this level or worse
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PRECOMPUTED STATE
+# ═══════════════════════════════════════════════════════════════════════════════
+class PyramidContext:
+    """Everything that does not depend on PyramidConfig, built once per signal frame.
+
+    Entry candidates, their SL/TP first touches and the price scanners are
+    shared by every (add_threshold, adx_collapse_threshold) combination.
+    """
+
+    def __init__(self, df: pd.DataFrame, config: BacktestConfig):
+        self.df = df
+        self.config = config
+        self.n = len(df)
+        self.high = df['High'].to_numpy(dtype=np.float64)
+        self.low = df['Low'].to_numpy(dtype=np.float64)
+        self.close = df['Close'].to_numpy(dtype=np.float64)
+        self.adx = df['ADX'].to_numpy(dtype=np.float64)
+        atr = df['ATR'].to_numpy(dtype=np.float64)
+        buy = df['BuySignal'].to_numpy(dtype=bool)
+        sell = df['SellSignal'].to_numpy(dtype=bool)
+
+        with np.errstate(invalid='ignore'):
+            valid = (buy | sell) & (atr > 0) & (np.arange(self.n) >= WARMUP_BARS)
+        self.candidates = np.flatnonzero(valid)
+        self.is_buy = buy[self.candidates]
+        self.sign = np.where(self.is_buy, 1.0, -1.0)
+        self.entry = self.close[self.candidates]
+        self.risk = atr[self.candidates] * config.sl_atr_mult
+        self.sl = self.entry - self.sign * self.risk
+        self.tp = self.entry + self.sign * atr[self.candidates] * config.tp_atr_mult
+
+        self.scanner = BarScanner(self.high, self.low)
+        self.sltp_exit, self.sltp_outcome = resolve_exits(
+            self.scanner, self.candidates, self.is_buy, self.sl, self.tp
+        )
+
+        self._disaster_cache: Dict[Tuple, Tuple[ForwardScanner, ForwardScanner]] = {}
+        self._add_cache: Dict[float, Tuple[ForwardScanner, ForwardScanner]] = {}
+
+    def disaster_scanners(self, pyramid: PyramidConfig) -> Tuple[ForwardScanner, ForwardScanner]:
+        """Scanners over long/short exit flags (severity >= exit_severity)."""
+        key = (pyramid.adx_collapse_threshold, pyramid.adx_lookback,
+               pyramid.structure_lookback, pyramid.exit_severity)
+        if key not in self._disaster_cache:
+            adx_prev = pd.Series(self.adx).shift(pyramid.adx_lookback).to_numpy()
+            swing_low = pd.Series(self.low).rolling(pyramid.structure_lookback).min().shift(1).to_numpy()
+            swing_high = pd.Series(self.high).rolling(pyramid.structure_lookback).max().shift(1).to_numpy()
+            with np.errstate(invalid='ignore'):
+                broken_long = self.close < swing_low
+                broken_short = self.close > swing_high
+            flags = []
+            for broken in (broken_long, broken_short):
+                level = InstitutionalRiskEngine.disaster_levels(
+                    self.adx, adx_prev, broken, pyramid.adx_collapse_threshold
+                )
+                flags.append(ForwardScanner((level >= pyramid.exit_severity).astype(np.float64)))
+            self._disaster_cache[key] = tuple(flags)
+        return self._disaster_cache[key]
+
+    def add_scanners(self, add_threshold: float) -> Tuple[ForwardScanner, ForwardScanner]:
+        """Scanners over close (long) / -close (short), masked to bars with ADX >= threshold."""
+        if add_threshold not in self._add_cache:
+            with np.errstate(invalid='ignore'):
+                gate = self.adx >= add_threshold
+            self._add_cache[add_threshold] = (
+                ForwardScanner(np.where(gate, self.close, -np.inf)),
+                ForwardScanner(np.where(gate, -self.close, -np.inf)),
+            )
+        return self._add_cache[add_threshold]
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ENGINE
+# ═══════════════════════════════════════════════════════════════════════════════
+def simulate_positions(ctx: PyramidContext, pyramid: PyramidConfig) -> pd.DataFrame:
+    """Run the multi-leg state machine; returns one row per leg.
+
+    Columns: position, leg, bar, entry, size, exit_bar, exit_price,
+    exit_reason, r (realized R of the leg in units of the original risk).
+    """
+    n = ctx.n
+    cand = ctx.candidates
+
+    # 1. Exit = earliest of SL/TP touch and disaster close (intrabar stops win ties)
+    long_flags, short_flags = ctx.disaster_scanners(pyramid)
+    disaster = np.full(len(cand), n, dtype=np.int64)
+    b = ctx.is_buy
+    disaster[b] = long_flags.first_at_or_above(cand[b] + 1, 1.0)
+    disaster[~b] = short_flags.first_at_or_above(cand[~b] + 1, 1.0)
+    exit_idx = np.minimum(ctx.sltp_exit, disaster)
+    reason = np.where(ctx.sltp_exit <= disaster, ctx.sltp_outcome, EXIT_DISASTER)
+    reason = np.where(exit_idx >= n, EXIT_NONE, reason)
+
+    # 2. One position at a time with the usual cooldown
+    taken = select_trades(cand, exit_idx, n, cooldown=ctx.config.cooldown)
+    taken = taken[exit_idx[taken] < n]
+    if len(taken) == 0:
+        return pd.DataFrame(columns=['position', 'leg', 'bar', 'entry', 'size', 'exit_bar',
+                                     'exit_price', 'exit_reason', 'r'])
+
+    p_bar = cand[taken]
+    p_buy = ctx.is_buy[taken]
+    p_sign = ctx.sign[taken]
+    p_entry = ctx.entry[taken]
+    p_risk = ctx.risk[taken]
+    p_exit = exit_idx[taken]
+    p_reason = reason[taken]
+    p_exit_price = np.select(
+        [p_reason == EXIT_SL, p_reason == EXIT_TP],
+        [ctx.sl[taken], ctx.tp[taken]],
+        ctx.close[np.minimum(p_exit, n - 1)],
+    )
+
+    # 3. k-th add: first bar after the previous leg with ADX gate and close beyond k x rr
+    legs = [(np.arange(len(taken)), p_bar, p_entry, np.ones(len(taken)))]
+    up, down = ctx.add_scanners(pyramid.add_threshold)
+    last = p_bar.copy()
+    active = np.ones(len(taken), dtype=bool)
+    for k in range(1, pyramid.max_adds + 1):
+        level = p_entry + p_sign * p_risk * pyramid.rr_threshold * k
+        hit = np.full(len(taken), n, dtype=np.int64)
+        hit[p_buy] = up.first_at_or_above(last[p_buy] + 1, level[p_buy], p_exit[p_buy])
+        hit[~p_buy] = down.first_at_or_above(last[~p_buy] + 1, -level[~p_buy], p_exit[~p_buy])
+        active &= hit < n
+        if not active.any():
+            break
+        pos = np.flatnonzero(active)
+        at = hit[pos]
+        current_rr = (ctx.close[at] - p_entry[pos]) * p_sign[pos] / p_risk[pos]
+        size = InstitutionalRiskEngine.pyramiding_sizes(
+            ctx.adx[at], current_rr, pyramid.add_threshold, pyramid.rr_threshold * k
+        )
+        legs.append((pos, at, ctx.close[at], size))
+        last[pos] = at
+
+    ledger = pd.DataFrame({
+        'position': np.concatenate([l[0] for l in legs]),
+        'leg': np.concatenate([np.full(len(l[0]), i) for i, l in enumerate(legs)]),
+        'bar': np.concatenate([l[1] for l in legs]),
+        'entry': np.concatenate([l[2] for l in legs]),
+        'size': np.concatenate([l[3] for l in legs]),
+    })
+    pos = ledger['position'].to_numpy()
+    ledger['exit_bar'] = p_exit[pos]
+    ledger['exit_price'] = p_exit_price[pos]
+    ledger['exit_reason'] = p_reason[pos]
+    ledger['r'] = ledger['size'] * (ledger['exit_price'] - ledger['entry']) * p_sign[pos] / p_risk[pos]
+    return ledger.sort_values(['position', 'leg'], kind='stable').reset_index(drop=True)
+
+
+def run_pyramid_backtest(df: pd.DataFrame, config: BacktestConfig, pyramid: Optional[PyramidConfig] = None,
+                         ctx: Optional[PyramidContext] = None) -> Tuple[List[Trade], float, List[float], pd.DataFrame]:
+    """Pyramiding backtest with the run_backtest return shape plus the leg ledger.
+
+    Each position risks balance * risk_per_trade on its first leg; adds scale
+    with their size and the position's R is the sum over legs.
+    """
+    pyramid = pyramid or PyramidConfig()
+    ctx = ctx or PyramidContext(df, config)
+    ledger = simulate_positions(ctx, pyramid)
+
+    position_r = ledger.groupby('position')['r'].sum().to_numpy() if len(ledger) else np.zeros(0)
+    first = ledger[ledger['leg'] == 0] if len(ledger) else ledger
+
+    balance = config.initial_balance
+    equity_curve = [balance]
+    trades = []
+    times = df.index
+    for k, row in enumerate(first.itertuples(index=False)):
+        c = np.searchsorted(ctx.candidates, row.bar)
+        pnl = balance * config.risk_per_trade * position_r[k]
+        balance += pnl
+        equity_curve.append(balance)
+        trades.append(Trade(
+            entry_time=times[row.bar],
+            exit_time=times[row.exit_bar],
+            trade_type='BUY' if ctx.is_buy[c] else 'SELL',
+            entry_price=float(row.entry),
+            sl_price=float(ctx.sl[c]),
+            tp_price=float(ctx.tp[c]),
+            exit_price=float(row.exit_price),
+            pnl=float(pnl),
+            r_multiple=float(position_r[k]),
+            result='WIN' if position_r[k] > 0 else 'LOSS',
+            setup_type='normal',
+        ))
+    return trades, balance, equity_curve, ledger
+
+
+def sweep_pyramiding(df: pd.DataFrame, config: BacktestConfig,
+                     add_thresholds: List[float], collapse_thresholds: List[float],
+                     **pyramid_kwargs) -> pd.DataFrame:
+    """Grid over add_threshold x adx_collapse_threshold sharing one PyramidContext."""
+    ctx = PyramidContext(df, config)
+    rows = []
+    for add_thr, collapse_thr in product(add_thresholds, collapse_thresholds):
+        pyramid = PyramidConfig(add_threshold=add_thr, adx_collapse_threshold=collapse_thr, **pyramid_kwargs)
+        trades, final_balance, equity_curve, ledger = run_pyramid_backtest(df, config, pyramid, ctx)
+        if not trades:
+            continue
+        m = calculate_metrics(trades, config.initial_balance, final_balance, equity_curve)
+        rows.append({
+            'add_threshold': add_thr,
+            'adx_collapse_threshold': collapse_thr,
+            'trades': m['total_trades'],
+            'adds': int((ledger['leg'] > 0).sum()),
+            'disaster_exits': int((ledger.loc[ledger['leg'] == 0, 'exit_reason'] == EXIT_DISASTER).sum()),
+            'win_rate': m['win_rate'],
+            'profit_factor': m['profit_factor'],
+            'total_r': m['total_r'],
+            'max_drawdown': m['max_drawdown'],
+        })
+    return pd.DataFrame(rows)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def main():
+    print("=" * 70)
+    print("RetailBeastFX - Pyramiding & Disaster Exit Engine v1.0")
+    print("=" * 70)
+
+    print("\n📊 GENERATING SYNTHETIC DATA...")
+    df = generate_realistic_data(5000, seed=42)
+    config = BacktestConfig(strategy="Trend Following", sl_atr_mult=1.5, tp_atr_mult=4.5)
+    df_signals = generate_signals(df.copy(), config)
+    print(f"   Generated {len(df)} candles")
+
+    add_grid = [20.0, 25.0, 30.0, 35.0, 40.0]
+    collapse_grid = [5.0, 10.0, 15.0, 20.0, 1e9]  # 1e9 = disaster exits off
+
+    t0 = time.perf_counter()
+    results = sweep_pyramiding(df_signals, config, add_grid, collapse_grid)
+    elapsed = time.perf_counter() - t0
+    print(f"   Swept {len(add_grid) * len(collapse_grid)} configs in {elapsed:.2f}s")
+
+    if results.empty:
+        print("❌ No trades generated.")
+        return
+
+    print(f"\n   {'Add ADX':>7} | {'Collapse':>8} | {'Trades':>6} | {'Adds':>4} | {'Disaster':>8} | "
+          f"{'WR':>6} | {'PF':>5} | {'Total R':>8}")
+    print("   " + "-" * 72)
+    for r in results.itertuples(index=False):
+        collapse = "off" if r.adx_collapse_threshold >= 1e9 else f"{r.adx_collapse_threshold:.0f}"
+        print(f"   {r.add_threshold:>7.0f} | {collapse:>8} | {r.trades:>6} | {r.adds:>4} | {r.disaster_exits:>8} | "
+              f"{r.win_rate:5.1f}% | {r.profit_factor:5.2f} | {r.total_r:+7.1f}R")
+
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
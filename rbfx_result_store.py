@@ -0,0 +1,224 @@
+"""
+RetailBeastFX - Result Store v1.0
+Persistent SQLite cache for backtest / optimizer results.
+
+Each result is keyed by (data fingerprint, code version, config hash):
+- data fingerprint: hash of the OHLCV bars (plus window, if any)
+- code version: hash of the engine source files, so editing the engine
+  invalidates old results automatically
+- config hash: hash of the full BacktestConfig (or any JSON-able dict)
+
+Metrics are always stored; trade ledgers only when asked for. The database
+runs in WAL mode with a busy timeout, and each process opens its own
+connection, so pool workers can all write to the same file.
+"""
+
+import os
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+import pandas as pd
+import numpy as np
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Returned by ResultStore.get when nothing is cached (None is a valid cached result)
+MISS = object()
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rbfx_results.sqlite")
+
+# Source files whose behaviour feeds BacktestConfig results (grid signals come
+# from rbfx_rules / rbfx_feature_graph, configs from build_config)
+ENGINE_FILES = (
+    "rbfx_backtest_enhanced.py",
+    "rbfx_core.py",
+    "rbfx_first_touch.py",
+    "rbfx_aep_orb.py",
+    "rbfx_rules.py",
+    "rbfx_feature_graph.py",
+    "rbfx_grid_optimizer.py",
+    os.path.join("retailbeastfx", "scripts", "position_sizer.py"),
+)
+
+# Source files behind V9Config results (rbfx_v9_backtest, grouped by rbfx_grid_optimizer)
+V9_ENGINE_FILES = (
+    "rbfx_v9_backtest.py",
+    "rbfx_grid_optimizer.py",
+    "rbfx_core.py",
+    "rbfx_first_touch.py",
+    os.path.join("retailbeastfx", "scripts", "position_sizer.py"),
+)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# KEYS
+# ═══════════════════════════════════════════════════════════════════════════════
+def data_fingerprint(df: pd.DataFrame, window: Optional[Tuple[int, int]] = None) -> str:
+    """Hash of the index and OHLCV columns (indicator columns are ignored).
+
+    Signal frames therefore fingerprint the same as the raw bars they came from.
+    Lowercase OHLCV plus a 'datetime' column (the v9 layout) works too.
+    """
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(df.index.asi8 if isinstance(df.index, pd.DatetimeIndex)
+                                  else np.asarray(df.index)).tobytes())
+    if 'datetime' in df.columns:
+        h.update(b"datetime")
+        h.update(np.ascontiguousarray(pd.DatetimeIndex(df['datetime']).asi8).tobytes())
+    for col in ('Open', 'High', 'Low', 'Close', 'Volume'):
+        name = col if col in df.columns else col.lower()
+        if name in df.columns:
+            h.update(col.encode())
+            h.update(np.ascontiguousarray(df[name].to_numpy(dtype=np.float64)).tobytes())
+    if window is not None:
+        h.update(f"window:{window[0]}:{window[1]}".encode())
+    return h.hexdigest()[:16]
+
+
+def code_version(*paths: str) -> str:
+    """Hash of source files (relative paths resolve against this directory)."""
+    base = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha1()
+    for path in paths or ENGINE_FILES:
+        full = path if os.path.isabs(path) else os.path.join(base, path)
+        h.update(os.path.basename(full).encode())
+        try:
+            with open(full, 'rb') as f:
+                h.update(f.read())
+        except OSError:
+            h.update(b"missing")
+    return h.hexdigest()[:16]
+
+
+def config_to_dict(config: Any) -> Dict:
+    return asdict(config) if is_dataclass(config) else dict(config)
+
+
+def hash_config(config: Any) -> str:
+    """Stable hash of a BacktestConfig or parameter dict."""
+    canonical = json.dumps(config_to_dict(config), default=str, sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+
+def _json_default(value):
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating,)):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# STORE
+# ═══════════════════════════════════════════════════════════════════════════════
+class ResultStore:
+    """SQLite-backed result cache, safe to share across worker processes.
+
+    Usage:
+        store = ResultStore()
+        fp = data_fingerprint(df)
+        metrics = store.get(fp, config)
+        if metrics is MISS:
+            metrics = ...  # run the backtest
+            store.put(fp, config, metrics, trades)
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            data_fp     TEXT NOT NULL,
+            code_ver    TEXT NOT NULL,
+            config_hash TEXT NOT NULL,
+            config      TEXT NOT NULL,
+            metrics     TEXT,
+            trades      BLOB,
+            created     REAL NOT NULL,
+            PRIMARY KEY (data_fp, code_ver, config_hash)
+        )
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, version: Optional[str] = None,
+                 store_trades: bool = False):
+        self.path = path
+        self.version = version or code_version()
+        self.store_trades = store_trades
+        self._conn = None
+        self._pid = None
+
+    def __getstate__(self):
+        # Connections don't survive pickling; workers reconnect lazily
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_pid'] = None
+        return state
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(self.SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, data_fp: str, config: Any, default: Any = MISS) -> Any:
+        """Cached metrics (possibly None) for this data and config, or default."""
+        row = self.conn.execute(
+            "SELECT metrics FROM results WHERE data_fp=? AND code_ver=? AND config_hash=?",
+            (data_fp, self.version, hash_config(config)),
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def get_many(self, data_fp: str, configs: Iterable[Any]) -> Dict[str, Any]:
+        """{config_hash: metrics} for every cached config in the batch."""
+        hashes = list({hash_config(c) for c in configs})
+        found = {}
+        for lo in range(0, len(hashes), 500):  # SQLite parameter limit
+            chunk = hashes[lo:lo + 500]
+            rows = self.conn.execute(
+                f"SELECT config_hash, metrics FROM results WHERE data_fp=? AND code_ver=? "
+                f"AND config_hash IN ({','.join('?' * len(chunk))})",
+                (data_fp, self.version, *chunk),
+            ).fetchall()
+            found.update((h, json.loads(m)) for h, m in rows)
+        return found
+
+    def put(self, data_fp: str, config: Any, metrics: Optional[Dict], trades: Optional[List] = None):
+        """Store metrics (None = no result) and, if store_trades, the trade ledger."""
+        blob = None
+        if self.store_trades and trades:
+            records = [asdict(t) if is_dataclass(t) else dict(t) for t in trades]
+            blob = zlib.compress(json.dumps(records, default=_json_default).encode())
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (data_fp, self.version, hash_config(config),
+             json.dumps(config_to_dict(config), default=_json_default, sort_keys=True),
+             json.dumps(metrics, default=_json_default), blob, time.time()),
+        )
+
+    def load_trades(self, data_fp: str, config: Any) -> Optional[pd.DataFrame]:
+        """Stored trade ledger as a DataFrame, or None if none was stored."""
+        row = self.conn.execute(
+            "SELECT trades FROM results WHERE data_fp=? AND code_ver=? AND config_hash=?",
+            (data_fp, self.version, hash_config(config)),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        ledger = pd.DataFrame(json.loads(zlib.decompress(row[0])))
+        for col in ('entry_time', 'exit_time'):
+            if col in ledger.columns:
+                ledger[col] = pd.to_datetime(ledger[col])
+        return ledger
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM results WHERE code_ver=?",
+                                 (self.version,)).fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
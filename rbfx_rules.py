@@ -0,0 +1,584 @@
+"""
+RetailBeastFX - Strategy Rule Compiler v1.0
+Small expression language for Alpha Edge style entry rules.
+
+    BullTrend & AboveTrend & BullCandle & RSI in (50, 70)
+    AboveTrend & BullTrend & PullbackZone[1] & Close > EMA_Fast
+    BB_Squeeze[1] & Close > BB_Upper & BullCandle
+
+Syntax (loosest binding first):
+    a | b, a or b                      either
+    a & b, a and b                     both
+    ~a, not a                          negation
+    x < y, <=, >, >=, ==, !=           comparisons (NaN compares False)
+    x in (lo, hi)                      lo < x < hi
+    x + y, x - y, x * y, x / y         arithmetic
+    x[k]                               value k bars ago
+    Names resolve to: another rule (RULES or the outputs being compiled),
+    a BacktestConfig field (e.g. rsi_oversold), or a base column: any
+    rbfx_feature_graph feature (EMA_Fast, RSI, InLondon, ...) or bar column.
+
+Rules compile into one shared graph: every sub-expression is interned, so
+BullTrend, RSI > 50 or Close > EMA_Fast is built once no matter how many
+strategies use it, and evaluation only touches the nodes (and base columns)
+reachable from the requested outputs. Base columns come from a
+FeatureCache, so they are computed lazily and can be shared across configs.
+"""
+
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+from dataclasses import fields
+from typing import Dict, List, Optional, Tuple
+
+from rbfx_aep_orb import AEP_STRATEGIES
+from rbfx_backtest_enhanced import (
+    BacktestConfig,
+    SignalBundle,
+    SETUP_NORMAL,
+    SETUP_BEST,
+    SETUP_SILVER_BULLET,
+    generate_realistic_data,
+    generate_signals,
+    signal_bundle,
+    run_backtest_fast,
+    calculate_metrics,
+)
+from rbfx_feature_graph import FeatureCache
+
+CONFIG_FIELDS = frozenset(f.name for f in fields(BacktestConfig))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RULE LIBRARY
+# ═══════════════════════════════════════════════════════════════════════════════
+# Named conditions (same definitions as generate_signals)
+RULES = {
+    'BullTrend': 'EMA_Fast > EMA_Slow',
+    'BearTrend': 'EMA_Fast < EMA_Slow',
+    'AboveTrend': 'Close > EMA_Trend',
+    'BelowTrend': 'Close < EMA_Trend',
+    'TouchedLowerBB': 'Low <= BB_Lower',
+    'TouchedUpperBB': 'High >= BB_Upper',
+    'BB_Squeeze': 'BB_Width < BB_WidthMA',
+    'BullCandle': 'Close > Open',
+    'BearCandle': 'Close < Open',
+    'RSI_Oversold': 'RSI < rsi_oversold',
+    'RSI_Overbought': 'RSI > rsi_overbought',
+    'PullbackZone': '(Close < EMA_Fast) & (Close > EMA_Slow)',
+    'HighVol': 'Volume > VolMA * 1.5',
+
+    # Alpha Edge strategies
+    'AlphaTrendBuy': 'BullTrend & AboveTrend & BullCandle & RSI in (50, 70)',
+    'AlphaTrendSell': 'BearTrend & BelowTrend & BearCandle & RSI in (30, 50)',
+    'AlphaMeanRevBuy': 'RSI_Oversold & TouchedLowerBB & BullCandle',
+    'AlphaMeanRevSell': 'RSI_Overbought & TouchedUpperBB & BearCandle',
+    'AlphaPullbackBuy': 'AboveTrend & BullTrend & PullbackZone[1] & Close > EMA_Fast',
+    'AlphaPullbackSell': 'BelowTrend & BearTrend & Close[1] > EMA_Fast[1] & Close < EMA_Fast',
+    'AlphaBreakoutBuy': 'BB_Squeeze[1] & Close > BB_Upper & BullCandle',
+    'AlphaBreakoutSell': 'BB_Squeeze[1] & Close < BB_Lower & BearCandle',
+    'OriginalBuy': 'BullCandle & TouchedLowerBB & BullTrend',
+    'OriginalSell': 'BearCandle & TouchedUpperBB & BearTrend',
+}
+
+# Strategy name -> (buy rule, sell rule)
+STRATEGY_RULES = {
+    'Trend Following': ('AlphaTrendBuy', 'AlphaTrendSell'),
+    'Mean Reversion': ('AlphaMeanRevBuy', 'AlphaMeanRevSell'),
+    'Swing Pullbacks': ('AlphaPullbackBuy', 'AlphaPullbackSell'),
+    'Breakout': ('AlphaBreakoutBuy', 'AlphaBreakoutSell'),
+    'All Signals': ('AlphaTrendBuy | AlphaMeanRevBuy | AlphaPullbackBuy | AlphaBreakoutBuy',
+                    'AlphaTrendSell | AlphaMeanRevSell | AlphaPullbackSell | AlphaBreakoutSell'),
+    'Original': ('OriginalBuy', 'OriginalSell'),
+}
+
+
+def signal_rules(config: BacktestConfig, buy: Optional[str] = None, sell: Optional[str] = None) -> Dict[str, str]:
+    """The generate_signals outputs the engine uses, as rules.
+
+    buy/sell override the strategy's rules (new variants need no code).
+    """
+    default_buy, default_sell = STRATEGY_RULES.get(config.strategy, STRATEGY_RULES['Original'])
+    rules = {'RawBuySignal': buy or default_buy, 'RawSellSignal': sell or default_sell}
+    session = ' & ValidSession' if config.killzone_only else ''
+    rules['BuySignal'] = 'RawBuySignal' + session
+    rules['SellSignal'] = 'RawSellSignal' + session
+    rules['BestBuySetup'] = 'BuySignal & TouchedLowerBB & (InLondon | InNY) & HighVol'
+    rules['BestSellSetup'] = 'SellSignal & TouchedUpperBB & (InLondon | InNY) & HighVol'
+    rules['SilverBulletBuy'] = 'BuySignal & InSilverBullet'
+    rules['SilverBulletSell'] = 'SellSignal & InSilverBullet'
+    return rules
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PARSER
+# ═══════════════════════════════════════════════════════════════════════════════
+class RuleError(ValueError):
+    pass
+
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.\d*|\.\d+|\d+)|([A-Za-z_]\w*)|(<=|>=|==|!=|[<>&|~()\[\],+\-*/]))")
+_KEYWORDS = {'and': '&', 'or': '|', 'not': '~'}
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m:
+            raise RuleError(f"Unexpected character {text[pos:].strip()[:1]!r} in rule: {text}")
+        number, name, op = m.groups()
+        if number:
+            tokens.append(('num', number))
+        elif name in _KEYWORDS:
+            tokens.append(('op', _KEYWORDS[name]))
+        elif name in ('in', 'true', 'false'):
+            tokens.append(('op', name))
+        elif name:
+            tokens.append(('name', name))
+        else:
+            tokens.append(('op', op))
+        pos = m.end()
+    tokens.append(('end', ''))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent; produces nested tuples."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self, *ops) -> bool:
+        kind, value = self.tokens[self.pos]
+        return kind == 'op' and value in ops
+
+    def take(self, *ops) -> str:
+        if not self.peek(*ops):
+            raise RuleError(f"Expected {' or '.join(ops)} at {self.tokens[self.pos][1] or 'end'!r} in rule: {self.text}")
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def parse(self):
+        node = self.parse_or()
+        if self.tokens[self.pos][0] != 'end':
+            raise RuleError(f"Unexpected {self.tokens[self.pos][1]!r} in rule: {self.text}")
+        return node
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.peek('|'):
+            self.pos += 1
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else ('or', items)
+
+    def parse_and(self):
+        items = [self.parse_not()]
+        while self.peek('&'):
+            self.pos += 1
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else ('and', items)
+
+    def parse_not(self):
+        if self.peek('~'):
+            self.pos += 1
+            return ('not', self.parse_not())
+        return self.parse_cmp()
+
+    def parse_cmp(self):
+        left = self.parse_sum()
+        if self.peek('<', '<=', '>', '>=', '==', '!='):
+            op = self.take('<', '<=', '>', '>=', '==', '!=')
+            return ('cmp', op, left, self.parse_sum())
+        if self.peek('in'):
+            self.pos += 1
+            self.take('(')
+            lo = self.parse_sum()
+            self.take(',')
+            hi = self.parse_sum()
+            self.take(')')
+            return ('in', left, lo, hi)
+        return left
+
+    def parse_sum(self):
+        node = self.parse_term()
+        while self.peek('+', '-'):
+            op = self.take('+', '-')
+            node = ('arith', op, node, self.parse_term())
+        return node
+
+    def parse_term(self):
+        node = self.parse_unary()
+        while self.peek('*', '/'):
+            op = self.take('*', '/')
+            node = ('arith', op, node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        if self.peek('-'):
+            self.pos += 1
+            return ('arith', '-', ('num', 0.0), self.parse_unary())
+        node = self.parse_primary()
+        while self.peek('['):
+            self.pos += 1
+            kind, value = self.tokens[self.pos]
+            if kind != 'num' or not value.isdigit():
+                raise RuleError(f"Bar offset must be a whole number in rule: {self.text}")
+            self.pos += 1
+            self.take(']')
+            node = ('shift', node, int(value))
+        return node
+
+    def parse_primary(self):
+        kind, value = self.tokens[self.pos]
+        if kind == 'num':
+            self.pos += 1
+            return ('num', float(value))
+        if kind == 'name':
+            self.pos += 1
+            return ('name', value)
+        if self.peek('true', 'false'):
+            self.pos += 1
+            return ('bool', value == 'true')
+        if not self.peek('('):
+            raise RuleError(f"Expected a value at {value or 'end'!r} in rule: {self.text}")
+        self.take('(')
+        node = self.parse_or()
+        self.take(')')
+        return node
+
+
+def parse_rule(text: str):
+    """Parse a rule into its syntax tree (raises RuleError)."""
+    return _Parser(text).parse()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# GRAPH
+# ═══════════════════════════════════════════════════════════════════════════════
+class RuleGraph:
+    """Hash-consed expression graph shared by every rule compiled into it.
+
+    Nodes are (op, *args) tuples; identical sub-expressions map to the same
+    node id. Comparisons are normalized (a > b -> b < a) and &/| operands
+    flattened and sorted, so equivalent spellings share nodes too.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, str]] = None):
+        self.rules = dict(RULES if rules is None else rules)
+        self.nodes: List[Tuple] = []
+        self.ids: Dict[Tuple, int] = {}
+        self.named: Dict[str, int] = {}
+        self.parsed_nodes = 0  # Syntax-tree nodes seen (what naive evaluation would compute)
+
+    def intern(self, *node) -> int:
+        if node not in self.ids:
+            self.ids[node] = len(self.nodes)
+            self.nodes.append(node)
+        return self.ids[node]
+
+    def compile(self, outputs: Dict[str, str]) -> Dict[str, int]:
+        """Compile named rules (which may reference each other); returns {name: node id}."""
+        scope = {**self.rules, **outputs}
+        return {name: self._compile_name(name, scope, ()) for name in outputs}
+
+    def _compile_name(self, name: str, scope: Dict[str, str], active: Tuple[str, ...]) -> int:
+        key = (name, scope.get(name))
+        if key in self.named:
+            return self.named[key]
+        if name in active:
+            raise RuleError(f"Rule cycle: {' -> '.join(active + (name,))}")
+        if name in scope:
+            node = self._compile(parse_rule(scope[name]), scope, active + (name,))
+        elif name in CONFIG_FIELDS:
+            node = self.intern('param', name)
+        else:
+            node = self.intern('col', name)
+        self.named[key] = node
+        return node
+
+    def _compile(self, tree, scope, active) -> int:
+        self.parsed_nodes += 1
+        kind = tree[0]
+        if kind == 'num':
+            return self.intern('const', tree[1])
+        if kind == 'bool':
+            return self.intern('const', tree[1])
+        if kind == 'name':
+            return self._compile_name(tree[1], scope, active)
+        if kind == 'shift':
+            inner = self._compile(tree[1], scope, active)
+            bars = tree[2]
+            if bars == 0 or self.nodes[inner][0] in ('const', 'param'):
+                return inner
+            if self.nodes[inner][0] == 'shift':
+                inner, bars = self.nodes[inner][1], self.nodes[inner][2] + bars
+            return self.intern('shift', inner, bars)
+        if kind == 'not':
+            inner = self._compile(tree[1], scope, active)
+            if self.nodes[inner][0] == 'not':
+                return self.nodes[inner][1]
+            return self.intern('not', inner)
+        if kind in ('and', 'or'):
+            items = set()
+            for child in tree[1]:
+                node = self._compile(child, scope, active)
+                if self.nodes[node][0] == kind:
+                    items.update(self.nodes[node][1])
+                else:
+                    items.add(node)
+            items = tuple(sorted(items))
+            return items[0] if len(items) == 1 else self.intern(kind, items)
+        if kind == 'in':
+            x = self._compile(tree[1], scope, active)
+            lo = self._compile(tree[2], scope, active)
+            hi = self._compile(tree[3], scope, active)
+            items = tuple(sorted((self.intern('lt', lo, x), self.intern('lt', x, hi))))
+            return self.intern('and', items)
+        if kind == 'cmp':
+            op = tree[1]
+            a = self._compile(tree[2], scope, active)
+            b = self._compile(tree[3], scope, active)
+            if op == '<':
+                return self.intern('lt', a, b)
+            if op == '>':
+                return self.intern('lt', b, a)
+            if op == '<=':
+                return self.intern('le', a, b)
+            if op == '>=':
+                return self.intern('le', b, a)
+            eq = self.intern('eq', *sorted((a, b)))
+            return eq if op == '==' else self.intern('not', eq)
+        if kind == 'arith':
+            op = tree[1]
+            a = self._compile(tree[2], scope, active)
+            b = self._compile(tree[3], scope, active)
+            if op in ('+', '*'):
+                a, b = sorted((a, b))
+            return self.intern(op, a, b)
+        raise RuleError(f"Unknown syntax node {kind}")
+
+    def dependencies(self, roots) -> List[int]:
+        """Node ids reachable from roots, children before parents."""
+        order, seen = [], set()
+        stack = [(r, False) for r in roots]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.append((node, True))
+            stack.extend((child, False) for child in self.children(node))
+        return order
+
+    def children(self, node: int) -> Tuple[int, ...]:
+        op, *args = self.nodes[node]
+        if op in ('col', 'param', 'const'):
+            return ()
+        if op in ('and', 'or'):
+            return args[0]
+        if op == 'shift':
+            return (args[0],)
+        return tuple(args)
+
+    def columns(self, roots) -> List[str]:
+        """Base columns the roots need."""
+        return [self.nodes[n][1] for n in self.dependencies(roots) if self.nodes[n][0] == 'col']
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EVALUATION
+# ═══════════════════════════════════════════════════════════════════════════════
+def _shift(values, bars: int):
+    values = np.asarray(values)
+    if values.ndim == 0:
+        return values
+    out = np.empty_like(values) if values.dtype == bool else np.empty(values.shape, dtype=np.float64)
+    out[:bars] = False if values.dtype == bool else np.nan
+    out[bars:] = values[:-bars] if bars < len(values) else values[:0]
+    return out
+
+
+def _as_mask(values, node: Tuple) -> np.ndarray:
+    values = np.asarray(values)
+    if values.dtype != bool:
+        raise RuleError(f"Operand of {node[0]} is not a condition: {node}")
+    return values
+
+
+class RuleEvaluator:
+    """Evaluates graph nodes against one set of base columns, memoizing every node."""
+
+    def __init__(self, graph: RuleGraph, columns, config: BacktestConfig):
+        self.graph = graph
+        self.columns = columns
+        self.config = config
+        self.values: Dict[int, object] = {}
+
+    def evaluate(self, roots: Dict[str, int]) -> Dict[str, np.ndarray]:
+        for node in self.graph.dependencies(roots.values()):
+            if node not in self.values:
+                self.values[node] = self._eval(node)
+        return {name: self.values[node] for name, node in roots.items()}
+
+    def _eval(self, node: int):
+        op, *args = self.graph.nodes[node]
+        v = self.values
+        if op == 'col':
+            try:
+                return self.columns[args[0]]
+            except KeyError:
+                raise RuleError(f"Unknown rule or column: {args[0]}") from None
+        if op == 'param':
+            return getattr(self.config, args[0])
+        if op == 'const':
+            return args[0]
+        if op == 'shift':
+            return _shift(v[args[0]], args[1])
+        if op in ('and', 'or'):
+            masks = [_as_mask(v[c], self.graph.nodes[node]) for c in args[0]]
+            out = masks[0].copy()
+            combine = np.logical_and if op == 'and' else np.logical_or
+            for m in masks[1:]:
+                combine(out, m, out=out)
+            return out
+        if op == 'not':
+            return ~_as_mask(v[args[0]], self.graph.nodes[node])
+        a, b = v[args[0]], v[args[1]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if op == 'lt':
+                return np.less(a, b)
+            if op == 'le':
+                return np.less_equal(a, b)
+            if op == 'eq':
+                return np.equal(a, b)
+            if op == '+':
+                return np.add(a, b)
+            if op == '-':
+                return np.subtract(a, b)
+            if op == '*':
+                return np.multiply(a, b)
+            if op == '/':
+                return np.divide(a, b)
+        raise RuleError(f"Unknown node {op}")
+
+
+def evaluate_rules(df: pd.DataFrame, config: BacktestConfig, outputs: Dict[str, str],
+                   graph: Optional[RuleGraph] = None,
+                   cache: Optional[FeatureCache] = None) -> Dict[str, np.ndarray]:
+    """Evaluate named rules on df (read-only); only the base columns they reach are computed."""
+    graph = graph or RuleGraph()
+    roots = graph.compile(outputs)
+    columns = (cache or FeatureCache(df)).view(config)
+    return RuleEvaluator(graph, columns, config).evaluate(roots)
+
+
+def rule_bundle(df: pd.DataFrame, config: BacktestConfig, buy: Optional[str] = None,
+                sell: Optional[str] = None, diagnostics: Tuple[str, ...] = (),
+                cache: Optional[FeatureCache] = None) -> SignalBundle:
+    """signal_bundle built from rules (the strategy's own, or buy/sell overrides).
+
+    Matches signal_bundle for the Alpha Edge strategies but skips every
+    indicator the selected rules don't reference. Pass one FeatureCache
+    (built on df) across calls to reuse indicators between configs.
+    """
+    graph = RuleGraph()
+    roots = graph.compile(signal_rules(config, buy, sell))
+    columns = (cache or FeatureCache(df)).view(config)
+    out = RuleEvaluator(graph, columns, config).evaluate(roots)
+    sb = out['SilverBulletBuy'] | out['SilverBulletSell']
+    best = out['BestBuySetup'] | out['BestSellSetup']
+    return SignalBundle(
+        index=df.index,
+        high=df['High'].to_numpy(dtype=np.float64),
+        low=df['Low'].to_numpy(dtype=np.float64),
+        close=df['Close'].to_numpy(dtype=np.float64),
+        atr=np.asarray(columns['ATR'], dtype=np.float64),
+        buy=out['BuySignal'],
+        sell=out['SellSignal'],
+        setup=np.where(sb, SETUP_SILVER_BULLET, np.where(best, SETUP_BEST, SETUP_NORMAL)).astype(np.int8),
+        diagnostics={name: np.asarray(columns[name]) for name in diagnostics},
+        source=df,
+    )
+
+
+def lazy_signal_bundle(df: pd.DataFrame, config: BacktestConfig,
+                       cache: Optional[FeatureCache] = None) -> SignalBundle:
+    """signal_bundle that only computes what config's strategy reads.
+
+    Alpha Edge strategies go through the rule graph (sharing `cache`);
+    AEP strategies fall back to signal_bundle.
+    """
+    if config.strategy in AEP_STRATEGIES:
+        return signal_bundle(df, config)
+    return rule_bundle(df, config, cache=cache)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def main():
+    print("=" * 70)
+    print("RetailBeastFX - Strategy Rule Compiler v1.0")
+    print("=" * 70)
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"\n📊 GENERATING {n:,} SYNTHETIC CANDLES...")
+    df = generate_realistic_data(n, seed=42)
+
+    print("\n" + "=" * 70)
+    print("🔗 SHARED GRAPH FOR ALL ALPHA STRATEGIES")
+    print("=" * 70)
+    graph = RuleGraph()
+    outputs = {}
+    for name, (buy, sell) in STRATEGY_RULES.items():
+        outputs[f"{name} buy"] = buy
+        outputs[f"{name} sell"] = sell
+    roots = graph.compile(outputs)
+    print(f"   {len(outputs)} rules: {graph.parsed_nodes} expression nodes -> {len(graph.nodes)} unique graph nodes")
+    t0 = time.perf_counter()
+    values = evaluate_rules(df, BacktestConfig(), outputs, graph)
+    print(f"   Evaluated all {len(values)} rules in {(time.perf_counter() - t0) * 1e3:.0f}ms")
+
+    print("\n" + "=" * 70)
+    print("✂️  PER-STRATEGY WORK")
+    print("=" * 70)
+    print(f"\n   {'Strategy':16} | {'Base columns':>12} | {'rule_bundle':>11} | {'generate_signals':>16} | {'Same trades':>11}")
+    print("   " + "-" * 80)
+    for strategy in STRATEGY_RULES:
+        config = BacktestConfig(strategy=strategy)
+        g = RuleGraph()
+        needed = g.columns(g.compile(signal_rules(config)).values())
+        t0 = time.perf_counter()
+        bundle = rule_bundle(df, config)
+        t_rules = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        frame = generate_signals(df.copy(), config)
+        t_full = time.perf_counter() - t0
+        same = [t.__dict__ for t in run_backtest_fast(bundle, config)[0]] == \
+               [t.__dict__ for t in run_backtest_fast(frame, config)[0]]
+        print(f"   {strategy:16} | {len(set(needed)):>12} | {t_rules * 1e3:9.0f}ms | {t_full * 1e3:14.0f}ms | "
+              f"{'✅' if same else '❌':>10}")
+
+    print("\n" + "=" * 70)
+    print("🧪 CUSTOM VARIANT (no code changes)")
+    print("=" * 70)
+    buy = 'BullTrend & AboveTrend & BullCandle & RSI in (50, 65) & ADX > adx_threshold'
+    sell = 'BearTrend & BelowTrend & BearCandle & RSI in (35, 50) & ADX > adx_threshold'
+    config = BacktestConfig(strategy="Trend Following")
+    trades, balance, curve = run_backtest_fast(rule_bundle(df, config, buy, sell), config)
+    print(f"   Buy:  {buy}\n   Sell: {sell}")
+    if trades:
+        m = calculate_metrics(trades, config.initial_balance, balance, curve)
+        print(f"   Trades: {m['total_trades']} | Win rate: {m['win_rate']:.1f}% | PF: {m['profit_factor']:.2f} | "
+              f"Total R: {m['total_r']:+.1f}R")
+    else:
+        print("   No trades.")
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
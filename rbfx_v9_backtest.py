@@ -7,44 +7,82 @@ import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import random
+from itertools import product
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+from rbfx_core import (
+    STYLES,
+    calculate_ema,
+    calculate_atr,
+    calculate_bollinger_bands as core_bollinger_bands,
+    apply_cooldown,
+    atr_brackets,
+    COST_PARAMS,
+    CostModel,
+    instrument_specs,
+)
+from rbfx_first_touch import BarScanner, resolve_exits, resolve_trailing_exits, EXIT_SL, EXIT_TP, EXIT_NONE
 
 # ═══════════════════════════════════════════════════════════════════
 # CONFIGURATION (matches Pine Script inputs)
 # ═══════════════════════════════════════════════════════════════════
-CONFIG = {
+@dataclass
+class V9Config:
     # Institutional Mode
-    'adx_period': 14,
-    'adx_threshold': 25,
-    'atr_trail_mult': 3.0,
+    adx_period: int = 14
+    adx_threshold: float = 25
+    atr_trail_mult: float = 3.0
     
     # EMAs
-    'ema_fast': 8,
-    'ema_slow': 21,
-    'ema_50': 50,
-    'ema_200': 200,
+    ema_fast: int = 8
+    ema_slow: int = 21
+    ema_50: int = 50
+    ema_200: int = 200
     
     # Bollinger Bands
-    'bb_length': 20,
-    'bb_mult': 1.0,
+    bb_length: int = 20
+    bb_mult: float = 1.0
     
     # Risk Management
-    'atr_length': 14,
-    'atr_mult_sl': 2.0,
-    'atr_mult_tp': 6.0,  # 3:1 R:R target
+    atr_length: int = 14
+    atr_mult_sl: float = 2.0
+    atr_mult_tp: float = 6.0  # 3:1 R:R target
+    max_hold_bars: int = 100  # Timeout (simulate_trade's max_bars)
+    exit_mode: str = 'fixed'  # fixed, atr (atr_trail_mult chandelier), ema (ema_trail), breakeven
+    ema_trail: int = 5
+    trail_start_r: float = 1.0  # Trailing / breakeven arms once price is this many R in profit
+    
+    # Indicator formulas: 'pandas' (historical) or 'pine' (ta.atr/ta.stdev/ta.dmi parity)
+    indicator_backend: str = 'pandas'
     
     # Session (EST hours)
-    'london_start': 3,
-    'london_end': 6,
-    'ny_start': 8,
-    'ny_end': 11,
+    london_start: int = 3
+    london_end: int = 6
+    ny_start: int = 8
+    ny_end: int = 11
     
     # Confluence minimums
-    'min_confluence': 6,
-    'apex_confluence': 8,
+    min_confluence: float = 6
+    apex_confluence: float = 8
     
     # Signal cooldown
-    'signal_cooldown': 5,
-}
+    signal_cooldown: int = 5
+    
+    # Trading costs (all zero = frictionless; rbfx_core.COST_PROFILES has typical values)
+    instrument: str = 'XAUUSD'  # Pip size / lot value for the costs
+    spread_pips: float = 0.0
+    session_spreads: bool = False
+    slippage_atr: float = 0.0  # Entry and stop/timeout fills slip this fraction of ATR
+    commission_per_lot: float = 0.0  # Round turn, per standard lot
+
+CONFIG = V9Config()
+
+# Fields that leave the confluence scores untouched: every value shares one
+# score_bars pass and only changes the entry mask / exit levels
+THRESHOLD_PARAMS = ('min_confluence', 'apex_confluence', 'signal_cooldown',
+                    'atr_mult_sl', 'atr_mult_tp', 'max_hold_bars', 'instrument',
+                    'exit_mode', 'atr_trail_mult', 'ema_trail', 'trail_start_r') + COST_PARAMS
 
 # ═══════════════════════════════════════════════════════════════════
 # SYNTHETIC DATA GENERATOR
@@ -95,107 +133,50 @@ def generate_market_data(bars=5000, base_price=2000.0, volatility=0.002):
 # ═══════════════════════════════════════════════════════════════════
 # TECHNICAL INDICATORS
 # ═══════════════════════════════════════════════════════════════════
-def calculate_ema(series, period):
-    return series.ewm(span=period, adjust=False).mean()
-
-def calculate_sma(series, period):
-    return series.rolling(window=period).mean()
+# Shared implementations in rbfx_core; STYLE carries v9's variants (DM ADX,
+# half-open session hours, 9:30-10:30 power hour)
+STYLE = STYLES['v9']
 
-def calculate_atr(df, period):
-    high = df['high']
-    low = df['low']
-    close = df['close']
-    
-    tr1 = high - low
-    tr2 = abs(high - close.shift(1))
-    tr3 = abs(low - close.shift(1))
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    
-    return tr.rolling(window=period).mean()
-
-def calculate_adx(df, period=14):
+def calculate_adx(df, period=14, backend='pandas'):
     """Calculate ADX indicator"""
-    high = df['high']
-    low = df['low']
-    close = df['close']
-    
-    # +DM and -DM
-    plus_dm = high.diff()
-    minus_dm = -low.diff()
-    
-    plus_dm = np.where((plus_dm > minus_dm) & (plus_dm > 0), plus_dm, 0)
-    minus_dm = np.where((minus_dm > plus_dm) & (minus_dm > 0), minus_dm, 0)
-    
-    # True Range
-    tr1 = high - low
-    tr2 = abs(high - close.shift(1))
-    tr3 = abs(low - close.shift(1))
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    
-    # Smoothed
-    atr = tr.rolling(window=period).mean()
-    plus_di = 100 * pd.Series(plus_dm).rolling(window=period).mean() / atr
-    minus_di = 100 * pd.Series(minus_dm).rolling(window=period).mean() / atr
-    
-    # DX and ADX
-    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di + 0.0001)
-    adx = dx.rolling(window=period).mean()
-    
-    return adx
+    return STYLE.adx(df, period, backend)
 
-def calculate_bollinger_bands(df, period=20, mult=1.0):
+def calculate_bollinger_bands(df, period=20, mult=1.0, backend='pandas'):
     """Calculate Bollinger Bands"""
-    close = df['close']
-    basis = close.rolling(window=period).mean()
-    std = close.rolling(window=period).std()
-    upper = basis + mult * std
-    lower = basis - mult * std
-    return basis, upper, lower
+    return core_bollinger_bands(df['close'], period, mult, backend)
 
 def calculate_volume_zscore(df, period=20):
     """Calculate volume Z-score for Sentinel"""
-    vol = df['volume']
-    avg_vol = vol.rolling(window=period).mean()
-    std_vol = vol.rolling(window=period).std()
-    zscore = (vol - avg_vol) / (std_vol + 0.0001)
-    return zscore
+    return STYLE.volume_zscore(df, period)
 
 # ═══════════════════════════════════════════════════════════════════
 # SESSION DETECTION
 # ═══════════════════════════════════════════════════════════════════
+def session_windows(config=CONFIG):
+    return {'london': (config.london_start, config.london_end), 'ny_am': (config.ny_start, config.ny_end)}
+
 def is_in_killzone(dt):
     """Check if time is in London or NY killzone (EST)"""
-    hour = dt.hour
-    
-    # London: 3-6 EST
-    if CONFIG['london_start'] <= hour < CONFIG['london_end']:
+    info = STYLE.session_info(dt, **session_windows())
+    if info['london']:
         return True, 'LONDON'
-    
-    # NY: 8-11 EST  
-    if CONFIG['ny_start'] <= hour < CONFIG['ny_end']:
+    if info['ny_am']:
         return True, 'NY'
-    
     return False, 'OFF'
 
 def is_silver_bullet(dt):
     """Silver Bullet: 10-11 EST"""
-    return 10 <= dt.hour < 11
+    return STYLE.session_info(dt)['silver_bullet']
 
 def is_power_hour(dt):
     """Power Hour: 9:30-10:30 EST"""
-    hour = dt.hour
-    minute = dt.minute
-    if hour == 9 and minute >= 30:
-        return True
-    if hour == 10 and minute < 30:
-        return True
-    return False
+    return STYLE.session_info(dt)['power_hour']
 
 # ═══════════════════════════════════════════════════════════════════
 # CONFLUENCE CALCULATOR
 # ═══════════════════════════════════════════════════════════════════
 def calculate_confluence(is_buy, row, indicators):
-    """Calculate confluence score (0-10) matching v9 logic"""
+    """Calculate confluence score (0-10) matching v9 logic (single bar reference)"""
     score = 0.0
     
     adx = indicators['adx']
@@ -205,7 +186,7 @@ def calculate_confluence(is_buy, row, indicators):
     in_ph = indicators['in_power_hour']
     
     # 1. ADX Strength (+3 max)
-    if adx >= CONFIG['adx_threshold']:
+    if adx >= CONFIG.adx_threshold:
         score += 1.5
     if adx >= 30:
         score += 1.0
@@ -252,10 +233,279 @@ def calculate_confluence(is_buy, row, indicators):
     
     return min(score, 10.0)
 
+def calculate_indicators(df, config=CONFIG):
+    """Add the v9 indicator columns to df (in place) and return it"""
+    df['ema8'] = calculate_ema(df['close'], config.ema_fast)
+    df['ema21'] = calculate_ema(df['close'], config.ema_slow)
+    df['ema50'] = calculate_ema(df['close'], config.ema_50)
+    df['ema200'] = calculate_ema(df['close'], config.ema_200)
+    df['atr'] = calculate_atr(df, config.atr_length, config.indicator_backend)
+    df['adx'] = calculate_adx(df, config.adx_period, config.indicator_backend)
+    df['bb_basis'], df['bb_upper'], df['bb_lower'] = calculate_bollinger_bands(
+        df, config.bb_length, config.bb_mult, config.indicator_backend
+    )
+    df['vol_zscore'] = calculate_volume_zscore(df, 20)
+    return df
+
+def session_flags(datetimes, config=CONFIG):
+    """Vectorized is_in_killzone / is_silver_bullet / is_power_hour"""
+    flags = STYLE.sessions(datetimes, **session_windows(config))
+    return {
+        'in_killzone': flags['killzone'],
+        'session': np.select([flags['london'], flags['ny_am']], ['LONDON', 'NY'], 'OFF'),
+        'in_silver_bullet': flags['silver_bullet'],
+        'in_power_hour': flags['power_hour'],
+    }
+
+def confluence_scores(df, flags, config=CONFIG):
+    """calculate_confluence for every bar, both directions.
+    
+    df must carry the calculate_indicators columns. Returns (buy_score,
+    sell_score) float arrays; NaN inputs score 0 on that component,
+    exactly like the scalar comparisons.
+    """
+    close = df['close'].to_numpy()
+    adx = df['adx'].to_numpy()
+    ema50 = df['ema50'].to_numpy()
+    ema200 = df['ema200'].to_numpy()
+    ema8 = df['ema8'].to_numpy()
+    ema21 = df['ema21'].to_numpy()
+    vol_z = df['vol_zscore'].to_numpy()
+    
+    # Direction-free components
+    shared = (
+        # 1. ADX Strength (+3 max): the tiers stack
+        1.5 * (adx >= config.adx_threshold) + 1.0 * (adx >= 30) + 0.5 * (adx >= 35)
+        # 4. Session Timing (+1.5 max)
+        + np.select([flags['in_silver_bullet'] | flags['in_power_hour'], flags['in_killzone']], [1.5, 1.0], 0.0)
+        # 6. Volume Sentinel (+3 max)
+        + np.select([vol_z >= 2.0, vol_z >= 1.5, vol_z >= 1.0], [3.0, 2.0, 1.0], 0.0)
+    )
+    
+    # 2. SMA Alignment (+2 max), 3. EMA Trend (+1.5), 5. BB Touch (+1)
+    buy = (
+        shared
+        + np.select([(close > ema50) & (close > ema200), close > ema200], [2.0, 1.0], 0.0)
+        + 1.5 * (ema8 > ema21)
+        + 1.0 * (df['low'].to_numpy() <= df['bb_lower'].to_numpy())
+    )
+    sell = (
+        shared
+        + np.select([(close < ema50) & (close < ema200), close < ema200], [2.0, 1.0], 0.0)
+        + 1.5 * (ema8 < ema21)
+        + 1.0 * (df['high'].to_numpy() >= df['bb_upper'].to_numpy())
+    )
+    return np.minimum(buy, 10.0), np.minimum(sell, 10.0)
+
+def generate_signals(df, config=CONFIG):
+    """v9 entry signals for every bar as masks (df must have the indicator columns).
+    
+    Returns a dict of arrays: buy/sell (raw setups), confluence (score of the
+    signalled side), signal (setup that passes min_confluence), is_apex, plus
+    the session flags.
+    """
+    flags = session_flags(df['datetime'], config)
+    close = df['close'].to_numpy()
+    open_ = df['open'].to_numpy()
+    ema8 = df['ema8'].to_numpy()
+    ema21 = df['ema21'].to_numpy()
+    ema200 = df['ema200'].to_numpy()
+    adx = df['adx'].to_numpy()
+    
+    # Killzone + ADX gate (NaN ADX never passes)
+    gate = flags['in_killzone'] & (adx >= config.adx_threshold)
+    
+    # Entry zones (BB touch simplified - no OB in this backtest)
+    buy = gate & (close > open_) & (df['low'].to_numpy() <= df['bb_lower'].to_numpy()) & (ema8 > ema21) & (close > ema200)
+    sell = gate & (close < open_) & (df['high'].to_numpy() >= df['bb_upper'].to_numpy()) & (ema8 < ema21) & (close < ema200)
+    
+    buy_score, sell_score = confluence_scores(df, flags, config)
+    confluence = np.where(buy, buy_score, np.where(sell, sell_score, 0.0))
+    signal = (buy | sell) & (confluence >= config.min_confluence)
+    is_apex = signal & (confluence >= config.apex_confluence) & (df['vol_zscore'].to_numpy() >= 2.0)
+    
+    return dict(flags, buy=buy, sell=sell, confluence=confluence, signal=signal, is_apex=is_apex)
+
+# ═══════════════════════════════════════════════════════════════════
+# SCORES AND BATCH TRADE RESOLVER
+# ═══════════════════════════════════════════════════════════════════
+@dataclass
+class V9Scores:
+    """Per-bar arrays every threshold config reads (one score_bars pass)"""
+    datetime: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    atr: np.ndarray
+    adx: np.ndarray
+    vol_zscore: np.ndarray
+    buy: np.ndarray  # raw setups (killzone + ADX gate, before min_confluence)
+    sell: np.ndarray
+    confluence: np.ndarray  # score of the signalled side, 0 elsewhere
+    session: np.ndarray
+    start_bar: int  # warmup (ema_200 + 10)
+    
+    def __len__(self):
+        return len(self.close)
+
+def score_bars(df, config=CONFIG, inplace=False):
+    """Indicators, setups and confluence for every bar (df is copied unless inplace)"""
+    frame = df if inplace else df.copy()
+    calculate_indicators(frame, config)
+    signals = generate_signals(frame, config)
+    return V9Scores(
+        datetime=frame['datetime'].to_numpy(),
+        high=frame['high'].to_numpy(),
+        low=frame['low'].to_numpy(),
+        close=frame['close'].to_numpy(),
+        atr=frame['atr'].to_numpy(),
+        adx=frame['adx'].to_numpy(),
+        vol_zscore=frame['vol_zscore'].to_numpy(),
+        buy=signals['buy'],
+        sell=signals['sell'],
+        confluence=signals['confluence'],
+        session=signals['session'],
+        start_bar=config.ema_200 + 10,
+    )
+
+def select_entries(scores, config=CONFIG):
+    """Entry bars for one threshold config: min_confluence mask, then cooldown"""
+    signal = (scores.buy | scores.sell) & (scores.confluence >= config.min_confluence)
+    return apply_cooldown(np.flatnonzero(signal), config.signal_cooldown, scores.start_bar)
+
+def batch_trades(scores, configs, scanner=None, intrabar=None):
+    """Trade frames for many threshold configs sharing one V9Scores.
+    
+    Configs with the same SL/TP/hold settings hit mostly the same bars, so
+    each such group resolves the union of its entry bars in a single
+    resolve_exits call. Only THRESHOLD_PARAMS may differ between configs.
+    With an IntrabarIndex, bars touching both SL and TP are settled on the
+    lower timeframe instead of counting as losses. Costs (CostModel) come
+    off each config's pnl_r, so they sweep without re-resolving exits.
+    
+    Trailing exit modes resolve each group in one resolve_trailing_exits
+    call, with a block of rows per distinct atr_trail_mult; trailed trades
+    are WIN/LOSS by the sign of their R.
+    """
+    scanner = scanner or BarScanner(scores.high, scores.low)
+    entries = [select_entries(scores, c) for c in configs]
+    frames: List[Optional[pd.DataFrame]] = [None] * len(configs)
+    
+    groups: Dict[tuple, List[int]] = {}
+    for k, c in enumerate(configs):
+        trail = (c.exit_mode, c.trail_start_r, c.ema_trail if c.exit_mode == 'ema' else None)
+        groups.setdefault((c.atr_mult_sl, c.atr_mult_tp, c.max_hold_bars) + trail, []).append(k)
+    
+    for (sl_mult, tp_mult, max_bars, mode, start_r, ema_period), members in groups.items():
+        # One block of union entry bars per trail multiplier (a single block unless mode='atr')
+        trail_of = {k: configs[k].atr_trail_mult if mode == 'atr' else 0.0 for k in members}
+        blocks = {t: np.unique(np.concatenate([entries[k] for k in members if trail_of[k] == t]))
+                  for t in sorted(set(trail_of.values()))}
+        offsets = dict(zip(blocks, np.cumsum([0] + [len(b) for b in blocks.values()])))
+        bars = np.concatenate(list(blocks.values()))
+        is_buy = scores.buy[bars]
+        entry, direction, sl, tp = atr_brackets(scores.close, scores.atr, bars, is_buy, sl_mult, tp_mult)
+        
+        if mode == 'fixed':
+            # Same walk as simulate_trade: SL before TP on a shared bar, max_bars hold
+            exit_idx, outcome = resolve_exits(scanner, bars, is_buy, sl, tp, max_bars=max_bars, intrabar=intrabar)
+            final_price = scores.close[np.minimum(bars + max_bars - 1, len(scores) - 1)]
+            timeout_r = direction * (final_price - entry) / (direction * (entry - sl))
+            result = np.select([outcome == EXIT_SL, outcome == EXIT_TP], ['LOSS', 'WIN'], 'TIMEOUT')
+            pnl_r = np.select([outcome == EXIT_SL, outcome == EXIT_TP], [-1.0, tp_mult / sl_mult], timeout_r)
+        else:
+            trail = np.repeat(list(blocks), [len(b) for b in blocks.values()])
+            ema = calculate_ema(pd.Series(scores.close), ema_period).to_numpy() if mode == 'ema' else None
+            exit_idx, outcome, exit_price = resolve_trailing_exits(
+                scores.high, scores.low, scores.close, bars, is_buy, sl, tp, mode, trail,
+                atr=scores.atr, ema=ema, start_r=start_r, max_bars=max_bars, intrabar=intrabar)
+            pnl_r = direction * (exit_price - entry) / (direction * (entry - sl))
+            result = np.where(outcome == EXIT_NONE, 'TIMEOUT', np.where(pnl_r > 0, 'WIN', 'LOSS'))
+        exit_bar = np.where(outcome == EXIT_NONE, bars + max_bars, exit_idx)
+        
+        for k in members:
+            t = trail_of[k]
+            at = offsets[t] + np.searchsorted(blocks[t], entries[k])
+            b = entries[k]
+            net_r = pnl_r[at]
+            costs = CostModel.from_config(configs[k])
+            if not costs.free:
+                pip_size, pip_value = instrument_specs(configs[k].instrument, entry[at])
+                net_r = net_r - costs.cost_r(scores.datetime[b], scores.atr[b], outcome[at] != EXIT_TP,
+                                             np.abs(entry[at] - sl[at]), pip_size, pip_value)
+            frames[k] = pd.DataFrame({
+                'bar': b,
+                'datetime': scores.datetime[b],
+                'direction': np.where(is_buy[at], 'BUY', 'SELL'),
+                'entry': entry[at],
+                'sl': sl[at],
+                'tp': tp[at],
+                'confluence': scores.confluence[b],
+                'is_apex': (scores.confluence[b] >= configs[k].apex_confluence) & (scores.vol_zscore[b] >= 2.0),
+                'adx': scores.adx[b],
+                'session': scores.session[b],
+                'vol_zscore': scores.vol_zscore[b],
+                'result': result[at],
+                'pnl_r': net_r,
+                'exit_bar': exit_bar[at],
+            })
+    return frames
+
+def calculate_v9_metrics(trades) -> Dict:
+    """analyze_results' numbers without the printing / CSV"""
+    total = len(trades)
+    if total == 0:
+        return dict.fromkeys(['total_trades', 'wins', 'losses', 'timeouts', 'win_rate', 'total_r', 'avg_r',
+                              'profit_factor', 'max_drawdown_r', 'apex_trades', 'apex_wr',
+                              'buy_trades', 'sell_trades'], 0)
+    pnl = trades['pnl_r'].to_numpy()
+    result = trades['result'].to_numpy()
+    wins = result == 'WIN'
+    apex = trades['is_apex'].to_numpy(dtype=bool)
+    buys = trades['direction'].to_numpy() == 'BUY'
+    
+    gross_profit = pnl[pnl > 0].sum()
+    gross_loss = abs(pnl[pnl < 0].sum())
+    equity_r = np.cumsum(pnl)
+    return {
+        'total_trades': total,
+        'wins': int(wins.sum()),
+        'losses': int((result == 'LOSS').sum()),
+        'timeouts': int((result == 'TIMEOUT').sum()),
+        'win_rate': wins.mean() * 100,
+        'total_r': pnl.sum(),
+        'avg_r': pnl.mean(),
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else float('inf'),
+        'max_drawdown_r': float((np.maximum.accumulate(np.maximum(equity_r, 0)) - equity_r).max()),
+        'apex_trades': int(apex.sum()),
+        'apex_wr': wins[apex].mean() * 100 if apex.any() else 0,
+        'buy_trades': int(buys.sum()),
+        'sell_trades': int((~buys).sum()),
+    }
+
+def sweep_thresholds(df, config=CONFIG, **values) -> pd.DataFrame:
+    """Metrics for every combination of threshold values, one scoring pass.
+    
+        sweep_thresholds(df, min_confluence=[4, 5, 6, 7, 8, 9], apex_confluence=[8, 9])
+    """
+    unknown = set(values) - set(THRESHOLD_PARAMS)
+    if unknown:
+        raise ValueError(f"Not threshold parameters: {sorted(unknown)} (see THRESHOLD_PARAMS)")
+    keys = list(values)
+    combos = list(product(*values.values()))
+    configs = [replace(config, **dict(zip(keys, combo))) for combo in combos]
+    frames = batch_trades(score_bars(df, config), configs)
+    return pd.DataFrame([{**dict(zip(keys, combo)), **calculate_v9_metrics(t)}
+                         for combo, t in zip(combos, frames)])
+
 # ═══════════════════════════════════════════════════════════════════
 # MAIN BACKTESTER
 # ═══════════════════════════════════════════════════════════════════
-def run_backtest(df):
+def backtest_trades(df, config=CONFIG, intrabar=None):
+    """v9 trades as a DataFrame (adds the indicator columns to df)"""
+    return batch_trades(score_bars(df, config, inplace=True), [config], intrabar=intrabar)[0]
+
+def run_backtest(df, config=CONFIG):
     """Run the v9 institutional backtest"""
     
     print("=" * 60)
@@ -265,144 +515,10 @@ def run_backtest(df):
     print(f"  Period: {df['datetime'].iloc[0]} to {df['datetime'].iloc[-1]}")
     print("=" * 60)
     
-    # Calculate indicators
-    df['ema8'] = calculate_ema(df['close'], CONFIG['ema_fast'])
-    df['ema21'] = calculate_ema(df['close'], CONFIG['ema_slow'])
-    df['ema50'] = calculate_ema(df['close'], CONFIG['ema_50'])
-    df['ema200'] = calculate_ema(df['close'], CONFIG['ema_200'])
-    df['atr'] = calculate_atr(df, CONFIG['atr_length'])
-    df['adx'] = calculate_adx(df, CONFIG['adx_period'])
-    df['bb_basis'], df['bb_upper'], df['bb_lower'] = calculate_bollinger_bands(
-        df, CONFIG['bb_length'], CONFIG['bb_mult']
-    )
-    df['vol_zscore'] = calculate_volume_zscore(df, 20)
-    
-    # Track trades
-    trades = []
-    last_signal_bar = -100
-    
-    # Skip warmup period
-    start_bar = CONFIG['ema_200'] + 10
-    
-    for i in range(start_bar, len(df)):
-        row = df.iloc[i]
-        prev_row = df.iloc[i-1]
-        
-        # Cooldown check
-        if i - last_signal_bar < CONFIG['signal_cooldown']:
-            continue
-        
-        # Session check
-        in_kz, session = is_in_killzone(row['datetime'])
-        in_sb = is_silver_bullet(row['datetime'])
-        in_ph = is_power_hour(row['datetime'])
-        
-        # Must be in killzone (v9 institutional requirement)
-        if not in_kz:
-            continue
-        
-        # ADX Gate
-        adx = row['adx']
-        if pd.isna(adx) or adx < CONFIG['adx_threshold']:
-            continue
-        
-        # Trend conditions
-        bull_trend = row['ema8'] > row['ema21']
-        bear_trend = row['ema8'] < row['ema21']
-        above_200 = row['close'] > row['ema200']
-        below_200 = row['close'] < row['ema200']
-        
-        # Candle type
-        bull_candle = row['close'] > row['open']
-        bear_candle = row['close'] < row['open']
-        
-        # Entry zones (BB touch simplified - no OB in this backtest)
-        touched_lower_bb = row['low'] <= row['bb_lower']
-        touched_upper_bb = row['high'] >= row['bb_upper']
-        
-        # Build indicators dict for confluence
-        indicators = {
-            'adx': adx,
-            'ema8': row['ema8'],
-            'ema21': row['ema21'],
-            'ema50': row['ema50'],
-            'ema200': row['ema200'],
-            'bb_upper': row['bb_upper'],
-            'bb_lower': row['bb_lower'],
-            'vol_zscore': row['vol_zscore'],
-            'in_killzone': in_kz,
-            'in_silver_bullet': in_sb,
-            'in_power_hour': in_ph,
-        }
-        
-        # BUY Signal (v9 institutional)
-        # Killzone + Above 200 + Bull Trend + Bull Candle + BB Touch
-        buy_signal = (
-            bull_candle and
-            touched_lower_bb and
-            bull_trend and
-            above_200 and
-            in_kz
-        )
-        
-        # SELL Signal (v9 institutional - stricter)
-        # Killzone + Below 200 + Bear Trend + Bear Candle + BB Touch
-        sell_signal = (
-            bear_candle and
-            touched_upper_bb and
-            bear_trend and
-            below_200 and
-            in_kz
-        )
-        
-        if buy_signal or sell_signal:
-            is_buy = buy_signal
-            confluence = calculate_confluence(is_buy, row, indicators)
-            
-            # Minimum confluence filter
-            if confluence < CONFIG['min_confluence']:
-                continue
-            
-            is_apex = confluence >= CONFIG['apex_confluence'] and row['vol_zscore'] >= 2.0
-            
-            # Calculate SL/TP
-            atr = row['atr']
-            entry_price = row['close']
-            
-            if is_buy:
-                sl = entry_price - (atr * CONFIG['atr_mult_sl'])
-                tp = entry_price + (atr * CONFIG['atr_mult_tp'])
-            else:
-                sl = entry_price + (atr * CONFIG['atr_mult_sl'])
-                tp = entry_price - (atr * CONFIG['atr_mult_tp'])
-            
-            # Simulate trade outcome (look ahead)
-            result = simulate_trade(df, i, is_buy, entry_price, sl, tp)
-            
-            trade = {
-                'bar': i,
-                'datetime': row['datetime'],
-                'direction': 'BUY' if is_buy else 'SELL',
-                'entry': entry_price,
-                'sl': sl,
-                'tp': tp,
-                'confluence': confluence,
-                'is_apex': is_apex,
-                'adx': adx,
-                'session': session,
-                'vol_zscore': row['vol_zscore'],
-                'result': result['outcome'],
-                'pnl_r': result['pnl_r'],
-                'exit_bar': result['exit_bar'],
-            }
-            
-            trades.append(trade)
-            last_signal_bar = i
-    
-    return analyze_results(trades)
+    return analyze_results(backtest_trades(df, config))
 
 def simulate_trade(df, entry_bar, is_buy, entry, sl, tp):
-    """Simulate trade outcome by looking ahead"""
+    """Simulate trade outcome by looking ahead (single trade reference for resolve_exits)"""
     max_bars = 100  # Max hold time
     
     for i in range(entry_bar + 1, min(entry_bar + max_bars, len(df))):
@@ -414,14 +530,14 @@ def simulate_trade(df, entry_bar, is_buy, entry, sl, tp):
                 return {'outcome': 'LOSS', 'pnl_r': -1.0, 'exit_bar': i}
             # Check TP
             if row['high'] >= tp:
-                return {'outcome': 'WIN', 'pnl_r': CONFIG['atr_mult_tp'] / CONFIG['atr_mult_sl'], 'exit_bar': i}
+                return {'outcome': 'WIN', 'pnl_r': CONFIG.atr_mult_tp / CONFIG.atr_mult_sl, 'exit_bar': i}
         else:
             # Check SL first
             if row['high'] >= sl:
                 return {'outcome': 'LOSS', 'pnl_r': -1.0, 'exit_bar': i}
             # Check TP
             if row['low'] <= tp:
-                return {'outcome': 'WIN', 'pnl_r': CONFIG['atr_mult_tp'] / CONFIG['atr_mult_sl'], 'exit_bar': i}
+                return {'outcome': 'WIN', 'pnl_r': CONFIG.atr_mult_tp / CONFIG.atr_mult_sl, 'exit_bar': i}
     
     # Timeout - close at current price
     final_price = df.iloc[min(entry_bar + max_bars - 1, len(df) - 1)]['close']
@@ -434,7 +550,7 @@ def simulate_trade(df, entry_bar, is_buy, entry, sl, tp):
 
 def analyze_results(trades):
     """Analyze backtest results"""
-    if not trades:
+    if len(trades) == 0:
         print("\n❌ No trades generated!")
         return None
     
@@ -526,11 +642,26 @@ def analyze_results(trades):
 # RUN BACKTEST
 # ═══════════════════════════════════════════════════════════════════
 if __name__ == "__main__":
+    import sys
+    
     print("\n🦁 Generating synthetic market data...")
     df = generate_market_data(bars=10000, base_price=2000.0, volatility=0.002)
+    # --pine: TradingView indicator formulas (ta.atr, ta.stdev, ta.dmi)
+    config = replace(CONFIG, indicator_backend='pine') if "--pine" in sys.argv else CONFIG
+    
+    if "--sweep" in sys.argv:
+        # Confluence thresholds in one scoring pass (rbfx_grid_optimizer.py --v9 for full grids)
+        print("📈 Sweeping v9 confluence thresholds...")
+        table = sweep_thresholds(df, config, min_confluence=[4, 5, 6, 7, 8, 9], apex_confluence=[7, 8, 9])
+        print(f"\n  {'Min':>4} | {'Apex':>4} | {'Trades':>6} | {'WR':>6} | {'PF':>5} | {'Total R':>8} | {'APEX':>4}")
+        print(f"  {'─' * 56}")
+        for r in table.to_dict('records'):
+            print(f"  {r['min_confluence']:>4} | {r['apex_confluence']:>4} | {r['total_trades']:>6} | "
+                  f"{r['win_rate']:5.1f}% | {r['profit_factor']:5.2f} | {r['total_r']:+7.1f}R | {r['apex_trades']:>4}")
+        sys.exit(0)
     
     print("📈 Running v9 Institutional backtest...")
-    results = run_backtest(df)
+    results = run_backtest(df, config)
     
     if results:
         print("\n" + "=" * 60)
@@ -0,0 +1,204 @@
+"""
+RetailBeastFX - Walk-Forward Optimizer v1.0
+Rolling in-sample / out-of-sample validation on top of run_grid_optimization.
+
+For each fold the grid is optimized on the in-sample (IS) window and the
+winner is traded on the following out-of-sample (OOS) window. OOS runs are
+chained on one balance, giving a stitched equity curve built only from
+parameters chosen before the data they traded.
+
+Signals are generated once over the full series (precompute_signals) and
+every fold backtests a slice of them, so a 20-fold run costs close to a
+single grid plus the (cheap) per-window backtests. Folds run in parallel.
+"""
+
+import os
+import sys
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+from rbfx_backtest_enhanced import (
+    BacktestConfig,
+    Trade,
+    SignalBundle,
+    generate_realistic_data,
+    run_backtest_fast,
+    calculate_metrics,
+)
+from rbfx_grid_optimizer import (
+    FAST_GRID,
+    PARAM_GRID,
+    build_config,
+    signal_key,
+    precompute_signals,
+    slice_window,
+    run_grid_optimization,
+    rank_results,
+    format_params,
+)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════════════════════
+@dataclass
+class WalkForwardConfig:
+    is_bars: int = 3000  # In-sample window (~1 month of 15m bars)
+    oos_bars: int = 800  # Out-of-sample window
+    step: Optional[int] = None  # Fold step (default: oos_bars, so OOS windows tile)
+    anchored: bool = False  # True = IS always starts at bar 0 (expanding window)
+    sort_key: str = 'profit_factor'  # rank_results key used to pick the winner
+    min_trades: int = 10  # Minimum IS trades for a cell to be eligible
+    workers: Optional[int] = None  # Processes (None = os.cpu_count(), 1 = in-process)
+
+
+@dataclass
+class WalkForwardResult:
+    folds: pd.DataFrame  # One row per fold: windows, winner, IS and OOS stats
+    trades: List[Trade]  # Stitched OOS trades
+    final_balance: float
+    equity_curve: List[float]  # Stitched OOS balance after each trade
+
+
+def make_folds(n_bars: int, wf: WalkForwardConfig) -> List[Tuple[int, int, int]]:
+    """(is_start, is_end, oos_end) bar indices for every complete fold."""
+    step = wf.step or wf.oos_bars
+    folds = []
+    is_end = wf.is_bars
+    while is_end + wf.oos_bars <= n_bars:
+        is_start = 0 if wf.anchored else is_end - wf.is_bars
+        folds.append((is_start, is_end, is_end + wf.oos_bars))
+        is_end += step
+    return folds
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FOLD WORKER
+# ═══════════════════════════════════════════════════════════════════════════════
+# Signal bundles shared with worker processes once, at pool start
+_SIGNALS: Dict[Tuple, SignalBundle] = {}
+
+
+def _init_worker(signals: Dict[Tuple, SignalBundle]):
+    global _SIGNALS
+    _SIGNALS = signals
+
+
+def _optimize_fold(args) -> Optional[Dict]:
+    """Grid on one IS window; returns the winning cell's metrics (with params)."""
+    param_grid, is_window, wf = args
+    results = run_grid_optimization(None, param_grid, wf.min_trades,
+                                    signals=_SIGNALS, window=is_window, verbose=False)
+    top = rank_results(results, wf.sort_key, 1)
+    return top[0] if top else None
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# WALK-FORWARD DRIVER
+# ═══════════════════════════════════════════════════════════════════════════════
+def run_walk_forward(df: pd.DataFrame, param_grid: Dict,
+                     wf: Optional[WalkForwardConfig] = None,
+                     signals: Optional[Dict[Tuple, SignalBundle]] = None) -> WalkForwardResult:
+    """Optimize on each IS window, trade the winner on the next OOS window."""
+    wf = wf or WalkForwardConfig()
+    folds = make_folds(len(df), wf)
+    if signals is None:
+        signals = precompute_signals(df, param_grid)
+
+    # 1. IS grids, one fold per task
+    tasks = [(param_grid, (a, b), wf) for a, b, _ in folds]
+    workers = wf.workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 initializer=_init_worker, initargs=(signals,)) as pool:
+            winners = list(pool.map(_optimize_fold, tasks))
+    else:
+        _init_worker(signals)
+        winners = [_optimize_fold(t) for t in tasks]
+
+    # 2. OOS runs chained on one balance (sequential: each starts where the last ended)
+    balance = BacktestConfig().initial_balance
+    equity_curve = [balance]
+    all_trades = []
+    rows = []
+    for (is_start, is_end, oos_end), best in zip(folds, winners):
+        row = {
+            'is_start': df.index[is_start],
+            'oos_start': df.index[is_end],
+            'oos_end': df.index[oos_end - 1],
+            'params': best['params'] if best else None,
+            'is_trades': best['total_trades'] if best else 0,
+            'is_pf': best['profit_factor'] if best else 0.0,
+            'oos_trades': 0,
+            'oos_win_rate': 0.0,
+            'oos_pf': 0.0,
+            'oos_r': 0.0,
+        }
+        if best:
+            config = replace(build_config(best['params']), initial_balance=balance)
+            df_oos = slice_window(signals[signal_key(best['params'])], (is_end, oos_end))
+            trades, balance, curve = run_backtest_fast(df_oos, config)
+            if trades:
+                m = calculate_metrics(trades, config.initial_balance, balance, curve)
+                row.update(oos_trades=m['total_trades'], oos_win_rate=m['win_rate'],
+                           oos_pf=m['profit_factor'], oos_r=m['total_r'])
+            all_trades.extend(trades)
+            equity_curve.extend(curve[1:])
+        rows.append(row)
+
+    return WalkForwardResult(
+        folds=pd.DataFrame(rows),
+        trades=all_trades,
+        final_balance=balance,
+        equity_curve=equity_curve,
+    )
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+def main():
+    print("=" * 70)
+    print("RetailBeastFX - Walk-Forward Optimizer v1.0")
+    print("=" * 70)
+
+    print("\n📊 GENERATING SYNTHETIC DATA...")
+    df = generate_realistic_data(20000, seed=42)
+    print(f"   Generated {len(df)} candles")
+
+    use_fast = not (len(sys.argv) > 1 and sys.argv[1] == "--full")
+    grid = FAST_GRID if use_fast else PARAM_GRID
+    wf = WalkForwardConfig()
+    folds = make_folds(len(df), wf)
+    print(f"\n   Mode: {'FAST' if use_fast else 'FULL'} (use --full for comprehensive search)")
+    print(f"   Folds: {len(folds)} x (IS {wf.is_bars} / OOS {wf.oos_bars} bars)")
+
+    print("\n" + "=" * 70)
+    print("🔍 RUNNING WALK-FORWARD")
+    print("=" * 70)
+
+    t0 = time.perf_counter()
+    result = run_walk_forward(df, grid, wf)
+    print(f"   Completed in {time.perf_counter() - t0:.1f}s")
+
+    print(f"\n   {'#':>2} | {'OOS Start':16} | {'Winner':42} | {'IS PF':>5} | {'OOS PF':>6} | {'OOS R':>7}")
+    print("   " + "-" * 92)
+    for i, r in enumerate(result.folds.itertuples(index=False)):
+        params = format_params(r.params) if r.params else "(no eligible cell)"
+        print(f"   {i+1:>2} | {r.oos_start:%Y-%m-%d %H:%M} | {params:42} | {r.is_pf:5.2f} | "
+              f"{r.oos_pf:6.2f} | {r.oos_r:+6.1f}R")
+
+    print("\n" + "=" * 70)
+    print("📋 STITCHED OUT-OF-SAMPLE PERFORMANCE")
+    print("=" * 70)
+    if not result.trades:
+        print("❌ No out-of-sample trades.")
+        return
+
+    m = calculate_metrics(result.trades, result.equity_curve[0], result.final_balance, result.equity_curve)
+    print(f"\n   Trades: {m['total_trades']} | Win rate: {m['win_rate']:.1f}% | PF: {m['profit_factor']:.2f}")
+    print(f"   Total R: {m['total_r']:+.1f}R | Return: {m['pnl_pct']:+.1f}% | Max DD: {m['max_drawdown']:.1f}%")
+    print("\n" + "=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,13 +18,37 @@ Usage:
     
     # Monitor for disasters
     alert = InstitutionalRiskEngine.disaster_alert(adx_current=18, adx_prev=30)
+    
+    # Size a whole batch of signals in one NumPy pass
+    sizes = InstitutionalRiskEngine.calculate_lot_sizes(
+        balance=[100000, 50000],
+        risk_pct=0.75,
+        atr=[45, 0.0012],
+        entry_price=[4390.0, 1.0850],
+        instrument=["XAUUSD", "EURUSD"],
+        direction=["LONG", "SHORT"]
+    )
+    sizes["lot_size"], sizes["sl_price"], sizes["tp_3r"]
 """
 
+import numpy as np
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import Optional, Sequence, Tuple, Union
 from datetime import datetime
 
 
+# Structured dtype returned by InstitutionalRiskEngine.calculate_lot_sizes
+POSITION_DTYPE = np.dtype([
+    ("lot_size", np.float64),
+    ("risk_amount", np.float64),
+    ("sl_pips", np.float64),
+    ("sl_price", np.float64),
+    ("tp_1r", np.float64),
+    ("tp_2r", np.float64),
+    ("tp_3r", np.float64),  # 3.5R institutional target
+])
+
+
 @dataclass
 class PositionResult:
     """Result of position size calculation"""
@@ -72,12 +96,57 @@ class InstitutionalRiskEngine:
     """
     
     # Default instrument specifications (can be overridden)
+    # contract_size = units per standard lot (ounces for metals), so one pip
+    # is worth pip_size * contract_size in the quote currency (see pip_values)
     INSTRUMENT_SPECS = {
-        "XAUUSD": {"pip_size": 0.1, "lot_value": 100},  # $100 per lot per pip
-        "EURUSD": {"pip_size": 0.0001, "lot_value": 10},
-        "USDJPY": {"pip_size": 0.01, "lot_value": 1000},
-        "XAGUSD": {"pip_size": 0.01, "lot_value": 5000},
+        "XAUUSD": {"pip_size": 0.1, "lot_value": 100, "contract_size": 100},
+        "EURUSD": {"pip_size": 0.0001, "lot_value": 10, "contract_size": 100000},
+        "USDJPY": {"pip_size": 0.01, "lot_value": 1000, "contract_size": 100000},
+        "XAGUSD": {"pip_size": 0.01, "lot_value": 5000, "contract_size": 5000},
     }
+    DEFAULT_SPEC = {"pip_size": 0.1, "lot_value": 100, "contract_size": 100}
+    
+    @classmethod
+    def spec_arrays(cls, instrument: Union[str, Sequence[str], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized INSTRUMENT_SPECS lookup.
+        
+        Looks up each distinct symbol once and broadcasts the result, so an
+        array of 100k instrument names costs one np.unique instead of 100k
+        dict lookups.
+        
+        Returns:
+            (pip_size, lot_value) float arrays shaped like instrument
+        """
+        names = np.asarray(instrument)
+        uniq, inverse = np.unique(names, return_inverse=True)
+        specs = [cls.INSTRUMENT_SPECS.get(str(u), cls.DEFAULT_SPEC) for u in uniq]
+        pip = np.array([sp["pip_size"] for sp in specs], dtype=np.float64)
+        value = np.array([sp["lot_value"] for sp in specs], dtype=np.float64)
+        return pip[inverse].reshape(names.shape), value[inverse].reshape(names.shape)
+    
+    @classmethod
+    def pip_values(
+        cls,
+        instrument: Union[str, Sequence[str], np.ndarray],
+        price: Union[float, Sequence[float], np.ndarray]
+    ) -> np.ndarray:
+        """
+        USD value of one pip on one standard lot.
+        
+        pip_size * contract_size is in the quote currency; USD-base pairs
+        (USDJPY) are converted at price, USD-quoted symbols need no price.
+        
+        Returns:
+            Float array broadcast from instrument and price
+        """
+        names, price = np.broadcast_arrays(np.asarray(instrument), np.asarray(price, dtype=np.float64))
+        uniq, inverse = np.unique(names, return_inverse=True)
+        specs = [cls.INSTRUMENT_SPECS.get(str(u), cls.DEFAULT_SPEC) for u in uniq]
+        quote = np.array([sp["pip_size"] * sp["contract_size"] for sp in specs], dtype=np.float64)
+        usd_base = np.array([str(u).startswith("USD") for u in uniq])
+        inverse = inverse.reshape(names.shape)
+        return np.where(usd_base[inverse], quote[inverse] / price, quote[inverse])
     
     @classmethod
     def calculate_lot_size(
@@ -112,7 +181,7 @@ class InstitutionalRiskEngine:
         sl_distance = atr * sl_atr_mult
         
         # Get instrument specs
-        specs = cls.INSTRUMENT_SPECS.get(instrument, {"pip_size": 0.1, "lot_value": 100})
+        specs = cls.INSTRUMENT_SPECS.get(instrument, cls.DEFAULT_SPEC)
         pip_size = specs["pip_size"]
         lot_value = specs["lot_value"]
         
@@ -150,6 +219,77 @@ class InstitutionalRiskEngine:
             tp_prices=tp_prices
         )
     
+    @classmethod
+    def calculate_lot_sizes(
+        cls,
+        balance: Union[float, Sequence[float], np.ndarray],
+        risk_pct: Union[float, Sequence[float], np.ndarray],
+        atr: Union[float, Sequence[float], np.ndarray],
+        sl_atr_mult: Union[float, Sequence[float], np.ndarray] = 2.0,
+        entry_price: Optional[Union[float, Sequence[float], np.ndarray]] = None,
+        instrument: Union[str, Sequence[str], np.ndarray] = "XAUUSD",
+        direction: Union[str, int, Sequence, np.ndarray] = "LONG"
+    ) -> np.ndarray:
+        """
+        Batch version of calculate_lot_size over arrays of trades.
+        
+        Every argument may be a scalar or an array; they broadcast together.
+        Results match calculate_lot_size element for element (including the
+        4-decimal lot rounding and the no-entry-price fallback).
+        
+        Args:
+            balance: Account balance(s) in USD
+            risk_pct: Risk percentage(s) (e.g., 0.75 for 0.75%)
+            atr: ATR value(s)
+            sl_atr_mult: ATR multiplier(s) for stop loss
+            entry_price: Entry price(s); None, NaN or 0 means no entry price
+            instrument: Symbol name(s) looked up in INSTRUMENT_SPECS
+            direction: "LONG"/"SHORT" strings or +1/-1 (as in calculate_lot_size,
+                any string other than "LONG" is SHORT)
+            
+        Returns:
+            Structured array with POSITION_DTYPE fields
+        """
+        direction = np.asarray(direction)
+        if direction.dtype.kind in "USO":
+            is_long = direction == "LONG"
+        else:
+            is_long = direction >= 0
+        if entry_price is None:
+            entry_price = np.nan
+        
+        balance, risk_pct, atr, sl_atr_mult, entry, is_long, instrument = np.broadcast_arrays(
+            np.asarray(balance, dtype=np.float64),
+            np.asarray(risk_pct, dtype=np.float64),
+            np.asarray(atr, dtype=np.float64),
+            np.asarray(sl_atr_mult, dtype=np.float64),
+            np.asarray(entry_price, dtype=np.float64),
+            is_long,
+            np.asarray(instrument),
+        )
+        pip_size, lot_value = cls.spec_arrays(instrument)
+        
+        risk_amount = balance * (risk_pct / 100)
+        sl_distance = atr * sl_atr_mult
+        sl_pips = sl_distance / pip_size
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lot_size = risk_amount / (sl_pips * lot_value * pip_size)
+        
+        has_entry = ~np.isnan(entry) & (entry != 0)
+        sign = np.where(is_long, 1.0, -1.0)
+        base = np.where(has_entry, entry, 0.0)
+        step = np.where(has_entry, sign, 1.0)
+        
+        out = np.empty(balance.shape, dtype=POSITION_DTYPE)
+        out["lot_size"] = np.round(lot_size, 4)
+        out["risk_amount"] = risk_amount
+        out["sl_pips"] = sl_pips
+        out["sl_price"] = np.where(has_entry, entry - sign * sl_distance, sl_distance)
+        out["tp_1r"] = base + step * atr * 1.0
+        out["tp_2r"] = base + step * atr * 2.0
+        out["tp_3r"] = base + step * atr * 3.5
+        return out
+    
     @classmethod
     def pyramiding_suggestion(
         cls,
@@ -249,6 +389,50 @@ class InstitutionalRiskEngine:
                 message="✅ No disaster conditions detected",
                 recommended_action="Continue monitoring"
             )
+    
+    # Severity codes returned by disaster_levels
+    SEVERITY_CLEAR = 0
+    SEVERITY_WARNING = 1
+    SEVERITY_CRITICAL = 2
+    
+    @classmethod
+    def pyramiding_sizes(
+        cls,
+        adx: Union[float, Sequence[float], np.ndarray],
+        current_rr: Union[float, Sequence[float], np.ndarray],
+        add_threshold: float = 30.0,
+        rr_threshold: float = 1.0
+    ) -> np.ndarray:
+        """
+        Vectorized pyramiding_suggestion: add size (fraction of original) per element.
+        
+        Returns:
+            Float array of 0.75 / 0.50 / 0.25, or 0.0 where no add is suggested
+        """
+        adx = np.asarray(adx, dtype=np.float64)
+        current_rr = np.asarray(current_rr, dtype=np.float64)
+        should_add = (adx >= add_threshold) & (current_rr >= rr_threshold)
+        add_pct = np.select([adx >= 40, adx >= 35], [0.75, 0.50], 0.25)
+        return np.where(should_add, add_pct, 0.0)
+    
+    @classmethod
+    def disaster_levels(
+        cls,
+        adx_current: Union[float, Sequence[float], np.ndarray],
+        adx_prev: Union[float, Sequence[float], np.ndarray],
+        structure_broken: Union[bool, Sequence[bool], np.ndarray] = False,
+        adx_collapse_threshold: float = 10.0
+    ) -> np.ndarray:
+        """
+        Vectorized disaster_alert severity per element.
+        
+        Returns:
+            int8 array of SEVERITY_CLEAR / SEVERITY_WARNING / SEVERITY_CRITICAL
+        """
+        adx_change = np.asarray(adx_current, dtype=np.float64) - np.asarray(adx_prev, dtype=np.float64)
+        adx_collapsing = adx_change < -adx_collapse_threshold
+        structure_broken = np.asarray(structure_broken, dtype=bool)
+        return (adx_collapsing.astype(np.int8) + structure_broken.astype(np.int8))
 
 
 def demo_current_gold():
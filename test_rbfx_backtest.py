@@ -0,0 +1,72 @@
+"""
+RetailBeastFX - script backtester checks (rbfx_backtest.py, rbfx_v9_backtest.py ADX)
+Run with: python -m pytest -q test_rbfx_backtest.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import rbfx_backtest
+import rbfx_v9_backtest
+from rbfx_backtest_enhanced import generate_realistic_data
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# LEGACY ADX (the scripts' own copies before rbfx_core)
+# ═══════════════════════════════════════════════════════════════════════════════
+def legacy_adx(high, low, close, period=14, abs_minus=False):
+    """calculate_adx as rbfx_backtest.py (abs_minus) and rbfx_v9_backtest.py had it."""
+    plus_dm = high.diff()
+    if abs_minus:
+        minus_dm = low.diff().abs() * -1
+        plus_dm = np.where((plus_dm > minus_dm.abs()) & (plus_dm > 0), plus_dm, 0)
+        minus_dm = np.where((minus_dm.abs() > plus_dm) & (minus_dm < 0), minus_dm.abs(), 0)
+    else:
+        minus_dm = -low.diff()
+        plus_dm = np.where((plus_dm > minus_dm) & (plus_dm > 0), plus_dm, 0)
+        minus_dm = np.where((minus_dm > plus_dm) & (minus_dm > 0), minus_dm, 0)
+
+    tr = pd.concat([high - low, abs(high - close.shift()), abs(low - close.shift())], axis=1).max(axis=1)
+    atr = tr.rolling(window=period).mean()
+    # pd.Series(ndarray) gets a RangeIndex: only aligned with atr on RangeIndex frames
+    plus_di = 100 * pd.Series(plus_dm).rolling(window=period).mean() / atr
+    minus_di = 100 * pd.Series(minus_dm).rolling(window=period).mean() / atr
+    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di + 0.0001)
+    return dx.rolling(window=period).mean()
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return generate_realistic_data(10000)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# rbfx_backtest.py
+# ═══════════════════════════════════════════════════════════════════════════════
+def test_classic_adx_matches_legacy_on_aligned_index(bars):
+    adx = rbfx_backtest.calculate_adx(bars, 14)
+    aligned = bars.reset_index(drop=True)
+    want = legacy_adx(aligned['High'], aligned['Low'], aligned['Close'], abs_minus=True)
+    assert np.allclose(adx.to_numpy(), want.to_numpy(), equal_nan=True)
+    assert adx.index.equals(bars.index)
+    assert adx.isna().sum() == 26 and adx.iloc[26:].between(0, 100).all()
+    # The legacy copy on the DatetimeIndex frame was all NaN, so the script never traded
+    assert legacy_adx(bars['High'], bars['Low'], bars['Close'], abs_minus=True).isna().all()
+
+
+def test_classic_backtest_trades(bars):
+    df = rbfx_backtest.generate_signals(bars.copy())
+    trades, final_balance = rbfx_backtest.run_backtest(df)
+    assert df['ADX_Gate'].sum() > 0
+    assert len(trades) == 88
+    assert final_balance == pytest.approx(2179.628054154)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# rbfx_v9_backtest.py
+# ═══════════════════════════════════════════════════════════════════════════════
+def test_v9_adx_matches_legacy(bars):
+    frame = bars.rename(columns=str.lower)
+    want = legacy_adx(frame['high'].reset_index(drop=True), frame['low'].reset_index(drop=True),
+                      frame['close'].reset_index(drop=True))
+    for df in (frame, frame.reset_index(drop=True)):  # Index-independent now
+        adx = rbfx_v9_backtest.calculate_adx(df, 14)
+        assert np.allclose(adx.to_numpy(), want.to_numpy(), equal_nan=True)
@@ -0,0 +1,106 @@
+"""
+RetailBeastFX - core engine checks (Pine indicators, scale-out ladders)
+Run with: python -m pytest -q test_rbfx_core.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rbfx_backtest_enhanced import BacktestConfig, generate_realistic_data, generate_signals
+from rbfx_core import (
+    Ladder, RMAStream, WilderDMI, calculate_atr, ladder_sweep, rma, sequential_trades, wilder_dmi,
+)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PINE INDICATORS
+# ═══════════════════════════════════════════════════════════════════════════════
+# ta.dmi(2, 2) on six bars, worked through Pine's formulas by hand
+DMI_BARS = pd.DataFrame({
+    'High': [10.0, 11.0, 12.0, 11.0, 13.0, 12.0],
+    'Low': [9.0, 10.0, 10.0, 9.0, 11.0, 10.0],
+    'Close': [9.5, 10.5, 11.5, 9.5, 12.5, 10.5],
+})
+DMI_PLUS = [np.nan, np.nan, 400 / 7, 400 / 17, 400 / 9, 400 / 17]
+DMI_MINUS = [np.nan, np.nan, 0.0, 400 / 17, 80 / 9, 400 / 17]
+DMI_ADX = [np.nan, np.nan, np.nan, 50.0, 175 / 3, 175 / 6]
+
+
+def test_rma_matches_pine():
+    # SMA seed, then y = x / 3 + y[-1] x 2 / 3; leading NaNs push the seed back
+    assert np.allclose(rma([1, 2, 3, 4, 5, 6], 3), [np.nan, np.nan, 2, 8 / 3, 31 / 9, 116 / 27], equal_nan=True)
+    assert np.allclose(rma([np.nan, 1, 2, 3, 4], 3), [np.nan, np.nan, np.nan, 2, 8 / 3], equal_nan=True)
+    assert np.isnan(rma([1.0, 2.0], 3)).all()
+
+
+def test_wilder_dmi_matches_pine():
+    plus, minus, adx = wilder_dmi(DMI_BARS, 2, 2)
+    assert np.allclose(plus, DMI_PLUS, equal_nan=True)
+    assert np.allclose(minus, DMI_MINUS, equal_nan=True)
+    assert np.allclose(adx, DMI_ADX, equal_nan=True)
+
+
+def test_streaming_matches_batch():
+    df = generate_realistic_data(3000, seed=11)
+    df.iloc[100:130, df.columns.get_indexer(['High', 'Low', 'Close'])] = df['Close'].iloc[99]  # Zero-range stretch
+    plus, minus, adx = wilder_dmi(df, 14)
+    dmi = WilderDMI(14)
+    streamed = np.array([dmi.update(h, l, c) for h, l, c in zip(df['High'], df['Low'], df['Close'])])
+    assert np.allclose(streamed, np.column_stack([plus, minus, adx]), equal_nan=True)
+    assert np.isnan(streamed[:27, 2]).all() and not np.isnan(streamed[27:, 2]).any()  # First ADX on bar 2 x 14 - 1
+
+    values = df['Close'].diff().to_numpy()
+    stream = RMAStream(14)
+    assert np.allclose([stream.update(x) for x in values], rma(values, 14), equal_nan=True)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SCALE-OUT LADDER
+# ═══════════════════════════════════════════════════════════════════════════════
+LADDERS = [
+    Ladder(),
+    Ladder((0.2, 0.3, 0.5)),
+    Ladder((0.0, 0.0, 1.0)),
+    Ladder(move_stop=False),
+    Ladder((1 / 3, 1 / 3, 1 / 3), stop_r=0.5),
+    Ladder((0.5, 0.5), levels_r=(1.5, 3.0)),
+]
+
+
+def test_ladder_sweep_matches_sequential_trades():
+    df = generate_signals(generate_realistic_data(20000, seed=7), BacktestConfig(strategy="All Signals"))
+    arrays = [df[c].to_numpy(dtype=np.float64) for c in ("High", "Low", "Close")]
+    atr = calculate_atr(df, 14).to_numpy()
+    buy, sell = df["BuySignal"].to_numpy(dtype=bool), df["SellSignal"].to_numpy(dtype=bool)
+    swept = ladder_sweep(*arrays, atr, buy, sell, 1.5, LADDERS)
+    for ladder, got in zip(LADDERS, swept):
+        want = sequential_trades(*arrays, atr, buy, sell, 1.5, 0.0, exit_mode="ladder", ladder=ladder)
+        assert got.keys() == want.keys()
+        assert len(got["entry_idx"]) > 0
+        for key in want:
+            assert np.array_equal(got[key], want[key]), (ladder, key)
+
+
+def test_ladder_blended_r_by_hand():
+    # Long at 100 with a 1.0 stop: 1R on bar 1, 2R on bar 2, back to 99.9 on bar 3, 98.5 on bar 4
+    high = np.array([100.2, 101.2, 102.1, 101.0, 100.0, 100.0])
+    low = np.array([99.8, 99.5, 100.5, 99.9, 98.5, 99.0])
+    close = np.array([100.0, 101.0, 101.8, 100.2, 99.0, 99.5])
+    atr = np.ones(6)
+    buy, sell = np.array([True, False, False, False, False, False]), np.zeros(6, dtype=bool)
+    breakeven, fixed_stop, runner = ladder_sweep(
+        high, low, close, atr, buy, sell, 1.0,
+        [Ladder(), Ladder(move_stop=False), Ladder((0.0, 0.0, 1.0))], warmup=0)
+
+    # 0.5 x 1R + 0.3 x 2R + 0.2 x 0R (stop moved to entry after the first level)
+    assert breakeven["exit_idx"].tolist() == [3]
+    assert breakeven["leg_r"][0] == pytest.approx([0.5, 0.6, 0.0])
+    assert breakeven["exit_price"][0] == pytest.approx(101.1)
+    assert breakeven["stopped"][0] == pytest.approx(0.2)
+    # The original stop only goes on bar 4: 0.5 x 1R + 0.3 x 2R - 0.2 x 1R
+    assert fixed_stop["exit_idx"].tolist() == [4]
+    assert fixed_stop["leg_r"][0] == pytest.approx([0.5, 0.6, -0.2])
+    assert fixed_stop["exit_price"][0] == pytest.approx(100.9)
+    # A zero first fraction still moves the stop: the whole runner scratches at entry
+    assert runner["exit_idx"].tolist() == [3]
+    assert runner["exit_price"][0] == pytest.approx(100.0)
+    assert not runner["won"][0]
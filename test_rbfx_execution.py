@@ -0,0 +1,124 @@
+"""
+RetailBeastFX - execution checks (position sizing, trading costs)
+Run with: python -m pytest -q test_rbfx_execution.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rbfx_backtest_enhanced import BacktestConfig, generate_realistic_data, generate_signals, run_backtest_fast
+from rbfx_core import CostModel, InstitutionalRiskEngine, calculate_atr, instrument_specs
+from rbfx_limit_orders import LimitOrderConfig, limit_order_trades, run_limit_backtest
+from rbfx_portfolio_backtest import PortfolioConfig, run_portfolio_backtest
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TRADING COSTS
+# ═══════════════════════════════════════════════════════════════════════════════
+@pytest.mark.parametrize("instrument, price, sl_distance, loss_per_lot", [
+    # Dollars lost per standard lot at the stop, by hand
+    ("EURUSD", 1.0850, 0.0020, 0.0020 * 100000),  # 20 pips x $10
+    ("XAUUSD", 2400.0, 10.0, 10.0 * 100),  # $10 x 100 oz
+    ("USDJPY", 150.0, 0.30, 0.30 * 100000 / 150.0),  # 30 pips x 1000 JPY, in USD
+])
+def test_commission_r_matches_hand_calculation(instrument, price, sl_distance, loss_per_lot):
+    costs = CostModel(commission_per_lot=7.0)
+    pip_size, pip_value = instrument_specs(instrument, np.array([price]))
+    times = pd.DatetimeIndex(["2026-01-05 09:00"])
+    r = costs.cost_r(times, np.array([1.0]), np.array([True]), np.array([sl_distance]), pip_size, pip_value)
+    assert r[0] == pytest.approx(7.0 / loss_per_lot)
+
+
+def test_limit_entries_pay_spread_without_slippage():
+    costs = CostModel(spread_pips=2.0, slippage_atr=0.1)
+    times = pd.DatetimeIndex(["2026-01-05 09:00", "2026-01-05 10:00"])
+    atr, stopped, pip_size = np.array([3.0, 3.0]), np.array([True, False]), np.array([0.01, 0.01])
+    market_entry, market_exit = costs.price_costs(times, atr, stopped, pip_size)
+    limit_entry, limit_exit = costs.price_costs(times, atr, stopped, pip_size, limit_entry=True)
+    assert np.allclose(market_entry, 0.02 + 0.3)
+    assert np.allclose(limit_entry, 0.02)
+    assert np.allclose(limit_exit, market_exit) and np.allclose(limit_exit, [0.3, 0.0])  # Stops still slip
+
+
+def test_limit_fills_book_spread_only_at_entry():
+    data = generate_realistic_data(20000)
+    config = BacktestConfig(spread_pips=2.0, slippage_atr=0.05)
+    orders = LimitOrderConfig()
+    engine = limit_order_trades(data, config, orders)
+    trades, _, _ = run_limit_backtest(data, config, orders)
+    assert len(trades) == len(engine['entry_idx']) > 0
+    atr = calculate_atr(data, 14).to_numpy()[engine['entry_idx']]
+    pip_size, _ = instrument_specs(config.instrument, engine['entry'])
+    sign = engine['sign']
+    assert np.allclose([t.entry_price for t in trades], engine['entry'] + sign * 2.0 * pip_size)
+    slip = np.where(engine['won'], 0.0, 0.05 * atr)
+    assert np.allclose([t.exit_price for t in trades], engine['exit_price'] - sign * slip)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# LOT EXECUTION
+# ═══════════════════════════════════════════════════════════════════════════════
+@pytest.fixture(scope="module")
+def signal_frame():
+    return generate_signals(generate_realistic_data(20000), BacktestConfig())
+
+
+def test_lot_rounding_changes_pnl(signal_frame):
+    risk = run_backtest_fast(signal_frame, BacktestConfig(execution="risk"))
+    lots = run_backtest_fast(signal_frame, BacktestConfig(execution="lots", lot_step=0.01))
+    coarse = run_backtest_fast(signal_frame, BacktestConfig(execution="lots", lot_step=0.1, min_lot=0.1))
+    risk_pnl = np.array([t.pnl for t in risk[0]])
+    lots_pnl = np.array([t.pnl for t in lots[0]])
+    coarse_pnl = np.array([t.pnl for t in coarse[0]])
+    assert len(risk_pnl) == len(lots_pnl) > 0
+    assert not np.allclose(lots_pnl, risk_pnl)
+    assert not np.allclose(coarse_pnl, lots_pnl)
+    # $10,000 at 1% is a fraction of a lot, so rounding down shows in every trade's R
+    risk_r = np.array([t.r_multiple for t in risk[0]])
+    lots_r = np.array([t.r_multiple for t in lots[0]])
+    assert np.abs(lots_r / risk_r - 1).max() > 1e-3
+    assert (np.abs(lots_r) <= np.abs(risk_r) + 1e-9).all()
+
+
+def test_lot_sizes_are_whole_steps(signal_frame):
+    config = BacktestConfig(execution="lots", instrument="EURUSD", lot_step=0.01)
+    trades, _, _ = run_backtest_fast(signal_frame, config)
+    entry = np.array([t.entry_price for t in trades])
+    move = np.array([abs(t.exit_price - t.entry_price) for t in trades])
+    pip_size, pip_value = instrument_specs("EURUSD", entry)
+    implied = np.abs([t.pnl for t in trades]) / (move / pip_size * pip_value)
+    assert np.allclose(implied / 0.01, np.round(implied / 0.01))
+    assert (implied >= config.min_lot - 1e-9).all() and (implied < 5).all()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# POSITION SIZER
+# ═══════════════════════════════════════════════════════════════════════════════
+def test_batch_directions_match_scalar():
+    directions = ["LONG", "long", "Long", "buy", "", "SHORT", "short", "sell"]  # Plain and mixed case
+    batch = InstitutionalRiskEngine.calculate_lot_sizes(
+        balance=100000, risk_pct=0.75, atr=45.0, entry_price=4390.0, instrument="XAUUSD",
+        direction=np.array(directions, dtype=object))
+    for row, direction in zip(batch, directions):
+        one = InstitutionalRiskEngine.calculate_lot_size(
+            balance=100000, risk_pct=0.75, atr=45.0, entry_price=4390.0, instrument="XAUUSD",
+            direction=direction)
+        assert row["sl_price"] == one.sl_price, direction
+        assert (row["tp_1r"], row["tp_2r"], row["tp_3r"]) == one.tp_prices, direction
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PORTFOLIO
+# ═══════════════════════════════════════════════════════════════════════════════
+@pytest.mark.parametrize("execution", ["risk", "lots"])
+def test_single_symbol_portfolio_matches_fast_with_costs(execution):
+    data = generate_realistic_data(20000, seed=3)
+    config = BacktestConfig(strategy="All Signals", execution=execution, instrument="EURUSD",
+                            spread_pips=2.0, slippage_atr=0.05, commission_per_lot=7.0)
+    trades, balance, _ = run_backtest_fast(generate_signals(data.copy(), config), config)
+    result = run_portfolio_backtest({"A": data}, config, PortfolioConfig(max_portfolio_risk=1.0))
+    assert len(result.trades) == len(trades) > 0
+    assert result.final_balance == pytest.approx(balance)
+    assert np.allclose(result.ledger.pnl, [t.pnl for t in trades])
+
+
+def test_portfolio_rejects_trailing_exits():
+    with pytest.raises(ValueError, match="exit_mode"):
+        run_portfolio_backtest({"A": generate_realistic_data(2000)}, BacktestConfig(exit_mode="atr"))
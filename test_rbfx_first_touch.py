@@ -0,0 +1,140 @@
+"""
+RetailBeastFX - first-touch exit engine checks (intrabar ties, trailing stops)
+Run with: python -m pytest -q test_rbfx_first_touch.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rbfx_first_touch import (
+    BarScanner, EXIT_NONE, EXIT_SL, EXIT_TP, EXIT_TRAIL, TRAIL_MIN_WINDOW,
+    IntrabarIndex, resolve_exits, resolve_trailing_exits,
+)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INTRABAR TIES
+# ═══════════════════════════════════════════════════════════════════════════════
+@pytest.fixture(scope="module")
+def tied_bars():
+    """Four 15m bars; bars 1-3 each touch 98.5 and 101.5. Minute data covers bars 0-2 only."""
+    parent_times = pd.date_range("2026-01-05 09:00", periods=4, freq="15min")
+    high = np.array([100.1, 101.5, 101.5, 101.5])
+    low = np.array([99.9, 98.5, 98.5, 98.5])
+    child_times = pd.date_range("2026-01-05 09:00", periods=45, freq="1min")
+    child_high, child_low = np.full(45, 100.1), np.full(45, 99.9)
+    child_low[15 + 2] = 98.5  # Bar 1: the low comes first...
+    child_high[15 + 9] = 101.5  # ...then the high
+    child_low[30 + 4] = 98.5  # Bar 2: the low first again
+    child_high[30 + 11] = 101.5
+    return high, low, IntrabarIndex(parent_times, child_times, child_high, child_low)
+
+
+def test_intrabar_settles_same_bar_ties(tied_bars):
+    high, low, intrabar = tied_bars
+    # Long from bar 0 (SL first on bar 1), short from bar 1 (its TP first on bar 2)
+    entry, is_buy = np.array([0, 1]), np.array([True, False])
+    sl, tp = np.array([99.0, 101.0]), np.array([101.0, 99.0])
+    exit_idx, outcome = resolve_exits(BarScanner(high, low), entry, is_buy, sl, tp, intrabar=intrabar)
+    assert exit_idx.tolist() == [1, 2]
+    assert outcome.tolist() == [EXIT_SL, EXIT_TP]
+    _, worst_case = resolve_exits(BarScanner(high, low), entry, is_buy, sl, tp)
+    assert worst_case.tolist() == [EXIT_SL, EXIT_SL]
+
+
+def test_intrabar_falls_back_to_stop(tied_bars):
+    high, low, intrabar = tied_bars
+    # Bar 3 has no minute data: the tie stays a stop
+    exit_idx, outcome = resolve_exits(BarScanner(high, low), [2], [False], [101.0], [99.0], intrabar=intrabar)
+    assert exit_idx.tolist() == [3] and outcome.tolist() == [EXIT_SL]
+    # So does a minute bar that touches both levels
+    wide = IntrabarIndex(pd.date_range("2026-01-05 09:00", periods=4, freq="15min"),
+                         pd.date_range("2026-01-05 09:15", periods=3, freq="1min"),
+                         [100.1, 101.5, 100.1], [99.9, 98.5, 99.9])
+    assert wide.resolve([1, 1], [True, False], [99.0, 101.0], [101.0, 99.0]).tolist() == [EXIT_SL, EXIT_SL]
+    assert IntrabarIndex([], [], []).resolve([], [], [], []).tolist() == []
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TRAILING EXITS
+# ═══════════════════════════════════════════════════════════════════════════════
+def walk_trailing_exit(high, low, close, atr, ema, entry_idx, is_buy, sl, tp, mode, trail_mult, start_r,
+                       max_bars=None):
+    """One trade, bar by bar: the plain loop resolve_trailing_exits vectorizes."""
+    n = len(close)
+    s = 1.0 if is_buy else -1.0
+    entry, stop = s * close[entry_idx], s * sl
+    target = np.inf if np.isnan(tp) else s * tp
+    arm = entry + start_r * (entry - stop)
+    best, moved = entry, False
+    last = n - 1 if max_bars is None else min(entry_idx + max_bars - 1, n - 1)
+    if entry_idx >= last:
+        return (n if max_bars is None else last), EXIT_NONE, close[last]
+    for j in range(entry_idx + 1, n):
+        hi, lo = (high[j], low[j]) if is_buy else (-low[j], -high[j])
+        if lo <= stop:
+            return j, (EXIT_TRAIL if moved else EXIT_SL), s * stop
+        if hi >= target:
+            return j, EXIT_TP, s * target
+        best = max(best, hi)
+        if mode != 'fixed' and best >= arm:
+            level = {'atr': best - trail_mult * atr[j], 'ema': s * ema[j], 'breakeven': entry}[mode]
+            if level > stop:
+                stop, moved = level, True
+            if moved and s * close[j] <= stop:
+                return j, EXIT_TRAIL, close[j]
+        if j >= last:
+            return (n if max_bars is None else last), EXIT_NONE, close[last]
+    return n, EXIT_NONE, close[-1]
+
+
+@pytest.fixture(scope="module")
+def path():
+    rng = np.random.default_rng(0)
+    n = 3000
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    high, low = close + rng.random(n), close - rng.random(n)
+    atr = 1 + rng.random(n) * 0.2
+    ema = close - rng.normal(0.5, 0.3, n)
+    return high, low, close, atr, ema
+
+
+@pytest.mark.parametrize("mode", ["atr", "ema", "breakeven"])
+@pytest.mark.parametrize("max_bars", [None, 60])
+def test_trailing_exits_match_bar_walk(path, mode, max_bars):
+    high, low, close, atr, ema = path
+    rng = np.random.default_rng(1)
+    m = 300
+    entry = rng.integers(0, len(close), m)
+    is_buy = rng.random(m) < 0.5
+    # Tight and very wide stops: the wide ones outlast several doubled windows
+    risk = np.where(rng.random(m) < 0.5, rng.uniform(0.3, 3, m), rng.uniform(10, 40, m))
+    sl = np.where(is_buy, close[entry] - risk, close[entry] + risk)
+    tp = np.where(rng.random(m) < 0.3, np.nan, np.where(is_buy, close[entry] + 2 * risk, close[entry] - 2 * risk))
+    trail_mult, start_r = rng.uniform(0.5, 4, m), rng.uniform(0, 2, m)
+
+    exit_idx, outcome, exit_price = resolve_trailing_exits(
+        high, low, close, entry, is_buy, sl, tp, mode, trail_mult, atr, ema, start_r, max_bars)
+    expected = [walk_trailing_exit(high, low, close, atr, ema, entry[k], is_buy[k], sl[k], tp[k], mode,
+                                   trail_mult[k], start_r[k], max_bars) for k in range(m)]
+    want_idx, want_outcome, want_price = map(np.array, zip(*expected))
+    assert np.array_equal(exit_idx, want_idx)
+    assert np.array_equal(outcome, want_outcome)
+    assert np.allclose(exit_price, want_price)
+    if max_bars is None:
+        held = np.minimum(exit_idx, len(close) - 1) - entry
+        assert held.max() > 8 * TRAIL_MIN_WINDOW  # Some rows needed the window to widen repeatedly
+        assert {EXIT_SL, EXIT_TRAIL} <= set(outcome.tolist())
+
+
+def test_fixed_trailing_matches_resolve_exits(path):
+    high, low, close, _, _ = path
+    rng = np.random.default_rng(2)
+    entry = rng.integers(0, len(close) - 1, 1000)
+    is_buy = rng.random(1000) < 0.5
+    risk = rng.uniform(0.5, 3, 1000)
+    sl = np.where(is_buy, close[entry] - risk, close[entry] + risk)
+    tp = np.where(is_buy, close[entry] + 3 * risk, close[entry] - 3 * risk)
+    exit_idx, outcome, _ = resolve_trailing_exits(high, low, close, entry, is_buy, sl, tp, 'fixed')
+    want_idx, want_outcome = resolve_exits(BarScanner(high, low), entry, is_buy, sl, tp)
+    assert np.array_equal(exit_idx, want_idx)
+    assert np.array_equal(outcome, want_outcome)
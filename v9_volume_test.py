@@ -7,6 +7,11 @@ import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from rbfx_core import STYLES, calculate_atr, calculate_bollinger_bands, apply_cooldown, atr_brackets
+from rbfx_first_touch import BarScanner, resolve_exits, EXIT_SL, EXIT_TP
+
+STYLE = STYLES['v9_volume']
+
 # Config
 CONFIG = {
     'adx_threshold': 25,
@@ -50,124 +55,124 @@ def generate_market_data(bars=10000):
     })
 
 def calc_indicators(df):
-    df['ema8'] = df['close'].ewm(span=8).mean()
-    df['ema21'] = df['close'].ewm(span=21).mean()
-    df['ema200'] = df['close'].ewm(span=200).mean()
-    
-    # ATR
-    tr = pd.concat([
-        df['high'] - df['low'],
-        abs(df['high'] - df['close'].shift(1)),
-        abs(df['low'] - df['close'].shift(1))
-    ], axis=1).max(axis=1)
-    df['atr'] = tr.rolling(14).mean()
-    
-    # ADX (simplified)
-    plus_dm = df['high'].diff().clip(lower=0)
-    minus_dm = (-df['low'].diff()).clip(lower=0)
-    atr14 = tr.rolling(14).mean()
-    plus_di = 100 * plus_dm.rolling(14).mean() / atr14
-    minus_di = 100 * minus_dm.rolling(14).mean() / atr14
-    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di + 0.001)
-    df['adx'] = dx.rolling(14).mean()
-    
-    # BB
-    df['bb_basis'] = df['close'].rolling(20).mean()
-    df['bb_std'] = df['close'].rolling(20).std()
-    df['bb_upper'] = df['bb_basis'] + df['bb_std']
-    df['bb_lower'] = df['bb_basis'] - df['bb_std']
+    # This script's variants (adjust=True EMAs, clipped-DM ADX, 0.001 epsilons) live in STYLE
+    df['ema8'] = STYLE.ema(df['close'], 8)
+    df['ema21'] = STYLE.ema(df['close'], 21)
+    df['ema200'] = STYLE.ema(df['close'], 200)
+    df['atr'] = calculate_atr(df, 14)
+    df['adx'] = STYLE.adx(df, 14)
+    df['bb_basis'], df['bb_upper'], df['bb_lower'] = calculate_bollinger_bands(df['close'], 20, 1.0)
     
     # Volume Z-Score (SENTINEL)
-    avg_vol = df['volume'].rolling(20).mean()
-    std_vol = df['volume'].rolling(20).std()
-    df['vol_zscore'] = (df['volume'] - avg_vol) / (std_vol + 0.001)
+    df['vol_zscore'] = STYLE.volume_zscore(df, 20)
     
     # Absorption: high volume + small body
     body = abs(df['close'] - df['open'])
-    avg_body = body.rolling(20).mean()
     candle_range = df['high'] - df['low']
     df['is_absorption'] = (df['vol_zscore'] >= 1.5) & (body < candle_range * 0.3)
     
     return df
 
-def is_killzone(dt):
-    h = dt.hour
-    if 3 <= h < 6: return True, 'LONDON'
-    if 8 <= h < 11: return True, 'NY'
-    return False, 'OFF'
+# Volume filters for compare_variants: label -> mask function of the indicator frame
+# (None = no volume requirement)
+VOLUME_VARIANTS = {
+    'No Volume Filter': None,
+    'Z≥1.5 or Absorption': lambda d: (d['vol_zscore'] >= CONFIG['vol_zscore_min']) | d['is_absorption'],
+    'Z≥1.0': lambda d: d['vol_zscore'] >= 1.0,
+    'Z≥1.5': lambda d: d['vol_zscore'] >= 1.5,
+    'Z≥2.0': lambda d: d['vol_zscore'] >= 2.0,
+    'Absorption Only': lambda d: d['is_absorption'],
+}
+
+def signal_masks(df):
+    """Killzone/ADX-gated buy and sell setups for every bar (indicators already added)"""
+    flags = STYLE.sessions(df['datetime'])
+    in_london, in_ny = flags['london'], flags['ny_am']
+    session = np.select([in_london, in_ny], ['LONDON', 'NY'], 'OFF')
+    
+    close, open_ = df['close'].to_numpy(), df['open'].to_numpy()
+    ema8, ema21, ema200 = df['ema8'].to_numpy(), df['ema21'].to_numpy(), df['ema200'].to_numpy()
+    gate = (in_london | in_ny) & (df['adx'].to_numpy() >= 25)
+    
+    buy = gate & (close > open_) & (df['low'].to_numpy() <= df['bb_lower'].to_numpy()) & (ema8 > ema21) & (close > ema200)
+    sell = gate & (close < open_) & (df['high'].to_numpy() >= df['bb_upper'].to_numpy()) & (ema8 < ema21) & (close < ema200)
+    return buy, sell, session
+
+def compare_variants(df, variants=VOLUME_VARIANTS, max_bars=100):
+    """Trades for every volume variant from one indicator pass.
+    
+    Each variant is just its filter mask ANDed with the shared setups, then
+    the entry-bar cooldown; all variants' entries are resolved together in
+    one resolve_exits call. Returns {label: trades} in run_backtest's format.
+    """
+    df = calc_indicators(df)
+    buy, sell, session = signal_masks(df)
+    vol_confirmed = ((df['vol_zscore'] >= CONFIG['vol_zscore_min']) | df['is_absorption']).to_numpy()
+    
+    entries = {}
+    for label, vol_filter in variants.items():
+        mask = buy | sell
+        if vol_filter is not None:
+            mask = mask & np.asarray(vol_filter(df), dtype=bool)
+        entries[label] = apply_cooldown(np.flatnonzero(mask), 5, start_bar=220)
+    
+    # One batch for the union of entry bars (variants mostly share them)
+    bars = np.unique(np.concatenate(list(entries.values())))
+    is_buy = buy[bars]
+    _, _, sl, tp = atr_brackets(df['close'].to_numpy(), df['atr'].to_numpy(), bars, is_buy, 2.0, 6.0)
+    scanner = BarScanner(df['high'].to_numpy(), df['low'].to_numpy())
+    _, outcome = resolve_exits(scanner, bars, is_buy, sl, tp, max_bars=max_bars)
+    result = np.select([outcome == EXIT_SL, outcome == EXIT_TP], ['LOSS', 'WIN'], 'TIMEOUT')
+    pnl = np.select([outcome == EXIT_SL, outcome == EXIT_TP], [-1.0, 3.0], 0)
+    vol_zscore = df['vol_zscore'].to_numpy()
+    
+    runs = {}
+    for label, b in entries.items():
+        at = np.searchsorted(bars, b)
+        runs[label] = [{
+            'direction': 'BUY' if is_buy[k] else 'SELL',
+            'session': str(session[i]),
+            'vol_zscore': float(vol_zscore[i]),
+            'vol_confirmed': bool(vol_confirmed[i]),
+            'result': str(result[k]),
+            'pnl': float(pnl[k]),
+        } for i, k in zip(b, at)]
+    return runs
 
 def run_backtest(df, require_volume=True):
     """Run backtest with optional volume requirement"""
-    df = calc_indicators(df)
-    
-    trades = []
-    last_bar = -100
-    
-    for i in range(220, len(df)):
-        row = df.iloc[i]
-        
-        if i - last_bar < 5: continue
-        
-        in_kz, session = is_killzone(row['datetime'])
-        if not in_kz: continue
-        
-        if pd.isna(row['adx']) or row['adx'] < 25: continue
-        
-        bull_trend = row['ema8'] > row['ema21']
-        bear_trend = row['ema8'] < row['ema21']
-        above_200 = row['close'] > row['ema200']
-        below_200 = row['close'] < row['ema200']
-        bull_candle = row['close'] > row['open']
-        bear_candle = row['close'] < row['open']
-        touch_lower = row['low'] <= row['bb_lower']
-        touch_upper = row['high'] >= row['bb_upper']
-        
-        # Volume Sentinel check
-        vol_confirmed = row['vol_zscore'] >= CONFIG['vol_zscore_min'] or row['is_absorption']
-        
-        # If requiring volume, skip if not confirmed
-        if require_volume and not vol_confirmed:
-            continue
-        
-        # Signals
-        buy = bull_candle and touch_lower and bull_trend and above_200
-        sell = bear_candle and touch_upper and bear_trend and below_200
-        
-        if buy or sell:
-            is_buy = buy
-            entry = row['close']
-            atr = row['atr']
-            
-            if is_buy:
-                sl = entry - atr * 2.0
-                tp = entry + atr * 6.0
-            else:
-                sl = entry + atr * 2.0
-                tp = entry - atr * 6.0
-            
-            # Simulate outcome
-            result = 'TIMEOUT'
-            pnl = 0
-            for j in range(i+1, min(i+100, len(df))):
-                r = df.iloc[j]
-                if is_buy:
-                    if r['low'] <= sl: result, pnl = 'LOSS', -1.0; break
-                    if r['high'] >= tp: result, pnl = 'WIN', 3.0; break
-                else:
-                    if r['high'] >= sl: result, pnl = 'LOSS', -1.0; break
-                    if r['low'] <= tp: result, pnl = 'WIN', 3.0; break
-            
-            trades.append({
-                'direction': 'BUY' if is_buy else 'SELL',
-                'session': session,
-                'vol_zscore': row['vol_zscore'],
-                'vol_confirmed': vol_confirmed,
-                'result': result,
-                'pnl': pnl
-            })
-            last_bar = i
-    
-    return trades
+    label = 'Z≥1.5 or Absorption' if require_volume else 'No Volume Filter'
+    return compare_variants(df, {label: VOLUME_VARIANTS[label]})[label]
+
+def summarize(trades):
+    total = len(trades)
+    wins = sum(1 for t in trades if t['result'] == 'WIN')
+    losses = sum(1 for t in trades if t['result'] == 'LOSS')
+    gross_win = sum(t['pnl'] for t in trades if t['pnl'] > 0)
+    gross_loss = abs(sum(t['pnl'] for t in trades if t['pnl'] < 0))
+    return {
+        'trades': total,
+        'wins': wins,
+        'losses': losses,
+        'win_rate': wins/total*100 if total > 0 else 0,
+        'total_r': sum(t['pnl'] for t in trades),
+        'pf': gross_win / max(0.01, gross_loss) if total > 0 else 0,
+    }
+
+def comparison_table(runs, baseline=None):
+    """Side-by-side variant stats; deltas are against `baseline` (default: first variant)"""
+    table = pd.DataFrame({label: summarize(t) for label, t in runs.items()}).T
+    base = table.loc[baseline or table.index[0]]
+    table['wr_delta'] = table['win_rate'] - base['win_rate']
+    table['trade_reduction'] = 100 - table['trades'] / base['trades'] * 100 if base['trades'] else 0.0
+    return table
+
+def print_comparison(table):
+    print(f"\n  {'Variant':22} | {'Trades':>6} | {'WR':>6} | {'ΔWR':>6} | {'PF':>6} | {'Total R':>8} | {'Cut':>5}")
+    print(f"  {'-' * 77}")
+    for label, r in table.iterrows():
+        print(f"  {label:22} | {int(r['trades']):>6} | {r['win_rate']:5.1f}% | {r['wr_delta']:+5.1f}% | "
+              f"{r['pf']:6.2f} | {r['total_r']:+7.1f}R | {r['trade_reduction']:4.0f}%")
 
 def analyze(trades, label):
     if not trades:
@@ -193,31 +198,40 @@ def analyze(trades, label):
         pf = sum(t['pnl'] for t in trades if t['pnl'] > 0) / max(0.01, abs(sum(t['pnl'] for t in trades if t['pnl'] < 0)))
         print(f"  PF:        {pf:.2f}")
 
-# Main
-print("\n🦁 VOLUME SENTINEL IMPACT TEST")
-print("=" * 50)
+if __name__ == "__main__":
+    print("\n🦁 VOLUME SENTINEL IMPACT TEST")
+    print("=" * 50)
 
-df = generate_market_data(10000)
-print(f"Generated {len(df)} bars")
+    df = generate_market_data(10000)
+    print(f"Generated {len(df)} bars")
 
-# Test WITHOUT volume requirement
-trades_no_vol = run_backtest(df, require_volume=False)
-analyze(trades_no_vol, "WITHOUT Volume Sentinel Required")
+    # Every volume variant from one indicator pass
+    runs = compare_variants(df)
 
-# Test WITH volume requirement
-trades_with_vol = run_backtest(df, require_volume=True)
-analyze(trades_with_vol, "WITH Volume Sentinel Required (Z≥1.5)")
+    # Test WITHOUT volume requirement
+    trades_no_vol = runs['No Volume Filter']
+    analyze(trades_no_vol, "WITHOUT Volume Sentinel Required")
 
-# Compare
-print("\n" + "=" * 50)
-print("  📊 COMPARISON")
-print("=" * 50)
+    # Test WITH volume requirement
+    trades_with_vol = runs['Z≥1.5 or Absorption']
+    analyze(trades_with_vol, "WITH Volume Sentinel Required (Z≥1.5)")
 
-if trades_no_vol and trades_with_vol:
-    wr_no = sum(1 for t in trades_no_vol if t['result']=='WIN')/len(trades_no_vol)*100
-    wr_with = sum(1 for t in trades_with_vol if t['result']=='WIN')/len(trades_with_vol)*100
-    
-    print(f"  Without Vol: {len(trades_no_vol)} trades, {wr_no:.1f}% WR")
-    print(f"  With Vol:    {len(trades_with_vol)} trades, {wr_with:.1f}% WR")
-    print(f"  Win Rate Δ:  {wr_with - wr_no:+.1f}%")
-    print(f"  Trade Reduction: {100 - len(trades_with_vol)/len(trades_no_vol)*100:.0f}%")
+    # Compare
+    print("\n" + "=" * 50)
+    print("  📊 COMPARISON")
+    print("=" * 50)
+
+    if trades_no_vol and trades_with_vol:
+        wr_no = sum(1 for t in trades_no_vol if t['result']=='WIN')/len(trades_no_vol)*100
+        wr_with = sum(1 for t in trades_with_vol if t['result']=='WIN')/len(trades_with_vol)*100
+
+        print(f"  Without Vol: {len(trades_no_vol)} trades, {wr_no:.1f}% WR")
+        print(f"  With Vol:    {len(trades_with_vol)} trades, {wr_with:.1f}% WR")
+        print(f"  Win Rate Δ:  {wr_with - wr_no:+.1f}%")
+        print(f"  Trade Reduction: {100 - len(trades_with_vol)/len(trades_no_vol)*100:.0f}%")
+
+    # Side by side
+    print("\n" + "=" * 50)
+    print("  📊 ALL VOLUME VARIANTS")
+    print("=" * 50)
+    print_comparison(comparison_table(runs))